@@ -1,16 +1,46 @@
+import click
 from flask import Flask
 from config import Config
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
-from flask_moment import Moment
+from app.database import Database
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login = LoginManager(app)
-login.login_view = 'login'
-moment = Moment(app)
+db = Database()
+login = LoginManager()
+login.login_view = 'main.login'
 
-from app import routes, models, errors
+
+def init_migrate(app):
+    """
+    Flask-Migrate тянет за собой alembic (треть времени импорта приложения),
+    а нужен только командам flask db и flask schema - воркерам и тестам
+    он не регистрируется
+    """
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+
+def create_app(config_class=Config):
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    db.init_app(app)
+    login.init_app(app)
+    # приложение из командной строки создает FlaskGroup, уже внутри контекста click
+    if click.get_current_context(silent=True) is not None:
+        init_migrate(app)
+
+    from app import fragment_cache, response_cache, user_cache, last_seen, stream, instrumentation, models, assets
+    for module in (fragment_cache, response_cache, user_cache, models, last_seen, stream, instrumentation, assets):
+        module.init_app(app)
+
+    from app.errors import bp as errors_bp
+    app.register_blueprint(errors_bp)
+    from app.assets import bp as assets_bp
+    app.register_blueprint(assets_bp)
+    from app.routes import bp as main_bp
+    app.register_blueprint(main_bp)
+
+    from app import cli
+    cli.register(app)
+    return app
@@ -0,0 +1,286 @@
+"""
+Сборка и раздача статики.
+
+flask assets build кладет в ASSETS_DIST_DIR копии файлов из app/static
+с хешем содержимого в имени, сжатые .gz/.br рядом с текстовыми файлами
+и уменьшенные WebP/AVIF варианты картинок, а ссылки url() в CSS
+переписывает на эти имена. Такие файлы отдаются по /assets/ с годовым
+Cache-Control и подходящим Content-Encoding. Пока сборки нет, шаблоны
+ссылаются на обычный /static/. Файлы прошлой сборки остаются до следующей:
+на них еще ссылаются страницы в кешах и у браузеров.
+
+brotli и Pillow необязательны: без них не будет .br и WebP/AVIF вариантов.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import Blueprint, current_app, url_for, request, send_from_directory, abort
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.svg', '.html', '.json', '.txt'}
+RASTER = {'.jpg', '.jpeg', '.png'}
+MIMETYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png'}
+CSS_URL = re.compile(r'url\(\s*([\'"]?)(.*?)\1\s*\)')
+CSS_DECLARATION = re.compile(r'^(\s*)background-image:\s*url\((.*?)\);\s*$', re.MULTILINE)
+
+bp = Blueprint('assets', __name__)
+
+
+def fingerprint(path, content):
+    stem, ext = os.path.splitext(path)
+    return f'{stem.replace(" ", "-")}.{hashlib.sha256(content).hexdigest()[:10]}{ext}'
+
+
+def source_files(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            yield os.path.relpath(full, static_dir).replace(os.sep, '/'), full
+
+
+def pillow():
+    """
+    (Image, features) или (None, None). Pillow нужен только сборке статики, воркеры его не импортируют
+    """
+    try:
+        from PIL import Image, features
+    except ImportError:
+        return None, None
+    return Image, features
+
+
+def image_variants(path, hashed, full, widths, dist_dir):
+    """
+    Уменьшенные копии картинки в WebP и AVIF, если Pillow умеет эти форматы
+    """
+    Image, features = pillow()
+    if Image is None:
+        return []
+    formats = [(fmt, mime) for fmt, mime in (('avif', 'image/avif'), ('webp', 'image/webp'))
+               if features.check(fmt)]
+    variants = []
+    with Image.open(full) as image:
+        sizes = sorted({w for w in widths if w < image.width} | {image.width})
+        stem = os.path.splitext(hashed)[0]
+        for width in sizes:
+            resized = image if width == image.width else \
+                image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            for fmt, mime in formats:
+                name = f'{stem}.{width}w.{fmt}'
+                if not os.path.exists(os.path.join(dist_dir, name)):
+                    resized.save(os.path.join(dist_dir, name), fmt.upper(), quality=50 if fmt == 'avif' else 80)
+                variants.append({'path': name, 'width': width, 'type': mime})
+    return variants
+
+
+def rewrite_css(css, css_path, files, variants):
+    """
+    Переписывает url() на имена с хешем; к фоновым картинкам, у которых есть
+    WebP/AVIF варианты, добавляет image-set() с выбором формата браузером
+    """
+    css_dir = os.path.dirname(css_path)
+
+    def resolve(reference):
+        target = os.path.normpath(os.path.join(css_dir, reference.replace('\\ ', ' '))).replace(os.sep, '/')
+        return target if target in files else None
+
+    def relative(path):
+        return os.path.relpath(path, css_dir).replace(os.sep, '/')
+
+    def add_image_set(match):
+        indent, reference = match.group(1), match.group(2).strip('\'"')
+        target = resolve(reference)
+        line = match.group(0)
+        if target is None or not variants.get(target):
+            return line
+        full_width = max(v['width'] for v in variants[target])
+        candidates = [f'url({relative(v["path"])}) type("{v["type"]}")'
+                      for v in variants[target] if v['width'] == full_width]
+        ext = os.path.splitext(target)[1].lower()
+        candidates.append(f'url({relative(files[target])}) type("{MIMETYPES[ext]}")')
+        return f'{line}\n{indent}background-image: image-set({", ".join(candidates)});'
+
+    def replace_url(match):
+        target = resolve(match.group(2))
+        return f'url({relative(files[target])})' if target else match.group(0)
+
+    css = CSS_DECLARATION.sub(add_image_set, css)
+    return CSS_URL.sub(replace_url, css)
+
+
+def write_once(dist_dir, name, content):
+    """
+    Имя с хешем однозначно задает содержимое: готовый файл не перезаписывается,
+    новый появляется целиком, пока его, может быть, уже раздает воркер
+    """
+    path = os.path.join(dist_dir, name)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(path + '.tmp', path)
+
+
+def compress(dist_dir, name):
+    with open(os.path.join(dist_dir, name), 'rb') as f:
+        content = f.read()
+    write_once(dist_dir, name + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_once(dist_dir, name + '.br', brotli.compress(content))
+
+
+def referenced(manifest):
+    """
+    Файлы, на которые ссылается манифест сборки
+    """
+    names = set(manifest.get('files', {}).values())
+    for variants in manifest.get('variants', {}).values():
+        names.update(variant['path'] for variant in variants)
+    return names
+
+
+def prune(dist_dir, *manifests):
+    """
+    Удаляет из dist_dir файлы, не нужные ни одной из переданных сборок
+    """
+    keep = set().union(*[referenced(manifest) for manifest in manifests])
+    removed = 0
+    for path, full in list(source_files(dist_dir)):
+        base = path[:-3] if path.endswith(('.gz', '.br')) else path
+        if path != 'manifest.json' and base not in keep:
+            os.remove(full)
+            removed += 1
+    return removed
+
+
+def build(static_dir=None, dist_dir=None, widths=None, force=False):
+    """
+    Собирает статику; если исходники не менялись с прошлой сборки, ничего не делает
+    """
+    static_dir = static_dir or current_app.static_folder
+    dist_dir = dist_dir or current_app.config['ASSETS_DIST_DIR']
+    widths = widths or current_app.config['ASSET_IMAGE_WIDTHS']
+    sources = dict(source_files(static_dir))
+    digest = hashlib.sha256()
+    for path in sorted(sources):
+        with open(sources[path], 'rb') as f:
+            digest.update(path.encode() + b'\0' + f.read())
+    digest.update(json.dumps([list(widths), brotli is not None, pillow()[0] is not None]).encode())
+    manifest_path = os.path.join(dist_dir, 'manifest.json')
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if not force and previous.get('digest') == digest.hexdigest():
+            return None
+
+    # новые файлы ложатся рядом со старыми; удаляется только то, что старше прошлой сборки
+    files, variants = {}, {}
+    for path, full in sources.items():
+        if path.endswith('.css'):
+            continue
+        with open(full, 'rb') as f:
+            content = f.read()
+        files[path] = fingerprint(path, content)
+        write_once(dist_dir, files[path], content)
+        if os.path.splitext(path)[1].lower() in RASTER:
+            variants[path] = image_variants(path, files[path], full, widths, dist_dir)
+    for path, full in sources.items():
+        if not path.endswith('.css'):
+            continue
+        with open(full, encoding='utf-8') as f:
+            content = rewrite_css(f.read(), path, files, variants).encode('utf-8')
+        files[path] = fingerprint(path, content)
+        write_once(dist_dir, files[path], content)
+    for path, hashed in files.items():
+        if os.path.splitext(path)[1].lower() in COMPRESSIBLE:
+            compress(dist_dir, hashed)
+
+    manifest = {'digest': digest.hexdigest(), 'files': files, 'variants': variants}
+    # воркеры читают манифест, пока идет сборка: файл подменяется целиком
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    reload_manifest()
+    prune(dist_dir, manifest, previous)
+    return manifest
+
+
+class Manifest(object):
+    """
+    Манифест сборки одного приложения. Перечитывается, когда у manifest.json
+    меняется время изменения или размер: сборка в другом процессе подхватывается
+    без перезапуска воркеров
+    """
+    def __init__(self):
+        self._data = None
+        self._key = None
+
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+            key = (path, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = (path, None, None)
+        if key != self._key:
+            if key[1] is None:
+                data = {'files': {}, 'variants': {}}
+            else:
+                with open(path) as f:
+                    data = json.load(f)
+            self._data, self._key = data, key
+        return self._data
+
+    def reload(self):
+        self._key = None
+
+
+def init_app(app):
+    app.extensions['assets'] = Manifest()
+
+
+def manifest():
+    return current_app.extensions['assets'].get(os.path.join(current_app.config['ASSETS_DIST_DIR'], 'manifest.json'))
+
+
+def reload_manifest():
+    current_app.extensions['assets'].reload()
+
+
+@bp.app_template_global()
+def asset_url(filename):
+    hashed = manifest()['files'].get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.assets', filename=hashed)
+
+
+@bp.route('/assets/<path:filename>')
+def assets(filename):
+    """
+    Статика с хешем в имени: кешируется навсегда, сжатая версия выбирается по Accept-Encoding
+    """
+    dist_dir = current_app.config['ASSETS_DIST_DIR']
+    if not os.path.isfile(os.path.join(dist_dir, filename)):
+        abort(404)
+    served, encoding = filename, None
+    for candidate, extension in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(os.path.join(dist_dir, filename + extension)):
+            served, encoding = filename + extension, candidate
+            break
+    response = send_from_directory(
+        dist_dir, served, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    )
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,174 @@
+import json
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from app import db, init_migrate, assets as static_assets, search as search_index, export as data_export, importer
+from app.models import User, rebuild_timeline, normalize_key_skills, recount_user_counters, follower_table_problems
+
+
+@click.group(cls=AppGroup)
+def schema():
+    """Ревизия схемы базы."""
+    pass
+
+
+@schema.command()
+def ensure():
+    """Выполнить миграции, только если база отстает от последней ревизии."""
+    import flask_migrate
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    init_migrate(current_app)
+    script = ScriptDirectory.from_config(current_app.extensions['migrate'].migrate.get_config())
+    with db.engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current == set(script.get_heads()):
+        click.echo(f'База на последней ревизии {", ".join(sorted(current))}.')
+        return
+    flask_migrate.upgrade()
+
+
+@click.group(cls=AppGroup)
+def timeline():
+    """Обслуживание материализованной ленты."""
+    pass
+
+
+@timeline.command()
+def rebuild():
+    """Пересобрать ленты всех пользователей."""
+    rebuild_timeline()
+    click.echo('Лента пересобрана.')
+
+
+@click.group(cls=AppGroup)
+def graph():
+    """Подписки: таблица followers и счетчики."""
+    pass
+
+
+@graph.command()
+def check():
+    """Найти повторы в followers и расхождения счетчиков подписок с таблицей."""
+    # граф в памяти у каждого воркера свой, новый процесс построил бы его из той же
+    # таблицы - поэтому сверяется только то, что хранится в базе
+    duplicates, counters = follower_table_problems()
+    for follower_id, followed_id, count in duplicates:
+        click.echo(f'повтор в followers: {follower_id} -> {followed_id}, строк {count}')
+    for user_id, name, stored, count in counters:
+        click.echo(f'пользователь {user_id}: {name} = {stored}, в followers {count}')
+    if duplicates or counters:
+        raise SystemExit(1)
+    click.echo('Счетчики подписок совпадают с таблицей followers, повторов нет.')
+
+
+@click.group(cls=AppGroup)
+def counters():
+    """Счетчики подписчиков, подписок и постов пользователей."""
+    pass
+
+
+@counters.command()
+def repair():
+    """Пересчитать счетчики по таблицам followers и post."""
+    ids = recount_user_counters()
+    click.echo(f'Исправлены счетчики пользователей: {len(ids)}.')
+
+
+@click.group(cls=AppGroup)
+def assets():
+    """Сборка статики."""
+    pass
+
+
+@assets.command()
+@click.option('--force', is_flag=True, help='Пересобрать, даже если исходники не менялись.')
+def build(force):
+    """Собрать статику с хешами в именах и сжатыми копиями."""
+    manifest = static_assets.build(force=force)
+    if manifest is None:
+        click.echo('Статика не менялась.')
+    else:
+        click.echo(f'Собрано файлов: {len(manifest["files"])}.')
+
+
+@click.group(cls=AppGroup)
+def search():
+    """Полнотекстовый поиск."""
+    pass
+
+
+@search.command()
+@click.option('--batch-size', default=500, help='Сколько резюме загружать за один запрос.')
+def reindex(batch_size):
+    """Пересобрать поисковый индекс постов и резюме."""
+    posts, resumes = search_index.reindex(batch_size)
+    click.echo(f'Проиндексировано постов: {posts}, резюме: {resumes}.')
+
+
+@click.group(cls=AppGroup)
+def skills():
+    """Словарь навыков."""
+    pass
+
+
+@skills.command()
+def normalize():
+    """Привязать старые навыки резюме к словарю навыков."""
+    click.echo(f'Навыков привязано к словарю: {normalize_key_skills()}.')
+
+
+@click.command()
+@with_appcontext
+@click.argument('kind', type=click.Choice(data_export.KINDS))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'zip']), default='ndjson',
+              help='zip - только для резюме.')
+@click.option('--output', type=click.File('wb'), default='-', help='Файл выгрузки, по умолчанию stdout.')
+@click.option('--batch-size', default=500, help='Сколько строк читать из базы за раз.')
+def export(kind, fmt, output, batch_size):
+    """Выгрузить все резюме или посты в NDJSON или ZIP."""
+    if fmt not in data_export.FORMATS[kind]:
+        raise click.BadParameter(f'{kind} выгружаются только в {", ".join(data_export.FORMATS[kind])}')
+    start = time.perf_counter()
+    size = 0
+    for chunk in data_export.export(kind, fmt, batch_size):
+        output.write(chunk)
+        size += len(chunk)
+    output.flush()
+    elapsed = time.perf_counter() - start
+    rows = db.session.query(data_export.MODELS[kind]).count()
+    click.echo(f'{rows} строк, {size} байт за {elapsed:.2f} с ({rows / elapsed if elapsed else 0:.0f} строк/с)',
+               err=True)
+
+
+@click.command('import')
+@with_appcontext
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--user', 'username', required=True, help='Владелец импортируемых резюме.')
+@click.option('--format', 'fmt', type=click.Choice(sorted(set(importer.FORMATS.values()))), default=None,
+              help='По умолчанию - по расширению файла.')
+def import_resumes(source, username, fmt):
+    """Импортировать резюме из JSON, NDJSON или CSV."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.BadParameter(f'нет пользователя {username}', param_hint='--user')
+    fmt = fmt or source.name.rsplit('.', 1)[-1].lower()
+    if fmt not in importer.FORMATS.values():
+        raise click.BadParameter('укажите --format json, ndjson или csv')
+    try:
+        documents = importer.parse(source.read(), fmt)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    start = time.perf_counter()
+    report = importer.import_resumes(documents, user.id)
+    elapsed = time.perf_counter() - start
+    for error in report['errors']:
+        click.echo(f'запись {error["record"]}: {json.dumps(error["errors"], ensure_ascii=False)}', err=True)
+    click.echo(f'Создано резюме: {len(report["created"])}, с ошибками: {len(report["errors"])}, '
+               f'{elapsed:.2f} с.')
+
+
+def register(app):
+    for command in (schema, timeline, graph, counters, assets, search, skills, export, import_resumes):
+        app.cli.add_command(command)
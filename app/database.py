@@ -0,0 +1,114 @@
+"""
+Настройка движков базы из Config и маршрутизация чтения на реплику.
+
+SQLite: на каждое новое соединение выставляются PRAGMA из SQLITE_* (WAL,
+synchronous, busy_timeout, mmap_size, cache_size), а файловая база
+получает пул соединений вместо NullPool, чтобы PRAGMA не выполнялись
+на каждом запросе. Серверные базы: размер пула, recycle и pre-ping.
+
+Если задан SQLALCHEMY_BINDS['replica'], GET и HEAD запросы читают
+с реплики. Запись всегда идет в основную базу, а после нее пользователь
+DATABASE_REPLICA_STICKY_SECONDS секунд читает из основной базы, чтобы
+сразу видеть свои изменения.
+"""
+import time
+from flask import current_app, g, request, session, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from sqlalchemy.pool import QueuePool
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE'),
+    ('cache_size', 'SQLITE_CACHE_SIZE'),
+)
+
+
+def sqlite_pragmas(config):
+    """
+    Обработчик connect, выставляющий PRAGMA; значение None оставляет умолчание SQLite
+    """
+    statements = [f'PRAGMA {name} = {config[key]}' for name, key in PRAGMAS if config.get(key) is not None]
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+    return on_connect
+
+
+def reads_from_replica():
+    return has_request_context() and g.get('read_from_replica', False)
+
+
+class RoutingSession(SignallingSession):
+    """
+    Сессия, отправляющая чтение внутри GET-запроса на реплику, а flush
+    и INSERT/UPDATE/DELETE - в основную базу
+    """
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or getattr(clause, 'is_dml', False):
+            if has_request_context():
+                g.wrote_to_database = True
+            return SignallingSession.get_bind(self, mapper, clause)
+        if reads_from_replica():
+            return self.db.get_engine(self.app, bind='replica')
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class Database(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        SQLAlchemy.init_app(self, app)
+        app.before_request(choose_replica)
+        app.after_request(remember_write)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        if sa_url.drivername.startswith('sqlite'):
+            if sa_url.database not in (None, '', ':memory:'):
+                options.setdefault('poolclass', QueuePool)
+                options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+                options.setdefault('connect_args', {}).setdefault('check_same_thread', False)
+        else:
+            options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+            options.setdefault('pool_recycle', app.config['DATABASE_POOL_RECYCLE'])
+            options.setdefault('pool_pre_ping', True)
+        return SQLAlchemy.apply_driver_hacks(self, app, sa_url, options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = SQLAlchemy.create_engine(self, sa_url, engine_opts)
+        if sa_url.drivername.startswith('sqlite'):
+            event.listen(engine, 'connect', sqlite_pragmas(self.get_app().config))
+        return engine
+
+
+def has_replica(config):
+    return 'replica' in (config.get('SQLALCHEMY_BINDS') or {})
+
+
+def choose_replica():
+    config = current_app.config
+    g.read_from_replica = (
+        has_replica(config) and request.method in SAFE_METHODS
+        and time.time() - session.get('db_write_at', 0) > config['DATABASE_REPLICA_STICKY_SECONDS']
+    )
+
+
+def remember_write(response):
+    """
+    Запоминает в сессии время записи: следующие запросы пользователя читают из основной базы
+    """
+    if has_replica(current_app.config) and (request.method not in SAFE_METHODS or g.get('wrote_to_database')):
+        session['db_write_at'] = time.time()
+    return response
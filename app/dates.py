@@ -0,0 +1,136 @@
+"""
+Разбор дат резюме, введенных в свободной форме, и подсчет стажа.
+
+Понимает 15.03.2018, 03.2018, 2018-03-15, "март 2018", "15 марта 2018"
+и просто год; "по настоящее время" и пустая строка дают None. Модуль не
+зависит от приложения: им же пользуется миграция, переводившая старые
+строковые колонки в даты.
+"""
+import re
+from datetime import date
+
+MONTHS = (
+    ('янв', 1), ('фев', 2), ('мар', 3), ('апр', 4), ('май', 5), ('мая', 5), ('июн', 6), ('июл', 7),
+    ('авг', 8), ('сен', 9), ('окт', 10), ('ноя', 11), ('дек', 12),
+)
+PRESENT = ('настоящ', 'сейчас', 'н.в', 'н. в', 'present')
+MIN_YEAR, MAX_YEAR = 1900, 2100
+
+DAY_MONTH_YEAR = re.compile(r'(\d{1,2})[./-](\d{1,2})[./-](\d{4})')
+MONTH_YEAR = re.compile(r'(\d{1,2})[./-](\d{4})')
+ISO = re.compile(r'(\d{4})-(\d{1,2})(?:-(\d{1,2}))?')
+NAMED_MONTH = re.compile(r'(?:(\d{1,2})\s+)?([а-яё]+)\.?\s+(\d{4})')
+YEAR = re.compile(r'(?<!\d)(\d{4})(?!\d)')
+
+
+def month_number(name):
+    for prefix, number in MONTHS:
+        if name.startswith(prefix):
+            return number
+    return None
+
+
+def make_date(year, month=1, day=1):
+    year, month, day = int(year), int(month or 1), int(day or 1)
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f'Год вне диапазона {MIN_YEAR}-{MAX_YEAR}')
+    try:
+        return date(year, month, day)
+    except ValueError:
+        raise ValueError('Такой даты не существует')
+
+
+def parse_date(text):
+    """
+    Дата из строки в свободной форме; None для пустой строки и "по настоящее время"
+    """
+    if isinstance(text, date):
+        return text
+    text = (text or '').strip().lower()
+    if not text or any(word in text for word in PRESENT):
+        return None
+    match = DAY_MONTH_YEAR.fullmatch(text)
+    if match:
+        return make_date(match.group(3), match.group(2), match.group(1))
+    match = MONTH_YEAR.fullmatch(text)
+    if match:
+        return make_date(match.group(2), match.group(1))
+    match = ISO.fullmatch(text)
+    if match:
+        return make_date(*match.groups())
+    match = NAMED_MONTH.search(text)
+    if match and month_number(match.group(2)):
+        return make_date(match.group(3), month_number(match.group(2)), match.group(1))
+    match = YEAR.search(text)
+    if match:
+        return make_date(match.group(1))
+    raise ValueError('Не удалось разобрать дату')
+
+
+def parse_year(text):
+    """
+    Год из строки в свободной форме ("2015", "2015 г.", "06.2015"); None для пустой строки
+    """
+    if isinstance(text, int):
+        return make_date(text).year
+    value = parse_date(text)
+    return value.year if value else None
+
+
+def format_date(value, precision='day'):
+    """
+    Дата для отображения и форм: ДД.ММ.ГГГГ или ММ.ГГГГ
+    """
+    if value is None:
+        return ''
+    if precision == 'month':
+        return value.strftime('%m.%Y')
+    return value.strftime('%d.%m.%Y')
+
+
+def months_between(start, end):
+    """
+    Число месяцев работы с start по end включительно: 01.2018-12.2018 дают 12
+    """
+    return max((end.year - start.year) * 12 + end.month - start.month + 1, 0)
+
+
+def experience(periods):
+    """
+    Стаж по периодам (начало, окончание или None): месяцы закрытых периодов
+    без двойного счета пересечений и начало текущей непрерывной работы.
+    Текущая работа не входит в месяцы, иначе сохраненный стаж устаревал бы
+    каждый месяц; ее досчитывает Resume.experience_total
+    """
+    months, since = 0, None
+    start = end = None
+    for period_start, period_end in sorted((p for p in periods if p[0] is not None), key=lambda p: p[0]):
+        if period_end is not None and period_end < period_start:
+            period_end = period_start
+        # месяц, в котором закончилась одна работа и началась другая, считается один раз
+        if start is not None and (end is None or (period_start.year, period_start.month) <= (end.year, end.month)):
+            if end is not None and (period_end is None or period_end > end):
+                end = period_end
+            continue
+        if start is not None:
+            months += months_between(start, end)
+        start, end = period_start, period_end
+    if start is not None:
+        if end is None:
+            since = start
+        else:
+            months += months_between(start, end)
+    return months, since
+
+
+def format_experience(months):
+    """
+    Стаж в виде "3 г. 4 мес."
+    """
+    years, months = divmod(months or 0, 12)
+    parts = []
+    if years:
+        parts.append(f'{years} г.')
+    if months or not years:
+        parts.append(f'{months} мес.')
+    return ' '.join(parts)
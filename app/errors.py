@@ -1,8 +1,10 @@
-from flask import render_template
-from app import app, db
+from flask import Blueprint, render_template
+from app import db
 
+bp = Blueprint('errors', __name__)
 
-@app.errorhandler(404)
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
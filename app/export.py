@@ -0,0 +1,123 @@
+"""
+Потоковая выгрузка резюме и постов для аналитики.
+
+Таблицы читаются пачками через yield_per (на PostgreSQL - серверным
+курсором), каждая строка сразу превращается в байты и отдается
+генератором, поэтому память зависит от размера пачки, а не таблицы. Форматы:
+NDJSON (по JSON-документу на строку) и ZIP с отдельным JSON на резюме.
+"""
+import json
+import zipfile
+from datetime import date, datetime
+from app import db
+from app.models import Post, Resume
+from app.repository import resume_aggregate_options
+
+MODELS = {'resumes': Resume, 'posts': Post}
+KINDS = tuple(MODELS)
+# в ZIP только резюме: оглавление архива держится в памяти до конца выгрузки
+# и растет с числом файлов
+FORMATS = {'resumes': ('ndjson', 'zip'), 'posts': ('ndjson',)}
+CHUNK_SIZE = 64 * 1024
+
+
+def row_to_dict(obj):
+    return {column.name: getattr(obj, column.name) for column in obj.__table__.columns}
+
+
+def to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def resume_document(resume):
+    """
+    Резюме целиком: основная информация с соц. сетями и навыками, опыт и образование
+    """
+    document = row_to_dict(resume)
+    info = resume.basic_information
+    if info is not None:
+        document['basic_information'] = dict(
+            row_to_dict(info),
+            social_networks=[row_to_dict(network) for network in info.social_networks],
+            key_skills=[row_to_dict(skill) for skill in info.key_skills],
+        )
+    else:
+        document['basic_information'] = None
+    document['work_experience'] = [row_to_dict(work) for work in resume.work_experience]
+    document['educations'] = [row_to_dict(training) for training in resume.educations]
+    document['additional_educations'] = [row_to_dict(training) for training in resume.additional_educations]
+    return document
+
+
+def documents(kind, batch_size=500):
+    """
+    Документы выгрузки по возрастанию id
+    """
+    if kind == 'resumes':
+        query = Resume.query.options(*resume_aggregate_options()).order_by(Resume.id).yield_per(batch_size)
+        for resume in query:
+            yield resume.id, resume_document(resume)
+    else:
+        result = db.session.execute(
+            db.select([Post.__table__]).order_by(Post.id).execution_options(stream_results=True)
+        ).yield_per(batch_size)
+        for row in result.mappings():
+            yield row['id'], dict(row)
+
+
+def ndjson(kind, batch_size=500):
+    buffer, size = [], 0
+    for id, document in documents(kind, batch_size):
+        line = json.dumps(document, ensure_ascii=False, default=to_json).encode('utf-8') + b'\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class ChunkWriter(object):
+    """
+    Файлоподобный приемник для ZipFile: копит записанные байты, пока генератор
+    их не заберет. Метода tell нет, поэтому ZipFile пишет архив как в
+    непрокручиваемый поток - с дескрипторами данных после каждого файла
+    """
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def zip_archive(kind, batch_size=500):
+    writer = ChunkWriter()
+    with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for id, document in documents(kind, batch_size):
+            archive.writestr(f'{kind}/{id}.json', json.dumps(document, ensure_ascii=False, default=to_json, indent=2))
+            if writer.size >= CHUNK_SIZE:
+                yield writer.drain()
+    yield writer.drain()
+
+
+def export(kind, fmt, batch_size=500):
+    """
+    Генератор байтов выгрузки kind ('resumes' или 'posts') в формате fmt ('ndjson' или 'zip')
+    """
+    if fmt == 'zip':
+        return zip_archive(kind, batch_size)
+    return ndjson(kind, batch_size)
@@ -0,0 +1,19 @@
+from collections import namedtuple
+from app import db
+from app.models import User
+
+
+FeedPost = namedtuple('FeedPost', ['id', 'body', 'timestamp', 'user_id', 'username'])
+
+
+def hydrate(posts):
+    """
+    Готовит страницу постов к отрисовке: авторы всех постов загружаются
+    одним IN-запросом вместо отдельного SELECT на каждый post.author
+    """
+    user_ids = {post.user_id for post in posts}
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids))) if user_ids else {}
+    return [
+        FeedPost(post.id, post.body, post.timestamp, post.user_id, usernames.get(post.user_id))
+        for post in posts
+    ]
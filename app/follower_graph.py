@@ -0,0 +1,99 @@
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+
+class FollowerGraph(object):
+    """
+    Граф подписок в памяти процесса: для каждого пользователя отсортированные
+    массивы id подписок и подписчиков. Проверка подписки - бинарный поиск,
+    количество - длина массива, без запросов к базе.
+
+    Граф загружается при первом обращении и обновляется на месте при
+    follow/unfollow. Номер поколения хранится в общем бэкенде кеша и
+    увеличивается после коммита: если подписки изменил другой воркер, граф
+    перечитывается целиком при следующем обращении, а после отката транзакции
+    перечитывается и локальный граф.
+    """
+    def __init__(self, load_edges, backend):
+        self.load_edges = load_edges
+        self.backend = backend
+        self.generation = None
+        self._following = {}
+        self._followers = {}
+        self._lock = threading.RLock()
+
+    def _ensure(self):
+        if self.generation is None or self.generation != self.backend.get_version('follower-graph'):
+            self.reload()
+
+    def reload(self):
+        following, followers = {}, {}
+        with self._lock:
+            generation = self.backend.get_version('follower-graph')
+            for follower_id, followed_id in self.load_edges():
+                following.setdefault(follower_id, array('l')).append(followed_id)
+                followers.setdefault(followed_id, array('l')).append(follower_id)
+            for ids in list(following.values()) + list(followers.values()):
+                ids[:] = array('l', sorted(set(ids)))
+            self._following, self._followers, self.generation = following, followers, generation
+
+    def invalidate(self, *args, **kwargs):
+        self.generation = None
+
+    def is_following(self, follower_id, followed_id):
+        with self._lock:
+            self._ensure()
+            ids = self._following.get(follower_id, ())
+            i = bisect_left(ids, followed_id)
+            return i < len(ids) and ids[i] == followed_id
+
+    def following_count(self, user_id):
+        with self._lock:
+            self._ensure()
+            return len(self._following.get(user_id, ()))
+
+    def followers_count(self, user_id):
+        with self._lock:
+            self._ensure()
+            return len(self._followers.get(user_id, ()))
+
+    def committed(self, *args, **kwargs):
+        """
+        Изменения подписок зафиксированы в базе - сообщаем остальным воркерам
+        """
+        generation = self.backend.incr_version('follower-graph')
+        if self.generation is not None and generation == self.generation + 1:
+            self.generation = generation
+        else:
+            self.generation = None
+
+    def add(self, follower_id, followed_id):
+        with self._lock:
+            self._ensure()
+            ids = self._following.setdefault(follower_id, array('l'))
+            i = bisect_left(ids, followed_id)
+            if i == len(ids) or ids[i] != followed_id:
+                ids.insert(i, followed_id)
+                insort(self._followers.setdefault(followed_id, array('l')), follower_id)
+
+    def remove(self, follower_id, followed_id):
+        with self._lock:
+            self._ensure()
+            for ids, value in ((self._following.get(follower_id), followed_id),
+                               (self._followers.get(followed_id), follower_id)):
+                if ids:
+                    i = bisect_left(ids, value)
+                    if i < len(ids) and ids[i] == value:
+                        del ids[i]
+
+    def diff(self, edges):
+        """
+        Расхождения графа с переданными ребрами: (лишние в графе, недостающие в графе)
+        """
+        with self._lock:
+            self._ensure()
+            in_memory = {(follower_id, followed_id)
+                         for follower_id, ids in self._following.items() for followed_id in ids}
+        in_table = {(follower_id, followed_id) for follower_id, followed_id in edges}
+        return sorted(in_memory - in_table), sorted(in_table - in_memory)
@@ -1,9 +1,48 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, SelectField
-from wtforms.validators import DataRequired, ValidationError, Email, EqualTo, Length
+from wtforms.validators import DataRequired, ValidationError, Email, EqualTo, Length, StopValidation
+from app.dates import parse_date, parse_year, format_date
 from app.models import User
 
 
+class FreeFormDateField(StringField):
+    """
+    Дата, введенная в свободной форме (см. app.dates); data - datetime.date или None
+    """
+    parse = staticmethod(parse_date)
+
+    def __init__(self, label=None, validators=None, precision='day', **kwargs):
+        super(FreeFormDateField, self).__init__(label, validators, **kwargs)
+        self.precision = precision
+
+    def process_formdata(self, valuelist):
+        self.data = None
+        if valuelist:
+            self.data = self.parse(valuelist[0])
+
+    def pre_validate(self, form):
+        # не разобранная дата - уже ошибка, "обязательное поле" к ней не добавляем
+        if self.process_errors:
+            raise StopValidation()
+
+    def _value(self):
+        if self.raw_data and self.process_errors:
+            return self.raw_data[0]
+        return format_date(self.data, self.precision)
+
+
+class YearField(FreeFormDateField):
+    """
+    Год в свободной форме; data - int или None
+    """
+    parse = staticmethod(parse_year)
+
+    def _value(self):
+        if self.raw_data and self.process_errors:
+            return self.raw_data[0]
+        return '' if self.data is None else str(self.data)
+
+
 class LoginForm(FlaskForm):
     username = StringField('Логин', validators=[DataRequired()])
     password = PasswordField('Пароль', validators=[DataRequired()])
@@ -54,7 +93,7 @@ class ResumeForm(FlaskForm):
     first_name = StringField('Ваше имя', validators=[DataRequired()])
     surname = StringField('Фамилия', validators=[DataRequired()])
     patronymic = StringField('Отчество', validators=[DataRequired()])
-    date_of_birth = StringField('Дата рождения')
+    date_of_birth = FreeFormDateField('Дата рождения')
     gender = SelectField('Пол', choices=[('мужчина', 'муж.'), ('женщина', 'жен.')])
     submit = SubmitField('Сохранить')
 
@@ -85,8 +124,8 @@ class SocialNetworkForm(FlaskForm):
 
 
 class WorkExperienceForm(FlaskForm):
-    started_working = StringField('Начало работы', validators=[DataRequired()])
-    ending = StringField('Окончание', validators=[DataRequired()])
+    started_working = FreeFormDateField('Начало работы', validators=[DataRequired()], precision='month')
+    ending = FreeFormDateField('Окончание (пусто - по настоящее время)', precision='month')
     organization = StringField('Организация', validators=[DataRequired()])
     region = StringField('Регион', validators=[DataRequired()])
     company_field_activity = StringField('Сфера деятельности', validators=[DataRequired()])
@@ -94,6 +133,11 @@ class WorkExperienceForm(FlaskForm):
     responsibilities_workplace = TextAreaField('Обязанности', validators=[Length(min=0, max=1000)])
     submit = SubmitField('Сохранить')
 
+    def validate_ending(self, ending):
+        if ending.data is not None and self.started_working.data is not None \
+                and ending.data < self.started_working.data:
+            raise ValidationError('Окончание работы раньше начала.')
+
 
 class KeySkillsForm(FlaskForm):
     skill_tag = TextAreaField('Навык (тег)', validators=[Length(min=0, max=128)])
@@ -105,13 +149,13 @@ class EducationForm(FlaskForm):
     educational_institution = StringField('Учебное заведение', validators=[DataRequired()])
     faculty = StringField('Факультет', validators=[DataRequired()])
     specialization = StringField('Специализация', validators=[DataRequired()])
-    year_completion = StringField('Год окончания', validators=[DataRequired()])
+    year_completion = YearField('Год окончания', validators=[DataRequired()])
     submit = SubmitField('Сохранить')
 
 
 class AdditionalEducationForm(FlaskForm):
     conducting_organization = StringField('Организация', validators=[DataRequired()])
     specialization = StringField('Специализация', validators=[DataRequired()])
-    year_completion = StringField('Год окончания', validators=[DataRequired()])
+    year_completion = YearField('Год окончания', validators=[DataRequired()])
     comment = TextAreaField('Комментарий', validators=[Length(min=0, max=1000)])
     submit = SubmitField('Сохранить')
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+
+class LRUBackend(object):
+    """
+    Ограниченный по размеру кеш в памяти процесса.
+    Версии хранятся отдельно и не вытесняются, иначе после вытеснения
+    версии снова стал бы доступен устаревший фрагмент.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get_version(self, key):
+        return self._versions.get(key, 0)
+
+    def incr_version(self, key):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._versions.clear()
+
+
+class SQLiteBackend(object):
+    """
+    Общий для всех воркеров на одной машине кеш в файле SQLite -
+    локальная замена memcached/redis
+    """
+    def __init__(self, path, maxsize):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS fragments (key TEXT PRIMARY KEY, value TEXT)')
+            connection.execute('CREATE TABLE IF NOT EXISTS versions (key TEXT PRIMARY KEY, version INTEGER)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute('SELECT value FROM fragments WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO fragments (key, value) VALUES (?, ?)', (key, value))
+            connection.execute(
+                'DELETE FROM fragments WHERE rowid <= (SELECT max(rowid) FROM fragments) - ?', (self.maxsize,)
+            )
+
+    def get_version(self, key):
+        row = self._connection().execute('SELECT version FROM versions WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else 0
+
+    def incr_version(self, key):
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT INTO versions (key, version) VALUES (?, 1) '
+                'ON CONFLICT (key) DO UPDATE SET version = version + 1', (key,)
+            )
+            return connection.execute('SELECT version FROM versions WHERE key = ?', (key,)).fetchone()[0]
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM fragments')
+            connection.execute('DELETE FROM versions')
+
+
+def current_month():
+    """
+    Часть ключа кеша: общий стаж текущей работы растет каждый месяц без правки резюме
+    """
+    return date.today().strftime('%Y-%m')
+
+
+def release(app):
+    """
+    Отпечаток выкладки - шаблоны и манифест статики. Он входит в ключи кешей: общий
+    SQLite-файл переживает деплой, и без него отдавалась бы старая разметка со
+    ссылками на файлы прошлой сборки
+    """
+    if 'release' not in app.extensions:
+        digest = hashlib.sha256()
+        template_dir = os.path.join(app.root_path, app.template_folder)
+        paths = [os.path.join(app.config['ASSETS_DIST_DIR'], 'manifest.json')]
+        for root, dirs, files in os.walk(template_dir):
+            dirs.sort()
+            paths += [os.path.join(root, name) for name in sorted(files)]
+        for path in paths:
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    digest.update(path.encode() + b'\0' + f.read())
+        app.extensions['release'] = digest.hexdigest()[:10]
+    return app.extensions['release']
+
+
+class FragmentCache(object):
+    """
+    Кеш отрисованных фрагментов резюме. Ключ - id резюме, имя фрагмента, версия,
+    выкладка и текущий месяц; каждый маршрут, изменяющий резюме, увеличивает
+    версию, и старые фрагменты больше не находятся.
+    """
+    def __init__(self, backend, release=''):
+        self.backend = backend
+        self.release = release
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, resume_id):
+        return self.backend.get_version(f'resume:{resume_id}')
+
+    def bump(self, resume_id):
+        return self.backend.incr_version(f'resume:{resume_id}')
+
+    def get_or_render(self, resume_id, name, render):
+        key = f'resume:{resume_id}:{name}:v{self.version(resume_id)}:{self.release}:{current_month()}'
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = render()
+        self.backend.set(key, value)
+        return value
+
+    def stats(self):
+        return {'backend': type(self.backend).__name__, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+
+def make_backend(config, name=None):
+    if (name or config['FRAGMENT_CACHE_BACKEND']) == 'sqlite':
+        return SQLiteBackend(config['FRAGMENT_CACHE_PATH'], config['FRAGMENT_CACHE_SIZE'])
+    return LRUBackend(config['FRAGMENT_CACHE_SIZE'])
+
+
+def init_app(app):
+    app.extensions['fragment_cache'] = FragmentCache(make_backend(app.config), release(app))
+
+
+# кеш текущего приложения; у каждого приложения из create_app свой бэкенд по его Config
+fragment_cache = LocalProxy(lambda: current_app.extensions['fragment_cache'])
@@ -0,0 +1,104 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+from flask import current_app
+
+
+class HashingBusy(Exception):
+    """
+    Очередь на хеширование паролей переполнена - клиенту стоит повторить позже
+    """
+    pass
+
+
+def hash_params(method):
+    """
+    Параметры хеширования так, как их записывает werkzeug: у pbkdf2 без числа
+    итераций подставляется значение по умолчанию
+    """
+    if not method.startswith('pbkdf2:'):
+        return method
+    args = method[len('pbkdf2:'):].split(':')
+    iterations = len(args) > 1 and args[1] and int(args[1]) or DEFAULT_PBKDF2_ITERATIONS
+    return f'pbkdf2:{args[0]}:{iterations}'
+
+
+class HashingPool(object):
+    """
+    PBKDF2 считается в отдельных процессах, чтобы всплеск входов и регистраций
+    не занимал процессор воркеров, отдающих страницы. Число одновременно
+    ожидающих задач в воркере ограничено PASSWORD_HASH_QUEUE_LIMIT: сверх него
+    запрос сразу получает HashingBusy вместо ожидания в очереди.
+    При PASSWORD_HASH_WORKERS = 0 хеширование идет в текущем процессе.
+    Сломанный или зависший пул заменяется новым.
+    """
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _pool(self, workers):
+        with self._lock:
+            # после fork пул родителя непригоден - у каждого воркера свой
+            if self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+                self._slots = threading.BoundedSemaphore(current_app.config['PASSWORD_HASH_QUEUE_LIMIT'])
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    def _reset(self, executor):
+        """
+        Следующая задача получит новый пул; ждущие в старом отменяются
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._pid = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        workers = current_app.config['PASSWORD_HASH_WORKERS']
+        if not workers:
+            return fn(*args)
+        executor, slots = self._pool(workers)
+        if not slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            slots.release()
+            self._reset(executor)
+            return fn(*args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda f: slots.release())
+        try:
+            return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+        except BrokenProcessPool:
+            # процесс пула упал - этот запрос считается здесь
+            self._reset(executor)
+            return fn(*args)
+        except FutureTimeout:
+            # пул завис: запрос получает отказ с повтором, а не второе ожидание
+            self._reset(executor)
+            raise HashingBusy()
+
+    def hash(self, password):
+        return self._submit(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    def check(self, password_hash, password):
+        return self._submit(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        Хеш посчитан с другими параметрами, чем указаны в PASSWORD_HASH_METHOD
+        """
+        if not password_hash:
+            return True
+        return hash_params(password_hash.split('$', 1)[0]) != hash_params(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+hashing_pool = HashingPool()
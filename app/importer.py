@@ -0,0 +1,220 @@
+"""
+Массовый импорт резюме.
+
+Принимает документы того же вида, что отдает выгрузка (JSON-массив или
+NDJSON), или CSV, где одна строка - резюме с основной информацией и
+навыками через ";". Каждая часть резюме проверяется той же формой, что и
+в пошаговом мастере. Корректные резюме вставляются пачками по
+IMPORT_CHUNK_SIZE в одной транзакции: резюме и основная информация -
+по строке (нужны их id), остальное - executemany на всю пачку. Если пачка
+не вставилась, ее резюме повторяются по одному, и ошибка достается только
+виноватому.
+"""
+import csv
+import io
+import json
+from types import SimpleNamespace
+from sqlalchemy.exc import DBAPIError
+from flask import current_app
+from werkzeug.datastructures import MultiDict
+from app import db
+from app.forms import ResumeForm, PersonalInformationForm, PositionForm, SocialNetworkForm, WorkExperienceForm, \
+    KeySkillsForm, EducationForm, AdditionalEducationForm
+from app.models import Resume, BasicInformation, SocialNetwork, KeySkills, WorkExperience, Education, \
+    AdditionalEducation, Skill, skill_index, insert_ignoring_duplicates
+from app.response_cache import page_cache
+from app.skill_index import normalize_skill
+from app import search as search_index
+from app.dates import experience
+
+FORMATS = {'application/json': 'json', 'application/x-ndjson': 'ndjson', 'text/csv': 'csv'}
+COLLECTIONS = (
+    ('work_experience', WorkExperienceForm, WorkExperience),
+    ('educations', EducationForm, Education),
+    ('additional_educations', AdditionalEducationForm, AdditionalEducation),
+)
+
+
+def form_fields(form_class):
+    return [name for name in form_class(formdata=None, meta={'csrf': False}).data if name != 'submit']
+
+
+def parse(text, fmt):
+    """
+    Список документов резюме из текста в формате json, ndjson или csv;
+    ValueError, если текст не разбирается или это не список резюме
+    """
+    if fmt == 'json':
+        documents = json.loads(text)
+        if isinstance(documents, dict):
+            documents = documents.get('resumes')
+        if not isinstance(documents, list):
+            raise ValueError('Ожидался список резюме или объект с ключом "resumes" со списком')
+        return documents
+    if fmt == 'ndjson':
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    info_fields = set(form_fields(PersonalInformationForm)) | set(form_fields(PositionForm))
+    documents = []
+    for row in csv.DictReader(io.StringIO(text)):
+        document = {key: value for key, value in row.items() if key not in info_fields and key != 'key_skills'}
+        document['basic_information'] = {key: value for key, value in row.items() if key in info_fields}
+        document['basic_information']['key_skills'] = [
+            skill.strip() for skill in (row.get('key_skills') or '').split(';') if skill.strip()
+        ]
+        documents.append(document)
+    return documents
+
+
+class Validator(object):
+    """
+    Проверяет части резюме формами мастера; по одному экземпляру формы
+    на класс, данные подставляются через process()
+    """
+    def __init__(self):
+        self.forms = {}
+
+    def check(self, form_class, data, prefix, errors):
+        form = self.forms.get(form_class)
+        if form is None:
+            form = self.forms[form_class] = form_class(formdata=None, meta={'csrf': False})
+        form.process(MultiDict({key: '' if value is None else str(value) for key, value in (data or {}).items()}))
+        if not form.validate():
+            for field, messages in form.errors.items():
+                errors[f'{prefix}{field}'] = messages
+        return {key: value for key, value in form.data.items() if key != 'submit'}
+
+    def resume(self, document):
+        """
+        Проверенные и приведенные к полям форм данные резюме и словарь ошибок
+        """
+        errors = {}
+        if not isinstance(document, dict):
+            return None, {'': ['Ожидался объект резюме']}
+        record = self.check(ResumeForm, document, '', errors)
+        info = document.get('basic_information')
+        if info:
+            record['basic_information'] = dict(
+                self.check(PersonalInformationForm, info, 'basic_information.', errors),
+                **self.check(PositionForm, info, 'basic_information.', errors)
+            )
+            record['social_networks'] = [
+                self.check(SocialNetworkForm, item, f'basic_information.social_networks[{i}].', errors)
+                for i, item in enumerate(info.get('social_networks') or [])
+            ]
+            record['key_skills'] = [
+                self.check(KeySkillsForm, item if isinstance(item, dict) else {'skill_tag': item},
+                           f'basic_information.key_skills[{i}].', errors)['skill_tag']
+                for i, item in enumerate(info.get('key_skills') or [])
+            ]
+        for name, form_class, model in COLLECTIONS:
+            record[name] = [self.check(form_class, item, f'{name}[{i}].', errors)
+                            for i, item in enumerate(document.get(name) or [])]
+        return record, errors
+
+
+def skill_ids(tags):
+    """
+    id навыков словаря для тегов пачки; недостающие добавляются одним executemany
+    """
+    names = {normalize_skill(tag) for tag in tags} - {''}
+    if not names:
+        return {}
+    query = db.select([Skill.name, Skill.id]).where(Skill.name.in_(names))
+    ids = dict(db.session.execute(query).fetchall())
+    missing = names - set(ids)
+    if missing:
+        db.session.execute(insert_ignoring_duplicates(Skill.__table__), [{'name': name} for name in sorted(missing)])
+        ids = dict(db.session.execute(query).fetchall())
+    return ids
+
+
+def search_document(record):
+    """
+    Текст для поискового индекса: resume_document читает только атрибуты,
+    поэтому вместо моделей ему хватает легких пространств имен
+    """
+    fields = {key: value for key, value in record.items() if key not in ('basic_information', 'key_skills')}
+    for name, form_class, model in COLLECTIONS:
+        fields[name] = [SimpleNamespace(**item) for item in record[name]]
+    info = record.get('basic_information')
+    if info is not None:
+        info = SimpleNamespace(key_skills=[SimpleNamespace(skill_tag=tag) for tag in record['key_skills']], **info)
+    return search_index.resume_document(SimpleNamespace(basic_information=info, **fields))
+
+
+def insert_chunk(records, user_id):
+    """
+    Вставляет пачку проверенных резюме в текущей транзакции, возвращает их id
+    """
+    tags = {tag for record in records for tag in record.get('key_skills', ())}
+    skills = skill_ids(tags)
+    resume_ids = []
+    rows = {SocialNetwork: [], KeySkills: [], WorkExperience: [], Education: [], AdditionalEducation: []}
+    for record in records:
+        months, since = experience((item['started_working'], item['ending']) for item in record['work_experience'])
+        resume_id = db.session.execute(Resume.__table__.insert(), dict(
+            {key: value for key, value in record.items() if key in Resume.__table__.c}, user_id=user_id,
+            experience_months=months, experience_since=since
+        )).inserted_primary_key[0]
+        resume_ids.append(resume_id)
+        for name, form_class, model in COLLECTIONS:
+            rows[model] += [dict(item, resume_id=resume_id) for item in record[name]]
+        if 'basic_information' not in record:
+            continue
+        info_id = db.session.execute(BasicInformation.__table__.insert(), dict(
+            record['basic_information'], resume_id=resume_id
+        )).inserted_primary_key[0]
+        rows[SocialNetwork] += [dict(item, basic_information_id=info_id) for item in record['social_networks']]
+        rows[KeySkills] += [{'skill_tag': tag, 'skill_id': skills.get(normalize_skill(tag)),
+                             'basic_information_id': info_id} for tag in record['key_skills']]
+    for model, values in rows.items():
+        if values:
+            db.session.execute(model.__table__.insert(), values)
+    connection = db.session.connection()
+    search_backend = search_index.backend(connection)
+    for resume_id, record in zip(resume_ids, records):
+        search_backend.index(connection, 'resume', resume_id, search_document(record))
+    return resume_ids
+
+
+def import_resumes(documents, user_id, chunk_size=None):
+    """
+    Импортирует резюме от имени пользователя user_id. Возвращает отчет:
+    id созданных резюме и ошибки по номерам записей
+    """
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    validator = Validator()
+    created, errors = [], []
+    valid = []
+    for number, document in enumerate(documents):
+        record, record_errors = validator.resume(document)
+        if record_errors:
+            errors.append({'record': number, 'errors': record_errors})
+        else:
+            valid.append((number, record))
+
+    def commit(batch):
+        try:
+            ids = insert_chunk([record for number, record in batch], user_id)
+            db.session.info['skill_index_changed'] = True
+            db.session.commit()
+            return ids
+        except DBAPIError:
+            db.session.rollback()
+            raise
+
+    for start in range(0, len(valid), chunk_size):
+        batch = valid[start:start + chunk_size]
+        try:
+            created += commit(batch)
+        except DBAPIError:
+            for number, record in batch:
+                try:
+                    created += commit([(number, record)])
+                except DBAPIError as e:
+                    errors.append({'record': number, 'errors': {'': [str(e.orig)]}})
+    if created:
+        skill_index.invalidate()
+        page_cache.invalidate()
+    errors.sort(key=lambda error: error['record'])
+    return {'created': created, 'errors': errors}
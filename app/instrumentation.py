@@ -0,0 +1,97 @@
+import json
+import time
+from flask import current_app, g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    if not has_request_context() or 'timings' not in g:
+        return
+    timings = g.timings
+    timings['queries'] += 1
+    timings['db'] += elapsed
+    timings['statements'].append((elapsed, statement))
+
+
+def on_before_render(sender, template, context, **extra):
+    if 'timings' in g:
+        g.timings['render_start'].append(time.perf_counter())
+
+
+def on_rendered(sender, template, context, **extra):
+    if 'timings' in g and g.timings['render_start']:
+        g.timings['render'] += time.perf_counter() - g.timings['render_start'].pop()
+
+
+def start_timer():
+    g.timings = {
+        'start': time.perf_counter(), 'queries': 0, 'db': 0.0, 'statements': [], 'render': 0.0, 'render_start': []
+    }
+
+
+def emit_timings(response):
+    timings = g.pop('timings', None)
+    if timings is None:
+        return response
+    total = time.perf_counter() - timings['start']
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={timings["db"] * 1000:.2f};desc="{timings["queries"]} queries"',
+        f'render;dur={timings["render"] * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+    if total * 1000 >= current_app.config['SLOW_REQUEST_THRESHOLD_MS']:
+        slowest = sorted(timings['statements'], key=lambda item: item[0], reverse=True)
+        current_app.logger.warning('slow request %s', json.dumps({
+            'method': request.method,
+            'path': request.full_path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(timings['db'] * 1000, 2),
+            'queries': timings['queries'],
+            'render_ms': round(timings['render'] * 1000, 2),
+            'slowest': [
+                {'ms': round(elapsed * 1000, 2), 'sql': statement}
+                for elapsed, statement in slowest[:current_app.config['SLOW_REQUEST_STATEMENTS']]
+            ],
+        }, ensure_ascii=False))
+    return response
+
+
+def enable(app):
+    """
+    Подключает обработчики к app. Пока инструментирование выключено, ни один
+    обработчик не зарегистрирован и запросы не платят за него ничего.
+    """
+    if start_timer in app.before_request_funcs.get(None, ()):
+        return
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+    before_render_template.connect(on_before_render, app)
+    template_rendered.connect(on_rendered, app)
+    app.before_request_funcs.setdefault(None, []).insert(0, start_timer)
+    app.after_request_funcs.setdefault(None, []).insert(0, emit_timings)
+
+
+def disable(app):
+    if start_timer not in app.before_request_funcs.get(None, ()):
+        return
+    if event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.remove(Engine, 'after_cursor_execute', after_cursor_execute)
+    before_render_template.disconnect(on_before_render, app)
+    template_rendered.disconnect(on_rendered, app)
+    app.before_request_funcs[None].remove(start_timer)
+    app.after_request_funcs[None].remove(emit_timings)
+
+
+def init_app(app):
+    if app.config['INSTRUMENTATION_ENABLED']:
+        enable(app)
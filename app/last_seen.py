@@ -0,0 +1,73 @@
+import atexit
+import threading
+import time
+from datetime import timedelta
+from flask import current_app
+from werkzeug.local import LocalProxy
+from app import db
+from app.models import User
+
+
+class LastSeenBuffer(object):
+    """
+    Копит время последнего визита пользователей в памяти процесса
+    и сбрасывает его в базу одним UPDATE раз в LAST_SEEN_FLUSH_INTERVAL секунд,
+    уже после отправки ответа, которому пришел срок сброса. Отметки, которые новее сохраненных меньше чем на LAST_SEEN_MIN_STALENESS секунд,
+    не записываются вовсе.
+    """
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def touch(self, user, when):
+        staleness = timedelta(seconds=current_app.config['LAST_SEEN_MIN_STALENESS'])
+        with self._lock:
+            known = self._pending.get(user.id) or user.last_seen
+            if known is None or when - known >= staleness:
+                self._pending[user.id] = when
+
+    def claim_flush(self):
+        """
+        Пришел ли срок сброса; срок отдается только одному запросу
+        """
+        with self._lock:
+            if not self._pending or \
+                    time.monotonic() - self._last_flush < current_app.config['LAST_SEEN_FLUSH_INTERVAL']:
+                return False
+            self._last_flush = time.monotonic()
+            return True
+
+    def pending(self, user_id):
+        return self._pending.get(user_id)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        statement = User.__table__.update().where(User.id == db.bindparam('user_id')).\
+            values(last_seen=db.bindparam('seen'))
+        with db.engine.begin() as connection:
+            connection.execute(statement, [{'user_id': id, 'seen': seen} for id, seen in pending.items()])
+        return len(pending)
+
+
+def init_app(app):
+    buffer = app.extensions['last_seen_buffer'] = LastSeenBuffer()
+
+    def flush_in_app_context():
+        with app.app_context():
+            buffer.flush()
+
+    def flush_after_response(response):
+        # сервер вызывает close после отправки тела: запрос не ждет UPDATE
+        if buffer.claim_flush():
+            response.call_on_close(flush_in_app_context)
+        return response
+    app.after_request(flush_after_response)
+    atexit.register(flush_in_app_context)
+
+
+last_seen_buffer = LocalProxy(lambda: current_app.extensions['last_seen_buffer'])
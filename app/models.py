@@ -1,14 +1,50 @@
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, date
+from flask import current_app
+from werkzeug.local import LocalProxy
 from app import db
 from app import login
 from flask_login import UserMixin
+from app.follower_graph import FollowerGraph
+from app.skill_index import SkillIndex, normalize_skill
+from app.fragment_cache import make_backend
+from app.hashing import hashing_pool
+from app.user_cache import user_cache
+from app.dates import experience, months_between
 
 
 followers = db.Table(
     'followers',
     db.Column('follower_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('followed_id', db.Integer, db.ForeignKey('user.id'))
+    db.Column('followed_id', db.Integer, db.ForeignKey('user.id')),
+    # повторная подписка из другого воркера не проходит на уровне базы, см. User.follow
+    db.Index('ix_followers_pair', 'follower_id', 'followed_id', unique=True),
+    # раскладка поста по лентам выбирает подписчиков автора
+    db.Index('ix_followers_followed_id', 'followed_id')
+)
+
+
+def insert_ignoring_duplicates(table):
+    """
+    INSERT ... ON CONFLICT DO NOTHING для диалекта текущей базы
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table).on_conflict_do_nothing()
+
+# Материализованная лента: по строке на каждый пост в ленте каждого подписчика.
+# Заполняется при публикации поста (fan-out on write), дополняется при подписке
+# и очищается при отписке. Авторы, у которых подписчиков больше
+# TIMELINE_FANOUT_LIMIT, в ленты не раскладываются - их посты подтягиваются
+# при чтении (pull).
+timeline = db.Table(
+    'timeline',
+    db.Column('owner_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Column('author_id', db.Integer, db.ForeignKey('user.id'), index=True),
+    db.Column('timestamp', db.DateTime),
+    db.Index('ix_timeline_owner_timestamp', 'owner_id', 'timestamp', 'post_id')
 )
 
 
@@ -21,6 +57,10 @@ class User(UserMixin, db.Model):
     resume = db.relationship('Resume', backref='author', lazy='dynamic')
     about_me = db.Column(db.String(140))
     last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    # денормализованные счетчики для профиля, сверяются командой flask counters repair
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     followed = db.relationship(
         'User', secondary=followers,
         primaryjoin=(followers.c.follower_id == id),
@@ -32,33 +72,114 @@ class User(UserMixin, db.Model):
         return f'<User {self.username}>'
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hashing_pool.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return hashing_pool.check(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return hashing_pool.needs_rehash(self.password_hash)
 
     def is_following(self, user):
-        return self.followed.filter(followers.c.followed_id == user.id).count() > 0
+        return follower_graph.is_following(self.id, user.id)
+
+    def followers_count(self):
+        return follower_graph.followers_count(self.id)
+
+    def followed_count(self):
+        return follower_graph.following_count(self.id)
 
     def follow(self, user):
-        if not self.is_following(user):
-            self.followed.append(user)
+        """
+        Решает база, а не граф в памяти: граф воркера может еще не знать о подписке,
+        сделанной в другом воркере, и тогда счетчики и лента изменились бы дважды
+        """
+        added = db.session.execute(insert_ignoring_duplicates(followers).values(
+            follower_id=self.id, followed_id=user.id
+        )).rowcount
+        if added:
+            # UPDATE ... SET count = count + 1: одновременные подписки не теряют друг друга
+            self.following_count = User.following_count + 1
+            user.follower_count = User.follower_count + 1
+            counters_changed(db.session, self.id, user.id)
+            follower_graph.add(self.id, user.id)
+            db.session.info['follower_graph_changed'] = True
+            if user.id != self.id and not is_pull_author(user.id):
+                db.session.execute(timeline.insert().from_select(
+                    ['owner_id', 'post_id', 'author_id', 'timestamp'],
+                    db.select([db.literal(self.id), Post.id, Post.user_id, Post.timestamp]).
+                    where(Post.user_id == user.id)
+                ))
 
     def unfollow(self, user):
-        if self.is_following(user):
-            self.followed.remove(user)
+        removed = db.session.execute(followers.delete().where(
+            db.and_(followers.c.follower_id == self.id, followers.c.followed_id == user.id)
+        )).rowcount
+        if removed:
+            self.following_count = User.following_count - 1
+            user.follower_count = User.follower_count - 1
+            counters_changed(db.session, self.id, user.id)
+            follower_graph.remove(self.id, user.id)
+            db.session.info['follower_graph_changed'] = True
+            if user.id != self.id:
+                db.session.execute(timeline.delete().where(
+                    db.and_(timeline.c.owner_id == self.id, timeline.c.author_id == user.id)
+                ))
+
+    def followed_feed(self):
+        """
+        Неупорядоченный запрос ленты и ключ (timestamp, id), по которому ее сортировать
+        """
+        feed = Post.query.join(timeline, timeline.c.post_id == Post.id).filter(timeline.c.owner_id == self.id)
+        pulled = pull_authors_followed_by(self.id)
+        if pulled:
+            return feed.union(Post.query.filter(Post.user_id.in_(pulled))), (Post.timestamp, Post.id)
+        return feed, (timeline.c.timestamp, timeline.c.post_id)
 
     def followed_posts(self):
-        followed = Post.query.join(
-            followers, (followers.c.followed_id == Post.user_id)
-        ).filter(followers.c.follower_id == self.id)
-        own = Post.query.filter_by(user_id=self.id)
-        return followed.union(own).order_by(Post.timestamp.desc())
+        feed, (timestamp, id) = self.followed_feed()
+        return feed.order_by(timestamp.desc(), id.desc())
+
+
+follower_graph = LocalProxy(lambda: current_app.extensions['follower_graph'])
+db.event.listen(followers, 'after_create', lambda *args, **kwargs: follower_graph.invalidate())
+db.event.listen(followers, 'after_drop', lambda *args, **kwargs: follower_graph.invalidate())
+db.event.listen(User.__table__, 'after_drop', lambda *args, **kwargs: user_cache.clear())
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def follower_graph_committed(session):
+    if session.info.pop('follower_graph_changed', False):
+        follower_graph.committed()
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def follower_graph_rolled_back(session):
+    if session.info.pop('follower_graph_changed', False):
+        follower_graph.invalidate()
+
+
+def counters_changed(session, *user_ids):
+    """
+    Запоминает пользователей с измененными счетчиками: после коммита их записи в user_cache сбрасываются
+    """
+    session.info.setdefault('user_counters_changed', set()).update(user_ids)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def user_counters_committed(session):
+    for user_id in session.info.pop('user_counters_changed', ()):
+        user_cache.invalidate(user_id)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def user_counters_rolled_back(session):
+    session.info.pop('user_counters_changed', None)
 
 
 @login.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    return user_cache.get(int(id), User.query.get)
 
 
 class Post(db.Model):
@@ -71,20 +192,163 @@ class Post(db.Model):
         return f'<Post {self.body}>'
 
 
+def is_pull_author(user_id, connection=None):
+    """
+    Слишком много подписчиков - посты автора не раскладываются по лентам.
+    Решает счетчик follower_count, а не подсчет строк followers
+    """
+    users = User.__table__
+    count = db.select([users.c.follower_count]).where(users.c.id == user_id)
+    executor = connection if connection is not None else db.session
+    return (executor.execute(count).scalar() or 0) > current_app.config['TIMELINE_FANOUT_LIMIT']
+
+
+def pull_authors_followed_by(user_id):
+    """
+    Авторы из подписок пользователя, чьи посты читаются напрямую (pull)
+    """
+    users = User.__table__
+    query = db.select([users.c.id]).select_from(users.join(followers, followers.c.followed_id == users.c.id)).\
+        where(db.and_(followers.c.follower_id == user_id,
+                      users.c.follower_count > current_app.config['TIMELINE_FANOUT_LIMIT']))
+    return [row[0] for row in db.session.execute(query)]
+
+
+@db.event.listens_for(Post, 'after_insert')
+def fan_out_post(mapper, connection, post):
+    """
+    Раскладывает новый пост по лентам автора и его подписчиков
+    """
+    row = {'post_id': post.id, 'author_id': post.user_id, 'timestamp': post.timestamp}
+    connection.execute(timeline.insert(), dict(row, owner_id=post.user_id))
+    if not is_pull_author(post.user_id, connection):
+        connection.execute(timeline.insert().from_select(
+            ['owner_id', 'post_id', 'author_id', 'timestamp'],
+            db.select([
+                followers.c.follower_id, db.literal(post.id), db.literal(post.user_id), db.literal(post.timestamp)
+            ]).where(db.and_(followers.c.followed_id == post.user_id, followers.c.follower_id != post.user_id))
+        ))
+
+
+def change_post_count(connection, post, delta):
+    if post.user_id is None:
+        return
+    connection.execute(User.__table__.update().where(User.id == post.user_id).values(
+        post_count=User.__table__.c.post_count + delta
+    ))
+    session = db.object_session(post)
+    if session is not None:
+        counters_changed(session, post.user_id)
+
+
+@db.event.listens_for(Post, 'after_insert')
+def count_post(mapper, connection, post):
+    change_post_count(connection, post, 1)
+
+
+@db.event.listens_for(Post, 'after_delete')
+def uncount_post(mapper, connection, post):
+    change_post_count(connection, post, -1)
+
+
+def actual_counters():
+    """
+    Подзапросы с настоящими значениями счетчиков для строки user
+    """
+    users = User.__table__
+    return {
+        'follower_count': db.select([db.func.count()]).where(followers.c.followed_id == users.c.id).scalar_subquery(),
+        'following_count': db.select([db.func.count()]).where(followers.c.follower_id == users.c.id).scalar_subquery(),
+        'post_count': db.select([db.func.count()]).where(Post.user_id == users.c.id).scalar_subquery(),
+    }
+
+
+def recount_user_counters():
+    """
+    Пересчитывает счетчики подписчиков, подписок и постов по таблицам одним
+    UPDATE для разошедшихся строк. Возвращает id исправленных пользователей
+    """
+    users = User.__table__
+    actual = actual_counters()
+    stale = db.or_(*[users.c[name] != count for name, count in actual.items()])
+    ids = [row[0] for row in db.session.execute(db.select([users.c.id]).where(stale))]
+    if ids:
+        db.session.execute(users.update().where(stale).values(**actual))
+        counters_changed(db.session, *ids)
+    db.session.commit()
+    return ids
+
+
+def follower_table_problems():
+    """
+    Повторные строки followers (follower_id, followed_id, count) и пользователи, у которых
+    счетчики подписчиков и подписок расходятся с таблицей (id, имя счетчика, в user, в followers)
+    """
+    duplicates = db.session.execute(
+        db.select([followers.c.follower_id, followers.c.followed_id, db.func.count()]).
+        group_by(followers.c.follower_id, followers.c.followed_id).having(db.func.count() > 1).
+        order_by(followers.c.follower_id, followers.c.followed_id)
+    ).fetchall()
+    users = User.__table__
+    actual = actual_counters()
+    counters = []
+    for name in ('follower_count', 'following_count'):
+        counters += [(user_id, name, stored, count) for user_id, stored, count in db.session.execute(
+            db.select([users.c.id, users.c[name], actual[name]]).where(users.c[name] != actual[name])
+        )]
+    return duplicates, sorted(counters)
+
+
+def rebuild_timeline():
+    """
+    Полностью пересобирает материализованную ленту по таблицам post и followers
+    """
+    db.session.execute(timeline.delete())
+    columns = ['owner_id', 'post_id', 'author_id', 'timestamp']
+    db.session.execute(timeline.insert().from_select(
+        columns, db.select([Post.user_id, Post.id, Post.user_id.label('author_id'), Post.timestamp]).where(Post.user_id.isnot(None))
+    ))
+    limit = current_app.config['TIMELINE_FANOUT_LIMIT']
+    push_authors = db.select([User.id]).where(User.follower_count <= limit)
+    db.session.execute(timeline.insert().from_select(
+        columns,
+        db.select([followers.c.follower_id, Post.id, Post.user_id, Post.timestamp]).distinct().
+        select_from(followers.join(Post, Post.user_id == followers.c.followed_id)).
+        where(db.and_(followers.c.followed_id.in_(push_authors), followers.c.follower_id != Post.user_id))
+    ))
+    db.session.commit()
+
+
 class Resume(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(64))
     surname = db.Column(db.String(64))
     patronymic = db.Column(db.String(64))
-    date_of_birth = db.Column(db.String(64))
+    date_of_birth = db.Column(db.Date, index=True)
     gender = db.Column(db.String(64))
+    # стаж закрытых периодов в месяцах и начало текущей работы, см. update_experience
+    experience_months = db.Column(db.Integer, index=True, nullable=False, default=0, server_default='0')
+    experience_since = db.Column(db.Date)
     basic_information = db.relationship('BasicInformation',  backref='resume', lazy=True, uselist=False)
-    work_experience = db.relationship('WorkExperience', backref='resume', lazy=True)
+    work_experience = db.relationship('WorkExperience', backref='resume', lazy=True,
+                                      order_by='WorkExperience.started_working.desc()')
     educations = db.relationship('Education', backref='resume', lazy=True)
     additional_educations = db.relationship('AdditionalEducation', backref='resume', lazy=True)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    # растут при любом изменении резюме или его частей (см. touch_resume), из них ETag и Last-Modified API
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    last_modified = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    def experience_total(self, today=None):
+        """
+        Полный стаж в месяцах на дату today без чтения опыта работы
+        """
+        months = self.experience_months or 0
+        if self.experience_since is not None:
+            months += months_between(self.experience_since, today or date.today())
+        return months
+
 
 class BasicInformation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -111,16 +375,87 @@ class SocialNetwork(db.Model):
     basic_information_id = db.Column(db.Integer, db.ForeignKey('basic_information.id'), nullable=False)
 
 
+class Skill(db.Model):
+    """
+    Словарь навыков: одна строка на нормализованное название
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128), index=True, unique=True, nullable=False)
+
+    @staticmethod
+    def for_tag(tag):
+        name = normalize_skill(tag)
+        if not name:
+            return None
+        skill = Skill.query.filter_by(name=name).first()
+        if skill is None:
+            # навык мог добавить параллельный запрос: вставка его не дублирует, а выборка находит
+            db.session.execute(insert_ignoring_duplicates(Skill.__table__), {'name': name})
+            skill = Skill.query.filter_by(name=name).one()
+        return skill
+
+
 class KeySkills(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     skill_tag = db.Column(db.String(128))
+    skill_id = db.Column(db.Integer, db.ForeignKey('skill.id'), index=True)
+    skill = db.relationship('Skill')
     basic_information_id = db.Column(db.Integer, db.ForeignKey('basic_information.id'), nullable=False)
 
+    def set_tag(self, tag):
+        self.skill_tag = tag
+        self.skill = Skill.for_tag(tag)
+
+
+def index_resume_skills(resume_id):
+    """
+    Переносит навыки резюме из базы в индекс навыков; вызывается до коммита
+    """
+    skill_index.replace(int(resume_id), db.session.execute(
+        db.select([Skill.id, Skill.name]).select_from(
+            Skill.__table__.join(KeySkills.__table__).join(BasicInformation.__table__)
+        ).where(BasicInformation.resume_id == resume_id).distinct()
+    ).fetchall())
+    db.session.info['skill_index_changed'] = True
+
+
+def normalize_key_skills():
+    """
+    Заполняет словарь навыков по старым строкам KeySkills без skill_id
+    """
+    count = 0
+    for key_skill in KeySkills.query.filter(KeySkills.skill_id.is_(None)).order_by(KeySkills.id):
+        key_skill.set_tag(key_skill.skill_tag)
+        count += 1
+    db.session.info['skill_index_changed'] = True
+    skill_index.invalidate()
+    db.session.commit()
+    return count
+
+
+skill_index = LocalProxy(lambda: current_app.extensions['skill_index'])
+db.event.listen(Skill.__table__, 'after_create', lambda *args, **kwargs: skill_index.invalidate())
+db.event.listen(Skill.__table__, 'after_drop', lambda *args, **kwargs: skill_index.invalidate())
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def skill_index_committed(session):
+    if session.info.pop('skill_index_changed', False):
+        skill_index.committed()
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def skill_index_rolled_back(session):
+    if session.info.pop('skill_index_changed', False):
+        skill_index.invalidate()
+
 
 class WorkExperience(db.Model):
+    __table_args__ = (db.Index('ix_work_experience_resume_started', 'resume_id', 'started_working'),)
     id = db.Column(db.Integer, primary_key=True)
-    started_working = db.Column(db.String(64))
-    ending = db.Column(db.String(64))
+    started_working = db.Column(db.Date)
+    # None - по настоящее время
+    ending = db.Column(db.Date)
     organization = db.Column(db.String(128))
     region = db.Column(db.String(64))
     company_field_activity = db.Column(db.String(128))
@@ -135,7 +470,7 @@ class Education(db.Model):
     educational_institution = db.Column(db.String(500))
     faculty = db.Column(db.String(500))
     specialization = db.Column(db.String(128))
-    year_completion = db.Column(db.String(64))
+    year_completion = db.Column(db.Integer)
     comment = db.Column(db.String(1000))
     resume_id = db.Column(db.Integer, db.ForeignKey('resume.id'), nullable=False)
 
@@ -145,6 +480,45 @@ class AdditionalEducation(db.Model):
     educational_institution = db.Column(db.String(500))
     conducting_organization = db.Column(db.String(500))
     specialization = db.Column(db.String(128))
-    year_completion = db.Column(db.String(64))
+    year_completion = db.Column(db.Integer)
     comment = db.Column(db.String(1000))
     resume_id = db.Column(db.Integer, db.ForeignKey('resume.id'), nullable=False)
+
+
+def update_experience(resume_id):
+    """
+    Пересчитывает сохраненный стаж резюме по его опыту работы; вызывается до коммита
+    """
+    months, since = experience(db.session.query(WorkExperience.started_working, WorkExperience.ending).filter(
+        WorkExperience.resume_id == resume_id
+    ).all())
+    Resume.query.filter_by(id=resume_id).update(
+        {'experience_months': months, 'experience_since': since}, synchronize_session='fetch'
+    )
+
+
+def touch_resume(resume_id):
+    """
+    Отмечает изменение резюме: новая версия и время; вызывается до коммита
+    """
+    Resume.query.filter_by(id=resume_id).update(
+        {'version': Resume.version + 1, 'last_modified': datetime.utcnow()}, synchronize_session=False
+    )
+
+
+def init_app(app):
+    """
+    Граф подписок и индекс навыков - свои у каждого приложения, бэкенд выбирается по его настройкам
+    """
+    app.extensions['follower_graph'] = FollowerGraph(
+        lambda: db.session.execute(db.select([followers.c.follower_id, followers.c.followed_id])),
+        make_backend(app.config, app.config['FOLLOWER_GRAPH_BACKEND'])
+    )
+    app.extensions['skill_index'] = SkillIndex(
+        lambda: db.session.execute(
+            db.select([Skill.id, Skill.name, BasicInformation.resume_id]).select_from(
+                Skill.__table__.outerjoin(KeySkills.__table__).outerjoin(BasicInformation.__table__)
+            )
+        ),
+        make_backend(app.config)
+    )
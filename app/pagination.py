@@ -0,0 +1,77 @@
+import base64
+import binascii
+from datetime import datetime
+from app import db
+
+
+class KeysetPage(object):
+    """
+    Страница ленты, выбранная по ключу (timestamp, id) вместо OFFSET
+    """
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(direction, timestamp, id):
+    raw = f'{direction}|{timestamp.isoformat()}|{id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Возвращает (direction, timestamp, id) или None для испорченного курсора
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        direction, timestamp, id = raw.split('|')
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(timestamp), int(id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def keyset_paginate(query, keys, per_page, cursor=None, page=1):
+    """
+    Постраничная выборка по убыванию ключа keys = (timestamp_column, id_column).
+    Любая страница стоит как первая: без COUNT и без OFFSET.
+    Старые ссылки ?page=N обслуживаются одним OFFSET-запросом,
+    дальше навигация идет уже по курсорам.
+    """
+    timestamp_col, id_col = keys
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded is None:
+        page = max(page, 1)
+        rows = query.order_by(timestamp_col.desc(), id_col.desc()).\
+            offset((page - 1) * per_page).limit(per_page + 1).all()
+        has_next, has_prev = len(rows) > per_page, page > 1
+        items = rows[:per_page]
+    else:
+        direction, timestamp, id = decoded
+        if direction == 'next':
+            rows = query.filter(db.or_(
+                timestamp_col < timestamp, db.and_(timestamp_col == timestamp, id_col < id)
+            )).order_by(timestamp_col.desc(), id_col.desc()).limit(per_page + 1).all()
+            has_next, has_prev = len(rows) > per_page, True
+            items = rows[:per_page]
+        else:
+            rows = query.filter(db.or_(
+                timestamp_col > timestamp, db.and_(timestamp_col == timestamp, id_col > id)
+            )).order_by(timestamp_col.asc(), id_col.asc()).limit(per_page + 1).all()
+            has_next, has_prev = True, len(rows) > per_page
+            items = list(reversed(rows[:per_page]))
+    if not items:
+        return KeysetPage(items)
+    next_cursor = encode_cursor('next', items[-1].timestamp, items[-1].id) if has_next else None
+    prev_cursor = encode_cursor('prev', items[0].timestamp, items[0].id) if has_prev else None
+    return KeysetPage(items, next_cursor, prev_cursor)
@@ -0,0 +1,49 @@
+from sqlalchemy.orm import joinedload, selectinload
+from flask import abort
+from app import db
+from app.models import User, Resume, BasicInformation
+
+
+def resume_aggregate_options():
+    """
+    Загружает резюме целиком за фиксированное число запросов,
+    независимо от количества мест работы, навыков и ссылок
+    """
+    basic_information = joinedload(Resume.basic_information)
+    return (
+        basic_information.selectinload(BasicInformation.social_networks),
+        basic_information.selectinload(BasicInformation.key_skills),
+        selectinload(Resume.work_experience),
+        selectinload(Resume.educations),
+        selectinload(Resume.additional_educations),
+    )
+
+
+def load_resume(resume_id):
+    return Resume.query.options(*resume_aggregate_options()).filter_by(id=resume_id).first_or_404()
+
+
+def load_featured_resume(username):
+    """
+    Резюме для главной страницы: пользователь и резюме одним запросом
+    """
+    return Resume.query.join(User, User.id == Resume.user_id).filter(User.username == username).\
+        options(*resume_aggregate_options()).first_or_404()
+
+
+def featured_resume_id(username):
+    """
+    Только id резюме для главной - сам фрагмент обычно берется из кеша
+    """
+    row = db.session.query(Resume.id).join(User, User.id == Resume.user_id).\
+        filter(User.username == username).first()
+    if row is None:
+        abort(404)
+    return row[0]
+
+
+def load_user_resumes(user_id):
+    """
+    Список резюме пользователя - шаблону нужна только основная информация
+    """
+    return Resume.query.options(joinedload(Resume.basic_information)).filter_by(user_id=user_id).all()
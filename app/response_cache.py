@@ -0,0 +1,82 @@
+import hashlib
+import json
+from functools import wraps
+from flask import request, make_response, current_app
+from flask_login import current_user
+from werkzeug.local import LocalProxy
+from app.fragment_cache import make_backend, current_month, release
+
+
+class ResponseCache(object):
+    """
+    Кеш готовых страниц для анонимных GET-запросов с сильным ETag.
+    Ключ - путь с query string, поколение кеша, выкладка и месяц (из-за стажа
+    в резюме); invalidate() начинает новое поколение, и все ранее сохраненные
+    страницы перестают находиться.
+    """
+    def __init__(self, backend, release=''):
+        self.backend = backend
+        self.release = release
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, path):
+        """
+        Ключ страницы в текущем поколении. Берется один раз до отрисовки: страница,
+        отрисованная до invalidate(), не должна попасть в новое поколение
+        """
+        return f'page:{path}:v{self.backend.get_version("pages")}:{self.release}:{current_month()}'
+
+    def get(self, key):
+        value = self.backend.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, body, mimetype):
+        entry = {'body': body, 'etag': hashlib.sha1(body.encode()).hexdigest(), 'mimetype': mimetype}
+        self.backend.set(key, json.dumps(entry))
+        return entry
+
+    def invalidate(self):
+        self.backend.incr_version('pages')
+
+    def stats(self):
+        return {'backend': type(self.backend).__name__, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+
+def cached_for_anonymous(view):
+    """
+    Отдает анонимным посетителям страницу из кеша, а на совпавший If-None-Match - 304.
+    Авторизованные пользователи и POST-запросы идут мимо кеша.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or current_user.is_authenticated:
+            return view(*args, **kwargs)
+        key = page_cache.key(request.full_path)
+        entry = page_cache.get(key)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+            page_cache.misses += 1
+            entry = page_cache.set(key, response.get_data(as_text=True), response.mimetype)
+        else:
+            page_cache.hits += 1
+            response = make_response(entry['body'])
+            response.mimetype = entry['mimetype']
+        response.set_etag(entry['etag'])
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+    return wrapper
+
+
+def init_app(app):
+    app.extensions['page_cache'] = ResponseCache(make_backend(app.config), release(app))
+
+
+page_cache = LocalProxy(lambda: current_app.extensions['page_cache'])
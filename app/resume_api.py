@@ -0,0 +1,122 @@
+"""
+Резюме в JSON для интеграций: GET /api/resume/<id>.
+
+Без параметров отдается тот же документ, что в выгрузке. ?fields= выбирает
+части через запятую, вложенные - через точку:
+
+    ?fields=first_name,work_experience,basic_information.key_skills
+
+Загружаются только выбранные связи, обращение к остальным - ошибка
+(raiseload), а не тихий лишний запрос. У каждого объекта в ответе всегда
+есть id. ETag и Last-Modified строятся по Resume.version и
+Resume.last_modified, поэтому ответ 304 стоит одного запроса к таблице
+resume.
+"""
+import hashlib
+import json
+from sqlalchemy.orm import joinedload, selectinload, raiseload
+from app import db
+from app.export import row_to_dict, to_json
+from app.models import Resume, BasicInformation
+
+# связи, которые можно выбрать; обратные (author, resume) в документ не входят
+RELATIONSHIPS = {
+    Resume: ('basic_information', 'work_experience', 'educations', 'additional_educations'),
+    BasicInformation: ('social_networks', 'key_skills'),
+}
+
+
+def target(model, name):
+    return getattr(model, name).property.mapper.class_
+
+
+def parse_fields(value):
+    """
+    Дерево выбранных полей: {'work_experience': None, 'basic_information': {'key_skills': None}};
+    None - поле целиком. Пустой параметр - все резюме
+    """
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node, model = tree, Resume
+        names = path.split('.')
+        for depth, name in enumerate(names):
+            relationships = RELATIONSHIPS.get(model, ())
+            if name not in relationships and name not in model.__table__.c:
+                raise ValueError(f'Неизвестное поле {path!r}')
+            if depth == len(names) - 1:
+                node[name] = None
+            elif name not in relationships:
+                raise ValueError(f'У поля {".".join(names[:depth + 1])!r} нет вложенных полей')
+            elif node.get(name, {}) is None:
+                # родитель уже выбран целиком
+                break
+            else:
+                node = node.setdefault(name, {})
+                model = target(model, name)
+    return tree
+
+
+def canonical(tree):
+    if tree is None:
+        return '*'
+    return ','.join(name if tree[name] is None else f'{name}({canonical(tree[name])})' for name in sorted(tree))
+
+
+def loader_options(model, tree, parent=None):
+    """
+    selectinload (joinedload для основной информации) только для выбранных связей
+    """
+    options = []
+    for name in RELATIONSHIPS.get(model, ()):
+        if tree is not None and name not in tree:
+            continue
+        attribute = getattr(model, name)
+        if parent is None:
+            loader = joinedload(attribute) if name == 'basic_information' else selectinload(attribute)
+        else:
+            loader = parent.selectinload(attribute)
+        options.append(loader)
+        options += loader_options(target(model, name), None if tree is None else tree[name], loader)
+    options.append(raiseload('*') if parent is None else parent.raiseload('*'))
+    return options
+
+
+def project(obj, model, tree):
+    if tree is None:
+        document = row_to_dict(obj)
+        names = RELATIONSHIPS.get(model, ())
+    else:
+        document = {name: getattr(obj, name) for name in ['id'] + list(tree) if name in model.__table__.c}
+        names = [name for name in tree if name in RELATIONSHIPS.get(model, ())]
+    for name in names:
+        value = getattr(obj, name)
+        subtree = None if tree is None else tree[name]
+        if isinstance(value, list):
+            document[name] = [project(item, target(model, name), subtree) for item in value]
+        else:
+            document[name] = None if value is None else project(value, target(model, name), subtree)
+    return document
+
+
+def validators(resume_id, tree):
+    """
+    (ETag, Last-Modified) резюме по его строке, без дочерних таблиц; None - резюме нет
+    """
+    row = db.session.query(Resume.version, Resume.last_modified, Resume.timestamp).filter_by(id=resume_id).first()
+    if row is None:
+        return None
+    etag = f'{resume_id}-{row.version}'
+    if tree is not None:
+        # у разных наборов полей разные представления и разные ETag
+        etag += '-' + hashlib.md5(canonical(tree).encode()).hexdigest()[:8]
+    return etag, row.last_modified or row.timestamp
+
+
+def resume_json(resume_id, tree):
+    resume = Resume.query.options(*loader_options(Resume, tree)).filter_by(id=resume_id).first()
+    return json.dumps(project(resume, Resume, tree), default=to_json, ensure_ascii=False)
@@ -0,0 +1,234 @@
+"""
+Пакетное редактирование резюме одним запросом.
+
+PATCH /api/resume/<id> принимает JSON с изменениями нескольких частей
+резюме сразу, в тех же полях, что выгрузка и импорт:
+
+    {
+        "first_name": "Анна",
+        "basic_information": {
+            "salary": "200000",
+            "key_skills": {"add": ["Python"], "delete": [12]}
+        },
+        "work_experience": {
+            "add": [{"started_working": "03.2021", "organization": "..."}],
+            "update": [{"id": 5, "ending": "12.2022"}],
+            "delete": [6]
+        }
+    }
+
+Поля самого резюме и основной информации меняются по одному, у списков
+(work_experience, educations, additional_educations, а внутри основной
+информации social_networks и key_skills) - операции add, update и delete.
+Каждая затронутая часть проверяется формой пошагового мастера: переданные
+поля накладываются на текущие значения, поэтому обязательное поле нельзя
+стереть. Ошибки всех частей собираются за один проход, и если они есть,
+в базу не пишется ничего. Иначе изменения применяются в одной транзакции:
+update - executemany по первичному ключу, add - один insert на таблицу,
+delete - один DELETE ... IN.
+"""
+from sqlalchemy import bindparam
+from app import db
+from app import search as search_index
+from app.fragment_cache import fragment_cache
+from app.response_cache import page_cache
+from app.repository import load_resume
+from app.forms import ResumeForm, PersonalInformationForm, PositionForm, SocialNetworkForm, KeySkillsForm
+from app.importer import COLLECTIONS, Validator, form_fields, skill_ids
+from app.models import Resume, BasicInformation, SocialNetwork, KeySkills, WorkExperience, update_experience, \
+    index_resume_skills, touch_resume
+from app.skill_index import normalize_skill
+
+INFO_FORMS = (PersonalInformationForm, PositionForm)
+INFO_COLLECTIONS = (
+    ('social_networks', SocialNetworkForm, SocialNetwork),
+    ('key_skills', KeySkillsForm, KeySkills),
+)
+OPERATIONS = ('add', 'update', 'delete')
+
+
+def row_values(row, fields):
+    return {} if row is None else {field: getattr(row, field) for field in fields}
+
+
+class Plan(object):
+    """
+    Проверенные изменения резюме, готовые к записи
+    """
+    def __init__(self):
+        self.resume = None
+        self.basic_information = None
+        # (модель, внешний ключ, add, update, delete) на каждый затронутый список
+        self.collections = []
+
+    def changed(self, model):
+        return any(item[0] is model for item in self.collections)
+
+
+class PatchValidator(Validator):
+    def fields(self, data, form_classes, extra, prefix, errors):
+        """
+        Поля data, относящиеся к формам form_classes; неизвестные ключи - ошибка
+        """
+        if not isinstance(data, dict):
+            errors[prefix.rstrip('.')] = ['Ожидался объект']
+            return None
+        known = set(extra)
+        for form_class in form_classes:
+            known.update(form_fields(form_class))
+        for key in data:
+            if key not in known:
+                errors[f'{prefix}{key}'] = ['Неизвестное поле']
+        return {key: value for key, value in data.items() if key not in extra}
+
+    def scalars(self, row, data, form_classes, prefix, errors, required=()):
+        """
+        Значения полей после изменения или None, если поля части не менялись.
+        Проверяются формы, чьи поля переданы, и формы required
+        """
+        values = {}
+        for form_class in form_classes:
+            fields = form_fields(form_class)
+            if form_class in required or any(field in data for field in fields):
+                merged = dict(row_values(row, fields), **{key: data[key] for key in fields if key in data})
+                values.update(self.check(form_class, merged, prefix, errors))
+        return values or None
+
+    def collection(self, section, form_class, rows, prefix, errors):
+        """
+        Списки add, update (с row_id) и delete для одного списка резюме
+        """
+        if not isinstance(section, dict) or set(section) - set(OPERATIONS):
+            errors[prefix] = ['Ожидался объект с операциями add, update и delete']
+            return [], [], []
+        # строка вместо списка иначе разошлась бы на записи по одной букве
+        not_lists = [op for op in OPERATIONS if section.get(op) is not None and not isinstance(section[op], list)]
+        for op in not_lists:
+            errors[f'{prefix}.{op}'] = ['Ожидался список']
+        if not_lists:
+            return [], [], []
+        fields = form_fields(form_class)
+        current = {row.id: row for row in rows}
+
+        def existing(row_id):
+            return current.get(row_id) if isinstance(row_id, int) else None
+
+        adds, updates, deletes = [], [], []
+        for i, item in enumerate(section.get('add') or []):
+            if form_class is KeySkillsForm and not isinstance(item, dict):
+                item = {'skill_tag': item}
+            data = self.fields(item, [form_class], (), f'{prefix}.add[{i}].', errors)
+            if data is not None:
+                adds.append(self.check(form_class, data, f'{prefix}.add[{i}].', errors))
+        for i, item in enumerate(section.get('update') or []):
+            data = self.fields(item, [form_class], ('id',), f'{prefix}.update[{i}].', errors)
+            if data is None:
+                continue
+            row = existing(item.get('id'))
+            if row is None:
+                errors[f'{prefix}.update[{i}].id'] = ['Нет такой записи в резюме']
+                continue
+            merged = dict(row_values(row, fields), **data)
+            updates.append(dict(self.check(form_class, merged, f'{prefix}.update[{i}].', errors), row_id=row.id))
+        for i, row_id in enumerate(section.get('delete') or []):
+            if existing(row_id) is None:
+                errors[f'{prefix}.delete[{i}]'] = ['Нет такой записи в резюме']
+            else:
+                deletes.append(row_id)
+        return adds, updates, deletes
+
+    def basic_information(self, info, section, plan, errors):
+        names = [name for name, form_class, model in INFO_COLLECTIONS]
+        data = self.fields(section, INFO_FORMS, names, 'basic_information.', errors)
+        if data is None:
+            return
+        # новую основную информацию мастер создает формой персональной информации
+        required = () if info is not None or not data else (PersonalInformationForm,)
+        plan.basic_information = self.scalars(info, data, INFO_FORMS, 'basic_information.', errors, required)
+        for name, form_class, model in INFO_COLLECTIONS:
+            if name not in section:
+                continue
+            if info is None and plan.basic_information is None:
+                errors[f'basic_information.{name}'] = ['Сначала заполните персональную информацию']
+                continue
+            rows = getattr(info, name) if info is not None else []
+            plan.collections.append((model, 'basic_information_id') + self.collection(
+                section[name], form_class, rows, f'basic_information.{name}', errors
+            ))
+
+    def plan(self, resume, document):
+        """
+        Проверенный план изменений резюме и словарь ошибок
+        """
+        errors = {}
+        plan = Plan()
+        collections = [name for name, form_class, model in COLLECTIONS]
+        data = self.fields(document, [ResumeForm], ['basic_information'] + collections, '', errors)
+        if data is None:
+            return plan, errors
+        plan.resume = self.scalars(resume, data, [ResumeForm], '', errors)
+
+        if document.get('basic_information') is not None:
+            self.basic_information(resume.basic_information, document['basic_information'], plan, errors)
+        for name, form_class, model in COLLECTIONS:
+            if name in document:
+                plan.collections.append((model, 'resume_id') + self.collection(
+                    document[name], form_class, getattr(resume, name), name, errors
+                ))
+        return plan, errors
+
+
+def apply(resume, plan):
+    """
+    Записывает план в текущей транзакции; коммит - за вызывающим
+    """
+    if plan.resume is not None:
+        db.session.execute(Resume.__table__.update().where(Resume.id == resume.id).values(plan.resume))
+    info_id = resume.basic_information.id if resume.basic_information is not None else None
+    if plan.basic_information is not None:
+        table = BasicInformation.__table__
+        if info_id is None:
+            info_id = db.session.execute(table.insert(), dict(
+                plan.basic_information, resume_id=resume.id
+            )).inserted_primary_key[0]
+        else:
+            db.session.execute(table.update().where(table.c.id == info_id).values(plan.basic_information))
+
+    parents = {'resume_id': resume.id, 'basic_information_id': info_id}
+    for model, parent, adds, updates, deletes in plan.collections:
+        table = model.__table__
+        if model is KeySkills:
+            skills = skill_ids(item['skill_tag'] for item in adds + updates)
+            for item in adds + updates:
+                item['skill_id'] = skills.get(normalize_skill(item['skill_tag']))
+        if updates:
+            db.session.execute(table.update().where(table.c.id == bindparam('row_id')), updates)
+        if adds:
+            db.session.execute(table.insert(), [dict(item, **{parent: parents[parent]}) for item in adds])
+        if deletes:
+            db.session.execute(table.delete().where(table.c.id.in_(deletes)))
+
+    if plan.changed(WorkExperience):
+        update_experience(resume.id)
+    if plan.changed(KeySkills):
+        index_resume_skills(resume.id)
+
+
+def patch_resume(resume, document):
+    """
+    Проверяет и применяет изменения одной транзакцией; возвращает словарь
+    ошибок, пустой - если резюме изменено
+    """
+    plan, errors = PatchValidator().plan(resume, document)
+    if errors:
+        return errors
+    resume_id = resume.id
+    apply(resume, plan)
+    # загруженное резюме устарело: индекс строится по записанному
+    db.session.expire_all()
+    search_index.index_resume(load_resume(resume_id))
+    touch_resume(resume_id)
+    db.session.commit()
+    fragment_cache.bump(resume_id)
+    page_cache.invalidate()
+    return {}
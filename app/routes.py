@@ -1,25 +1,70 @@
 # -*- coding: utf-8 -*-
-from flask import render_template, flash, redirect, url_for, request
+import json
+from flask import Blueprint, current_app, render_template, flash, redirect, url_for, request, abort, jsonify, Markup, \
+    Response, stream_with_context
 from werkzeug.urls import url_parse
-from app import app, db
+from werkzeug.http import is_resource_modified
+from app import db
+from app.pagination import KeysetPage, keyset_paginate
+from app.feed import hydrate
+from app.hashing import HashingBusy
+from app.user_cache import user_cache
+from app.last_seen import last_seen_buffer
+from app.repository import load_resume, featured_resume_id, load_user_resumes
+from app.fragment_cache import fragment_cache
+from app.response_cache import page_cache, cached_for_anonymous
+from app import search as search_index
+from app import export as data_export
+from app import importer
+from app import resume_patch
+from app import resume_api
+from app.stream import stream_broker, post_event, event_stream
 from app.forms import LoginForm, RegistrationForm, EditProfileForm, NewPostForm, PersonalInformationForm, \
     SocialNetworkForm, PositionForm, WorkExperienceForm, AdditionalEducationForm, EducationForm, \
     KeySkillsForm, ResumeForm
 from flask_login import current_user, login_user, logout_user, login_required
 from app.models import User, Post, Resume, BasicInformation, SocialNetwork, KeySkills, WorkExperience, Education, \
-    AdditionalEducation
+    AdditionalEducation, index_resume_skills, skill_index, update_experience, touch_resume
+from app.dates import format_date, format_experience
 from datetime import datetime
 
+bp = Blueprint('main', __name__)
+bp.add_app_template_filter(format_date, 'date')
+bp.add_app_template_filter(format_experience, 'experience')
 
-@app.before_request
+
+@bp.before_app_request
 def before_request():
     if current_user.is_authenticated:
-        current_user.last_seen = datetime.now()
-        db.session.commit()
+        last_seen_buffer.touch(current_user, datetime.now())
+
 
+def server_busy(template, **context):
+    """
+    Быстрый отказ, когда очередь хеширования паролей переполнена
+    """
+    flash('Сервер перегружен, попробуйте еще раз через несколько секунд.')
+    return render_template(template, **context), 503, {'Retry-After': '2'}
 
-@app.route('/', methods=['GET', 'POST'])
-@app.route('/index', methods=['GET', 'POST'])
+
+def commit_resume(resume_id):
+    """
+    Единственный коммит изменения резюме: индекс и версия пишутся в той же
+    транзакции, кеши сбрасываются только после нее
+    """
+    db.session.flush()
+    # загруженное резюме устарело: индекс строится по записанному
+    db.session.expire_all()
+    search_index.index_resume(load_resume(resume_id))
+    touch_resume(resume_id)
+    db.session.commit()
+    fragment_cache.bump(resume_id)
+    page_cache.invalidate()
+
+
+@bp.route('/', methods=['GET', 'POST'])
+@bp.route('/index', methods=['GET', 'POST'])
+@cached_for_anonymous
 def index():
     """
     главная страница
@@ -31,92 +76,122 @@ def index():
             author=current_user
         )
         db.session.add(post)
+        db.session.flush()
+        search_index.index_post(post)
+        event = post_event(post)
         db.session.commit()
+        page_cache.invalidate()
+        stream_broker.publish(current_user.id, event)
         flash('Ваш пост опубликован!')
-        return redirect(url_for('index'))
-    page = request.args.get('page', 1, type=int)
-    posts = Post.query.order_by(Post.timestamp.desc()).paginate(page, app.config['POSTS_PER_PAGE'], False)
-    next_url = url_for('index', page=posts.next_num) if posts.has_next else None
-    prev_url = url_for('index', page=posts.prev_num) if posts.has_prev else None
-    user = User.query.filter_by(username='Svyat').first_or_404()
-    svyat_res = Resume.query.filter_by(user_id=user.id).first_or_404()
+        return redirect(url_for('main.index'))
+    posts = keyset_paginate(
+        Post.query, (Post.timestamp, Post.id), current_app.config['POSTS_PER_PAGE'],
+        cursor=request.args.get('cursor'), page=request.args.get('page', 1, type=int)
+    )
+    next_url = url_for('main.index', cursor=posts.next_cursor) if posts.has_next else None
+    prev_url = url_for('main.index', cursor=posts.prev_cursor) if posts.has_prev else None
+    resume_id = featured_resume_id('Svyat')
+    resume_html = fragment_cache.get_or_render(
+        resume_id, 'summary', lambda: render_template('_resume_summary.html', svyat_res=load_resume(resume_id))
+    )
     return render_template(
-        'index.html', title='Сайт-резюме', svyat_res=svyat_res, form=form, posts=posts.items,
+        'index.html', title='Сайт-резюме', resume_html=Markup(resume_html), form=form, posts=hydrate(posts.items),
         next_url=next_url, prev_url=prev_url
     )
 
 
-@app.route('/user/<username>')
+@bp.route('/user/<username>')
 @login_required
 def user(username):
     """
     Страница пользователя
     """
     user = User.query.filter_by(username=username).first_or_404()
+    cursor = request.args.get('cursor')
     page = request.args.get('page', 1, type=int)
-    posts = Post.query.order_by(Post.timestamp.desc()).filter_by(user_id=user.id).\
-        paginate(page, app.config['POSTS_PER_PAGE'], False)
-    follow_posts = current_user.followed_posts().paginate(page, app.config['POSTS_PER_PAGE'], False)
-    next_url = url_for('user', username=username, page=posts.next_num) if posts.has_next else None
-    prev_url = url_for('user', username=username, page=posts.prev_num) if posts.has_prev else None
-    follow_next_url = url_for('user', username=username, page=follow_posts.next_num) if follow_posts.has_next else None
-    follow_prev_url = url_for('user', username=username, page=follow_posts.prev_num) if follow_posts.has_prev else None
+    # страница показывает только одну из лент, вторую не запрашиваем
+    if user == current_user:
+        feed, keys = current_user.followed_feed()
+        posts = KeysetPage([])
+        follow_posts = keyset_paginate(feed, keys, current_app.config['POSTS_PER_PAGE'], cursor=cursor, page=page)
+    else:
+        posts = keyset_paginate(
+            Post.query.filter_by(user_id=user.id), (Post.timestamp, Post.id), current_app.config['POSTS_PER_PAGE'],
+            cursor=cursor, page=page
+        )
+        follow_posts = KeysetPage([])
+    next_url = url_for('main.user', username=username, cursor=posts.next_cursor) if posts.has_next else None
+    prev_url = url_for('main.user', username=username, cursor=posts.prev_cursor) if posts.has_prev else None
+    follow_next_url = url_for('main.user', username=username, cursor=follow_posts.next_cursor) \
+        if follow_posts.has_next else None
+    follow_prev_url = url_for('main.user', username=username, cursor=follow_posts.prev_cursor) \
+        if follow_posts.has_prev else None
     return render_template(
-        'user.html', user=user, posts=posts.items, follow_posts=follow_posts.items,
+        'user.html', user=user, posts=hydrate(posts.items), follow_posts=hydrate(follow_posts.items),
         next_url=next_url, prev_url=prev_url, follow_next_url=follow_next_url,
         follow_prev_url=follow_prev_url, title='Python developer'
     )
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """
     Вход
     """
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user is None or not user.check_password(form.password.data):
-            flash('Неправильный логин или пароль.')
-            return redirect(url_for('login'))
+        try:
+            if user is None or not user.check_password(form.password.data):
+                flash('Неправильный логин или пароль.')
+                return redirect(url_for('main.login'))
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
+                db.session.commit()
+                user_cache.invalidate(user.id)
+        except HashingBusy:
+            return server_busy('login.html', title='Вход', form=form)
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
         if not next_page or url_parse(next_page).netloc != '':
-            next_page = url_for('index')
+            next_page = url_for('main.index')
         return redirect(next_page)
     return render_template('login.html', title='Вход', form=form)
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """
     Выход
     """
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     """
     Регистрация
     """
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = RegistrationForm()
     if form.validate_on_submit():
         user = User(username=form.username.data, email=form.email.data)
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except HashingBusy:
+            return server_busy('register.html', title='Регистрация', form=form)
         db.session.add(user)
         db.session.commit()
         flash('Поздравляем, вы зарегистрированы!')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('register.html', title='Регистрация', form=form)
 
 
-@app.route('/edit_profile', methods=['GET', 'POST'])
+@bp.route('/edit_profile', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
     """
@@ -127,15 +202,16 @@ def edit_profile():
         current_user.username = form.username.data
         current_user.about_me = form.about_me.data
         db.session.commit()
+        user_cache.invalidate(current_user.id)
         flash('Изменения сохранены.')
-        return redirect(url_for('user', username=current_user.username))
+        return redirect(url_for('main.user', username=current_user.username))
     elif request.method == 'GET':
         form.username.data = current_user.username
         form.about_me.data = current_user.about_me
     return render_template('edit_profile.html', title='Редактировать профиль.', form=form)
 
 
-@app.route('/follow/<username>')
+@bp.route('/follow/<username>')
 @login_required
 def follow(username):
     """
@@ -144,17 +220,17 @@ def follow(username):
     user = User.query.filter_by(username=username).first()
     if user is None:
         flash('Пользователь {} не найден.'.format(username))
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     if user == current_user:
         flash('Вы подписаны.')
-        return redirect(url_for('user', username=username))
+        return redirect(url_for('main.user', username=username))
     current_user.follow(user)
     db.session.commit()
     flash('Вы подписаны на {}!'.format(username))
-    return redirect(url_for('user', username=username))
+    return redirect(url_for('main.user', username=username))
 
 
-@app.route('/unfollow/<username>')
+@bp.route('/unfollow/<username>')
 @login_required
 def unfollow(username):
     """
@@ -163,17 +239,17 @@ def unfollow(username):
     user = User.query.filter_by(username=username).first()
     if user is None:
         flash('Пользователь {} не найден.'.format(username))
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     if user == current_user:
         flash('Вы не можете отписаться.')
-        return redirect(url_for('user', username=username))
+        return redirect(url_for('main.user', username=username))
     current_user.unfollow(user)
     db.session.commit()
     flash('Вы не подписаны на {}.'.format(username))
-    return redirect(url_for('user', username=username))
+    return redirect(url_for('main.user', username=username))
 
 
-@app.route('/new_post', methods=['GET', 'POST'])
+@bp.route('/new_post', methods=['GET', 'POST'])
 @login_required
 def new_post():
     """
@@ -183,34 +259,62 @@ def new_post():
     if form.validate_on_submit():
         post = Post(body=form.post.data, user_id=current_user.id)
         db.session.add(post)
+        db.session.flush()
+        search_index.index_post(post)
+        event = post_event(post)
         db.session.commit()
+        page_cache.invalidate()
+        stream_broker.publish(current_user.id, event)
         flash('Пост опубликован.')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     return render_template('new_post.html', title='Написать пост', form=form)
 
 
-@app.route('/user/<username>/resume')
+@bp.route('/stream')
+@login_required
+def stream():
+    """
+    Живая лента: новые посты подписок в формате Server-Sent Events
+    """
+    subscription = stream_broker.subscribe(current_user.id)
+    if subscription is None:
+        return Response('Слишком много открытых соединений', status=503, mimetype='text/plain',
+                        headers={'Retry-After': '30'})
+    # поток открыт минутами: соединение с базой возвращаем в пул сразу
+    db.session.remove()
+    return Response(
+        event_stream(stream_broker._get_current_object(), subscription, current_app.config['STREAM_HEARTBEAT_SECONDS'],
+                     current_app.config['STREAM_MAX_SECONDS']),
+        mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@bp.route('/user/<username>/resume')
 @login_required
 def resume(username):
     """
     Страница с личными резюме пользователя
     """
     user = User.query.filter_by(username=username).first_or_404()
-    resume = Resume.query.filter_by(user_id=user.id).all()
+    resume = load_user_resumes(user.id)
     return render_template('resume.html', user=user, resume=resume, title='Резюме')
 
 
-@app.route('/resume/<res_id>')
+@bp.route('/resume/<res_id>')
 @login_required
 def this_resume(res_id):
     """
     Страница редактирования конкретного резюме пользователя
     """
-    resume_c = Resume.query.filter_by(id=res_id).first_or_404()
-    return render_template('this_resume.html', resume_с=resume_c, title='Резюме')
+    if not res_id.isdigit():
+        abort(404)
+    resume_html = fragment_cache.get_or_render(
+        int(res_id), 'full', lambda: render_template('_resume.html', resume_с=load_resume(res_id))
+    )
+    return render_template('this_resume.html', resume_html=Markup(resume_html), title='Резюме')
 
 
-@app.route('/resume_create', methods=['GET', 'POST'])
+@bp.route('/resume_create', methods=['GET', 'POST'])
 @login_required
 def resume_create():
     """
@@ -227,13 +331,15 @@ def resume_create():
             user_id=current_user.id
         )
         db.session.add(c_resume)
+        db.session.flush()
+        search_index.index_resume(c_resume)
         db.session.commit()
         flash('Новое резюме создано!')
-        return redirect(url_for('this_resume', res_id=c_resume.id))
+        return redirect(url_for('main.this_resume', res_id=c_resume.id))
     return render_template('resume_create.html', title='Основная информация', form=form)
 
 
-@app.route('/<resume_id>/edit_resume', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/edit_resume', methods=['GET', 'POST'])
 @login_required
 def edit_resume(resume_id):
     """
@@ -247,9 +353,9 @@ def edit_resume(resume_id):
         resume.patronymic = form.patronymic.data
         resume.date_of_birth = form.date_of_birth.data
         resume.gender = form.gender.data
-        db.session.commit()
+        commit_resume(resume.id)
         flash('Основная информация отредактирована.')
-        return redirect(url_for('this_resume', res_id=resume.id))
+        return redirect(url_for('main.this_resume', res_id=resume.id))
     elif request.method == 'GET':
         form.first_name.data = resume.first_name
         form.surname.data = resume.surname
@@ -259,7 +365,7 @@ def edit_resume(resume_id):
     return render_template('resume_create.html', title='Основная информация', form=form)
 
 
-@app.route('/<resume_id>/personal_information', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/personal_information', methods=['GET', 'POST'])
 @login_required
 def personal_information(resume_id):
     """
@@ -277,13 +383,13 @@ def personal_information(resume_id):
             resume_id=resume_id
         )
         db.session.add(person_inform)
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Персональная информация заполнена!')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     return render_template('personal_information.html', title='Персональная информация', form=form)
 
 
-@app.route('/<resume_id>/edit_personal_information', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/edit_personal_information', methods=['GET', 'POST'])
 @login_required
 def edit_personal_information(resume_id):
     """
@@ -298,9 +404,9 @@ def edit_personal_information(resume_id):
         person_inform.about_me = form.about_me.data
         person_inform.knowledge_languages = form.knowledge_languages.data
         person_inform.citizenship = form.citizenship.data
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Персональная информация изменена.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     elif request.method == 'GET':
         form.city_of_residence.data = person_inform.city_of_residence
         form.phone_number.data = person_inform.phone_number
@@ -311,7 +417,7 @@ def edit_personal_information(resume_id):
     return render_template('personal_information.html', title='Персональная информация', form=form)
 
 
-@app.route('/<resume_id>/edit_position', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/edit_position', methods=['GET', 'POST'])
 @login_required
 def edit_position(resume_id):
     """
@@ -325,9 +431,9 @@ def edit_position(resume_id):
         person_inform.salary = form.salary.data
         person_inform.employment = form.employment.data
         person_inform.work_schedule = form.work_schedule.data
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Готово')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     elif request.method == 'GET':
         form.desired_position.data = person_inform.desired_position
         form.professional_area.data = person_inform.professional_area
@@ -337,7 +443,7 @@ def edit_position(resume_id):
     return render_template('edit_position.html', title='Желаемая позиция', form=form)
 
 
-@app.route('/<resume_id>/<basic_information_id>/social_network', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/<basic_information_id>/social_network', methods=['GET', 'POST'])
 @login_required
 def social_network(basic_information_id, resume_id):
     """
@@ -351,13 +457,13 @@ def social_network(basic_information_id, resume_id):
             basic_information_id=basic_information_id
         )
         db.session.add(soc_net)
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Опыт работы сохранен.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     return render_template('social_network.html', title='Соц. сеть', form=form)
 
 
-@app.route('/<resume_id>/<social_network_id>/edit_social_network', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/<social_network_id>/edit_social_network', methods=['GET', 'POST'])
 @login_required
 def edit_social_network(social_network_id, resume_id):
     """
@@ -368,16 +474,16 @@ def edit_social_network(social_network_id, resume_id):
     if form.validate_on_submit():
         soc_net.link_social_network = form.link_social_network.data
         soc_net.comment_link_social_network = form.comment_link_social_network.data
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Ссылка на соц. сеть изменена.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     elif request.method == 'GET':
         form.link_social_network.data = soc_net.link_social_network
         form.comment_link_social_network.data = soc_net.comment_link_social_network
     return render_template('social_network.html', title='Соц. сеть', form=form)
 
 
-@app.route('/<resume_id>/<basic_information_id>/key_skill', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/<basic_information_id>/key_skill', methods=['GET', 'POST'])
 @login_required
 def key_skills(basic_information_id, resume_id):
     """
@@ -385,18 +491,17 @@ def key_skills(basic_information_id, resume_id):
     """
     form = KeySkillsForm()
     if form.validate_on_submit():
-        key_skill = KeySkills(
-            skill_tag=form.skill_tag.data,
-            basic_information_id=basic_information_id
-        )
+        key_skill = KeySkills(basic_information_id=basic_information_id)
+        key_skill.set_tag(form.skill_tag.data)
         db.session.add(key_skill)
-        db.session.commit()
+        index_resume_skills(resume_id)
+        commit_resume(resume_id)
         flash('Ключевой навык добавлен.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     return render_template('key_skill.html', title='Ключевой навык', form=form)
 
 
-@app.route('/<resume_id>/<key_skill_id>/edit_key_skill', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/<key_skill_id>/edit_key_skill', methods=['GET', 'POST'])
 @login_required
 def edit_key_skills(key_skill_id, resume_id):
     """
@@ -405,16 +510,17 @@ def edit_key_skills(key_skill_id, resume_id):
     form = KeySkillsForm()
     key_skill = KeySkills.query.filter_by(id=key_skill_id).first_or_404()
     if form.validate_on_submit():
-        key_skill.skill_tag = form.skill_tag.data
-        db.session.commit()
+        key_skill.set_tag(form.skill_tag.data)
+        index_resume_skills(resume_id)
+        commit_resume(resume_id)
         flash('Ключевой навык изменен.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     elif request.method == 'GET':
         form.skill_tag.data = key_skill.skill_tag
     return render_template('key_skill.html', title='Ключевой навык', form=form)
 
 
-@app.route('/<resume_id>/work_experience', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/work_experience', methods=['GET', 'POST'])
 @login_required
 def work_experience(resume_id):
     """
@@ -433,13 +539,14 @@ def work_experience(resume_id):
             resume_id=resume_id
         )
         db.session.add(work_exp)
-        db.session.commit()
+        update_experience(resume_id)
+        commit_resume(resume_id)
         flash('Опыт работы заполнен.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     return render_template('work_experience.html', title='Опыт работы', form=form)
 
 
-@app.route('/<resume_id>/<work_id>/edit_work_experience', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/<work_id>/edit_work_experience', methods=['GET', 'POST'])
 @login_required
 def edit_work_experience(resume_id, work_id):
     """
@@ -455,9 +562,10 @@ def edit_work_experience(resume_id, work_id):
         work_exp.company_field_activity = form.company_field_activity.data
         work_exp.post = form.post.data
         work_exp.responsibilities_workplace = form.responsibilities_workplace.data
-        db.session.commit()
+        update_experience(resume_id)
+        commit_resume(resume_id)
         flash('Опыт работы изменен.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     elif request.method == 'GET':
         form.started_working.data = work_exp.started_working
         form.ending.data = work_exp.ending
@@ -469,7 +577,7 @@ def edit_work_experience(resume_id, work_id):
     return render_template('work_experience.html', title='Опыт работы', form=form)
 
 
-@app.route('/<resume_id>/education', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/education', methods=['GET', 'POST'])
 @login_required
 def education(resume_id):
     """
@@ -486,13 +594,13 @@ def education(resume_id):
             resume_id=resume_id
         )
         db.session.add(training)
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Образование заполнено.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     return render_template('education.html', title='Образование', form=form)
 
 
-@app.route('/<resume_id>/<education_id>/edit_education', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/<education_id>/edit_education', methods=['GET', 'POST'])
 @login_required
 def edit_education(resume_id, education_id):
     """
@@ -506,9 +614,9 @@ def edit_education(resume_id, education_id):
         training.faculty = form.faculty.data
         training.specialization = form.specialization.data
         training.year_completion = form.year_completion.data
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Образвание изменено.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     elif request.method == 'GET':
         form.level.data = training.level
         form.educational_institution.data = training.educational_institution
@@ -518,7 +626,7 @@ def edit_education(resume_id, education_id):
     return render_template('education.html', title='Опыт работы', form=form)
 
 
-@app.route('/<resume_id>/additional_education', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/additional_education', methods=['GET', 'POST'])
 @login_required
 def additional_education(resume_id):
     """
@@ -534,13 +642,13 @@ def additional_education(resume_id):
             resume_id=resume_id
         )
         db.session.add(training)
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Доп. образование заполнено.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     return render_template('additional_education.html', title='Доп. образование', form=form)
 
 
-@app.route('/<resume_id>/<additional_education_id>/edit_additional_education', methods=['GET', 'POST'])
+@bp.route('/<resume_id>/<additional_education_id>/edit_additional_education', methods=['GET', 'POST'])
 @login_required
 def edit_additional_education(resume_id, additional_education_id):
     """
@@ -553,12 +661,144 @@ def edit_additional_education(resume_id, additional_education_id):
         training.specialization = form.specialization.data
         training.year_completion = form.year_completion.data
         training.comment = form.comment.data
-        db.session.commit()
+        commit_resume(resume_id)
         flash('Доп. образование изменено.')
-        return redirect(url_for('this_resume', res_id=resume_id))
+        return redirect(url_for('main.this_resume', res_id=resume_id))
     elif request.method == 'GET':
         form.conducting_organization.data = training.conducting_organization
         form.specialization.data = training.specialization
         form.year_completion.data = training.year_completion
         form.comment.data = training.comment
     return render_template('additional_education.html', title='Доп. образование', form=form)
+
+
+@bp.route('/search')
+def search():
+    """
+    Поиск по постам, а для вошедших пользователей и по резюме
+    """
+    q = request.args.get('q', '').strip()
+    kind = request.args.get('type', 'post')
+    if kind not in search_index.KINDS or (kind == 'resume' and current_user.is_anonymous):
+        kind = 'post'
+    page = min(max(request.args.get('page', 1, type=int), 1), current_app.config['SEARCH_MAX_PAGE'])
+    ids, has_next = search_index.search(kind, q, current_app.config['SEARCH_RESULTS_PER_PAGE'], page)
+    model = Post if kind == 'post' else Resume
+    found = {item.id: item for item in model.query.filter(model.id.in_(ids))} if ids else {}
+    results = [found[id] for id in ids if id in found]
+    if kind == 'post':
+        results = hydrate(results)
+    next_url = url_for('main.search', q=q, type=kind, page=page + 1) \
+        if has_next and page < current_app.config['SEARCH_MAX_PAGE'] else None
+    prev_url = url_for('main.search', q=q, type=kind, page=page - 1) if page > 1 else None
+    return render_template(
+        'search.html', title='Поиск', q=q, kind=kind, results=results, next_url=next_url, prev_url=prev_url
+    )
+
+
+@bp.route('/skills')
+@login_required
+def skills():
+    """
+    id резюме по навыкам: ?all=python,flask - все навыки сразу, ?any=docker,linux - хотя бы один
+    """
+    def names(arg):
+        return [name for value in request.args.getlist(arg) for name in value.split(',') if name.strip()]
+
+    ids = skill_index.lookup(all=names('all'), any=names('any'))
+    # отрицательный limit срезал бы список с конца
+    limit = max(0, min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify(count=len(ids), resumes=ids[:limit])
+
+
+@bp.route('/export/<kind>.<fmt>')
+@login_required
+def export(kind, fmt):
+    """
+    Потоковая выгрузка всех резюме или постов: /export/resumes.zip, /export/posts.ndjson
+    """
+    if fmt not in data_export.FORMATS.get(kind, ()):
+        abort(404)
+    if current_user.username not in current_app.config['EXPORT_USERS']:
+        abort(403)
+    return Response(
+        stream_with_context(data_export.export(kind, fmt, current_app.config['EXPORT_BATCH_SIZE'])),
+        mimetype='application/zip' if fmt == 'zip' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={kind}.{fmt}'}
+    )
+
+
+@bp.route('/import/resumes', methods=['POST'])
+@login_required
+def import_resumes():
+    """
+    Массовое создание резюме текущего пользователя из JSON, NDJSON или CSV
+    (формат - по Content-Type); в ответе id созданных резюме и ошибки по записям
+    """
+    fmt = importer.FORMATS.get(request.mimetype)
+    if fmt is None:
+        return jsonify(error=f'Поддерживаются {", ".join(importer.FORMATS)}'), 415
+    try:
+        documents = importer.parse(request.get_data(as_text=True), fmt)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(importer.import_resumes(documents, current_user.id))
+
+
+@bp.route('/api/resume/<int:resume_id>')
+@login_required
+def api_resume(resume_id):
+    """
+    Резюме в JSON, целиком или только поля из ?fields= (см. app.resume_api);
+    если резюме не менялось с прошлого запроса - 304 по ETag или Last-Modified
+    """
+    try:
+        fields = resume_api.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    validators = resume_api.validators(resume_id, fields)
+    if validators is None:
+        abort(404)
+    etag, last_modified = validators
+    if is_resource_modified(request.environ, etag, last_modified=last_modified):
+        response = Response(resume_api.resume_json(resume_id, fields), mimetype='application/json')
+    else:
+        response = Response(status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # ответ зависит от входа, общие кеши его хранить не должны; браузер каждый раз перепроверяет
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@bp.route('/api/resume/<int:resume_id>', methods=['PATCH'])
+@login_required
+def patch_resume(resume_id):
+    """
+    Изменение нескольких частей своего резюме одним запросом (см. app.resume_patch);
+    в ответе резюме целиком, как в выгрузке, или ошибки по полям
+    """
+    resume = load_resume(resume_id)
+    if resume.user_id != current_user.id:
+        abort(403)
+    document = request.get_json(silent=True)
+    if not isinstance(document, dict):
+        return jsonify(error='Ожидался JSON-объект с изменениями'), 400
+    errors = resume_patch.patch_resume(resume, document)
+    if errors:
+        return jsonify(errors=errors), 400
+    return Response(
+        json.dumps(data_export.resume_document(load_resume(resume_id)), default=data_export.to_json,
+                   ensure_ascii=False),
+        mimetype='application/json'
+    )
+
+
+@bp.route('/cache_stats')
+@login_required
+def cache_stats():
+    """
+    Счетчики попаданий в кеш фрагментов резюме и кеш страниц
+    """
+    return jsonify(fragments=fragment_cache.stats(), pages=page_cache.stats())
@@ -0,0 +1,167 @@
+"""
+Полнотекстовый поиск по постам и резюме.
+
+На SQLite индекс - таблицы FTS5 post_search и resume_search, rowid в них
+совпадает с id поста или резюме. На PostgreSQL - те же таблицы с колонкой
+tsvector и GIN-индексом. Маршруты, создающие и меняющие посты и резюме,
+обновляют индекс сразу; flask search reindex пересобирает его целиком.
+"""
+import re
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.models import Post, Resume
+from app.repository import resume_aggregate_options
+
+KINDS = ('post', 'resume')
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+class SQLiteSearch(object):
+    def create(self, connection):
+        for kind in KINDS:
+            connection.execute(text(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {kind}_search '
+                f'USING fts5(document, tokenize="unicode61 remove_diacritics 2")'
+            ))
+
+    def drop(self, connection):
+        for kind in KINDS:
+            connection.execute(text(f'DROP TABLE IF EXISTS {kind}_search'))
+
+    def index(self, connection, kind, id, document):
+        connection.execute(text(f'DELETE FROM {kind}_search WHERE rowid = :id'), {'id': id})
+        connection.execute(text(f'INSERT INTO {kind}_search (rowid, document) VALUES (:id, :document)'),
+                           {'id': id, 'document': document})
+
+    def index_all_posts(self, connection):
+        connection.execute(text('DELETE FROM post_search'))
+        connection.execute(text('INSERT INTO post_search (rowid, document) SELECT id, body FROM post'))
+        connection.execute(text("INSERT INTO post_search (post_search) VALUES ('optimize')"))
+
+    def query(self, words):
+        # каждое слово в кавычках, чтобы ввод пользователя не разбирался как синтаксис FTS5.
+        # Поиска по префиксу нет: FTS5 собирает для него весь список совпадений в памяти
+        return ' '.join(f'"{word}"' for word in words)
+
+    def search(self, connection, kind, words, limit, offset, candidates):
+        # FTS5 обходит совпадения по убыванию rowid и останавливается на candidates,
+        # bm25 считается только для них
+        return connection.execute(text(
+            f'SELECT rowid FROM (SELECT rowid, rank FROM {kind}_search WHERE {kind}_search MATCH :query '
+            f'ORDER BY rowid DESC LIMIT :candidates) ORDER BY rank, rowid DESC LIMIT :limit OFFSET :offset'
+        ), {'query': self.query(words), 'candidates': candidates, 'limit': limit, 'offset': offset}).scalars().all()
+
+
+class PostgresSearch(object):
+    def create(self, connection):
+        for kind in KINDS:
+            connection.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {kind}_search (id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)'
+            ))
+            connection.execute(text(
+                f'CREATE INDEX IF NOT EXISTS ix_{kind}_search_document ON {kind}_search USING GIN (document)'
+            ))
+
+    def drop(self, connection):
+        for kind in KINDS:
+            connection.execute(text(f'DROP TABLE IF EXISTS {kind}_search'))
+
+    def index(self, connection, kind, id, document):
+        connection.execute(text(
+            f"INSERT INTO {kind}_search (id, document) VALUES (:id, to_tsvector('simple', :document)) "
+            f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document"
+        ), {'id': id, 'document': document})
+
+    def index_all_posts(self, connection):
+        connection.execute(text('DELETE FROM post_search'))
+        connection.execute(text(
+            "INSERT INTO post_search (id, document) SELECT id, to_tsvector('simple', coalesce(body, '')) FROM post"
+        ))
+
+    def query(self, words):
+        return ' & '.join(words)
+
+    def search(self, connection, kind, words, limit, offset, candidates):
+        return connection.execute(text(
+            f"SELECT id FROM (SELECT id, document FROM {kind}_search WHERE document @@ to_tsquery('simple', :query) "
+            f"ORDER BY id DESC LIMIT :candidates) found, to_tsquery('simple', :query) query "
+            f"ORDER BY ts_rank(document, query) DESC, id DESC LIMIT :limit OFFSET :offset"
+        ), {'query': self.query(words), 'candidates': candidates, 'limit': limit, 'offset': offset}).scalars().all()
+
+
+def backend(connection):
+    if connection.dialect.name == 'postgresql':
+        return PostgresSearch()
+    return SQLiteSearch()
+
+
+@db.event.listens_for(db.metadata, 'after_create')
+def create_search_tables(target, connection, **kwargs):
+    backend(connection).create(connection)
+
+
+@db.event.listens_for(db.metadata, 'before_drop')
+def drop_search_tables(target, connection, **kwargs):
+    backend(connection).drop(connection)
+
+
+def resume_document(resume):
+    """
+    Текст резюме для индекса: ФИО, желаемая должность, навыки, опыт и образование
+    """
+    parts = [resume.surname, resume.first_name, resume.patronymic]
+    info = resume.basic_information
+    if info is not None:
+        parts += [info.desired_position, info.professional_area, info.city_of_residence, info.about_me,
+                  info.knowledge_languages]
+        parts += [skill.skill_tag for skill in info.key_skills]
+    for work in resume.work_experience:
+        parts += [work.organization, work.post, work.company_field_activity, work.responsibilities_workplace]
+    for training in resume.educations:
+        parts += [training.educational_institution, training.faculty, training.specialization]
+    for training in resume.additional_educations:
+        parts += [training.conducting_organization, training.specialization, training.comment]
+    return ' '.join(part for part in parts if part)
+
+
+def index_post(post):
+    connection = db.session.connection()
+    backend(connection).index(connection, 'post', post.id, post.body or '')
+
+
+def index_resume(resume):
+    connection = db.session.connection()
+    backend(connection).index(connection, 'resume', resume.id, resume_document(resume))
+
+
+def search(kind, q, per_page, page=1):
+    """
+    id найденных постов или резюме по убыванию релевантности и признак следующей страницы.
+    Ранжируются только SEARCH_MAX_CANDIDATES самых новых совпадений, чтобы частые
+    слова не замедляли поиск по мере роста базы
+    """
+    words = WORD.findall(q.lower())
+    if not words:
+        return [], False
+    connection = db.session.connection()
+    ids = backend(connection).search(connection, kind, words, per_page + 1, (page - 1) * per_page,
+                                     current_app.config['SEARCH_MAX_CANDIDATES'])
+    return ids[:per_page], len(ids) > per_page
+
+
+def reindex(batch_size=500):
+    """
+    Пересобирает индекс: посты одним INSERT ... SELECT, резюме пачками
+    """
+    connection = db.session.connection()
+    search_backend = backend(connection)
+    search_backend.create(connection)
+    search_backend.index_all_posts(connection)
+    connection.execute(text('DELETE FROM resume_search'))
+    count = 0
+    for resume in Resume.query.options(*resume_aggregate_options()).order_by(Resume.id).yield_per(batch_size):
+        search_backend.index(connection, 'resume', resume.id, resume_document(resume))
+        count += 1
+    db.session.commit()
+    return db.session.query(Post).count(), count
@@ -0,0 +1,136 @@
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+
+
+def normalize_skill(tag):
+    """
+    Ключ навыка в словаре: без лишних пробелов и без учета регистра
+    """
+    return ' '.join((tag or '').split()).casefold()
+
+
+def intersect(a, b):
+    """
+    Пересечение двух отсортированных массивов: проходим по меньшему,
+    в большем ищем бинарным поиском, не возвращаясь назад
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    result = array('l')
+    lo = 0
+    for value in a:
+        lo = bisect_left(b, value, lo)
+        if lo == len(b):
+            break
+        if b[lo] == value:
+            result.append(value)
+    return result
+
+
+def union(arrays):
+    result = array('l')
+    for value in heapq.merge(*arrays):
+        if not result or result[-1] != value:
+            result.append(value)
+    return result
+
+
+class SkillIndex(object):
+    """
+    Инвертированный индекс навыков в памяти процесса: словарь нормализованных
+    названий и для каждого навыка отсортированный массив id резюме. Запросы
+    "знает X и Y" и "знает X или Y" - пересечение и объединение массивов.
+
+    Как и граф подписок, индекс загружается при первом обращении, меняется
+    на месте при правке навыков резюме и перечитывается целиком, если номер
+    поколения в общем бэкенде кеша увеличил другой воркер.
+    """
+    def __init__(self, load_pairs, backend):
+        self.load_pairs = load_pairs
+        self.backend = backend
+        self.generation = None
+        self._ids = {}
+        self._resumes = {}
+        self._skills = {}
+        self._lock = threading.RLock()
+
+    def _ensure(self):
+        if self.generation is None or self.generation != self.backend.get_version('skill-index'):
+            self.reload()
+
+    def reload(self):
+        ids, resumes, skills = {}, {}, {}
+        with self._lock:
+            generation = self.backend.get_version('skill-index')
+            for skill_id, name, resume_id in self.load_pairs():
+                ids[name] = skill_id
+                if resume_id is not None:
+                    resumes.setdefault(skill_id, set()).add(resume_id)
+                    skills.setdefault(resume_id, set()).add(skill_id)
+            self._ids = ids
+            self._resumes = {skill_id: array('l', sorted(values)) for skill_id, values in resumes.items()}
+            self._skills = {resume_id: array('l', sorted(values)) for resume_id, values in skills.items()}
+            self.generation = generation
+
+    def invalidate(self, *args, **kwargs):
+        self.generation = None
+
+    def committed(self, *args, **kwargs):
+        generation = self.backend.incr_version('skill-index')
+        if self.generation is not None and generation == self.generation + 1:
+            self.generation = generation
+        else:
+            self.generation = None
+
+    def replace(self, resume_id, skills):
+        """
+        Заменяет навыки резюме; skills - пары (id навыка, нормализованное название)
+        """
+        with self._lock:
+            self._ensure()
+            new = {skill_id for skill_id, name in skills}
+            old = set(self._skills.get(resume_id, ()))
+            for skill_id in old - new:
+                ids = self._resumes[skill_id]
+                del ids[bisect_left(ids, resume_id)]
+            for skill_id in new - old:
+                ids = self._resumes.setdefault(skill_id, array('l'))
+                ids.insert(bisect_left(ids, resume_id), resume_id)
+            for skill_id, name in skills:
+                self._ids[name] = skill_id
+            self._skills[resume_id] = array('l', sorted(new))
+
+    def skills_of(self, resume_id):
+        with self._lock:
+            self._ensure()
+            return list(self._skills.get(resume_id, ()))
+
+    def lookup(self, all=(), any=()):
+        """
+        Отсортированные id резюме, в которых есть все навыки из all
+        и хотя бы один из any (пустой список условий не ограничивает выборку)
+        """
+        with self._lock:
+            self._ensure()
+            arrays = []
+            for name in {normalize_skill(name) for name in all} - {''}:
+                skill_id = self._ids.get(name)
+                if skill_id is None:
+                    return []
+                arrays.append(self._resumes.get(skill_id, array('l')))
+            wanted = {self._ids.get(normalize_skill(name)) for name in any} - {None}
+            if any and not wanted:
+                return []
+            if wanted:
+                arrays.append(union([self._resumes.get(skill_id, ()) for skill_id in wanted]))
+            if not arrays:
+                return []
+            arrays.sort(key=len)
+            result = arrays[0]
+            for ids in arrays[1:]:
+                if not result:
+                    break
+                result = intersect(result, ids)
+            return list(result)
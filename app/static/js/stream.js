@@ -0,0 +1,27 @@
+// Живая лента: считает новые посты из /stream и предлагает обновить страницу
+(function () {
+    var banner = document.getElementById('new-posts');
+    if (!banner || !window.EventSource) {
+        return;
+    }
+    var link = banner.querySelector('a');
+    var count = 0;
+    var source = new EventSource(banner.getAttribute('data-stream'));
+
+    function show(text) {
+        link.textContent = text;
+        banner.hidden = false;
+    }
+
+    source.addEventListener('post', function () {
+        count += 1;
+        show('Новых постов: ' + count + '. Обновить ленту');
+    });
+    source.addEventListener('resync', function () {
+        show('Лента изменилась. Обновить');
+    });
+    link.addEventListener('click', function (event) {
+        event.preventDefault();
+        window.location.reload();
+    });
+})();
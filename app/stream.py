@@ -0,0 +1,239 @@
+"""
+Живая лента через Server-Sent Events.
+
+Новые посты публикуются в брокер, а он раздает их открытым соединениям
+/stream подписчиков автора (и самому автору). У каждого соединения своя
+очередь на STREAM_QUEUE_SIZE событий: публикация никогда не ждет
+медленного клиента - переполненная очередь сбрасывается, и клиент получает
+одно событие resync, по которому перечитывает ленту целиком. Соединений на
+воркер не больше STREAM_MAX_CONNECTIONS, каждое закрывается через
+STREAM_MAX_SECONDS, и браузер переподключается сам.
+
+Брокеры:
+  memory - события только внутри процесса (один воркер, тесты);
+  sqlite - файл STREAM_BROKER_PATH, общий для воркеров на одной машине:
+           публикация пишет строку, а поток в каждом воркере раз в
+           STREAM_POLL_INTERVAL секунд забирает новые. Локальная замена
+           redis pub/sub, как SQLiteBackend у кеша фрагментов.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+RESYNC = {'event': 'resync', 'data': {}}
+# через сколько миллисекунд браузер переподключается после обрыва
+RETRY_MS = 3000
+
+
+class Subscription(object):
+    """
+    Очередь событий одного соединения
+    """
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.maxsize = maxsize
+        self.events = deque()
+        self.overflowed = False
+        self.closed = False
+        self.dropped = 0
+        self._condition = threading.Condition()
+
+    def put(self, event):
+        with self._condition:
+            if len(self.events) >= self.maxsize:
+                self.dropped += len(self.events) + 1
+                self.events.clear()
+                self.overflowed = True
+            else:
+                self.events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout):
+        """
+        Следующее событие или None, если за timeout секунд ничего не пришло
+        """
+        with self._condition:
+            if not self.events and not self.overflowed and not self.closed:
+                self._condition.wait(timeout)
+            if self.overflowed:
+                self.overflowed = False
+                return RESYNC
+            return self.events.popleft() if self.events else None
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+
+
+class MemoryBroker(object):
+    """
+    Брокер внутри процесса; is_recipient(user_id, author_id) решает, кому доставить пост
+    """
+    def __init__(self, is_recipient, max_connections, queue_size):
+        self.is_recipient = is_recipient
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    @property
+    def connections(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, user_id):
+        """
+        Новая подписка или None, если лимит соединений воркера исчерпан
+        """
+        with self._lock:
+            if len(self._subscriptions) >= self.max_connections:
+                return None
+            subscription = Subscription(user_id, self.queue_size)
+            self._subscriptions.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def close(self):
+        """
+        Завершает все открытые потоки воркера, например перед его остановкой
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
+
+    def dispatch(self, author_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.user_id == author_id or self.is_recipient(subscription.user_id, author_id):
+                subscription.put(event)
+
+    def publish(self, author_id, event):
+        self.dispatch(author_id, event)
+
+
+class SQLiteBroker(MemoryBroker):
+    """
+    Брокер для нескольких процессов на одной машине через общую таблицу событий
+    """
+    def __init__(self, path, is_recipient, max_connections, queue_size, poll_interval, keep=1000, app=None):
+        MemoryBroker.__init__(self, is_recipient, max_connections, queue_size)
+        self.path = path
+        # поток опроса живет вне запросов, контекст приложения он открывает сам
+        self.app = app
+        self.poll_interval = poll_interval
+        self.keep = keep
+        self._local = threading.local()
+        self._poller = None
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS events '
+                               '(id INTEGER PRIMARY KEY AUTOINCREMENT, author_id INTEGER, payload TEXT)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def subscribe(self, user_id):
+        subscription = MemoryBroker.subscribe(self, user_id)
+        if subscription is not None and self._poller is None:
+            with self._lock:
+                if self._poller is None:
+                    self._last_id = self._connection().execute(
+                        'SELECT coalesce(max(id), 0) FROM events'
+                    ).fetchone()[0]
+                    self._poller = threading.Thread(target=self._poll_forever, daemon=True)
+                    self._poller.start()
+        return subscription
+
+    def publish(self, author_id, event):
+        with self._connection() as connection:
+            row_id = connection.execute('INSERT INTO events (author_id, payload) VALUES (?, ?)',
+                                        (author_id, json.dumps(event, ensure_ascii=False))).lastrowid
+            if row_id % self.keep == 0:
+                connection.execute('DELETE FROM events WHERE id <= ?', (row_id - self.keep,))
+
+    def poll(self):
+        """
+        Раздает локальным подпискам события, опубликованные после прошлого опроса
+        """
+        rows = self._connection().execute(
+            'SELECT id, author_id, payload FROM events WHERE id > ? ORDER BY id', (self._last_id,)
+        ).fetchall()
+        for row_id, author_id, payload in rows:
+            self._last_id = row_id
+            self.dispatch(author_id, json.loads(payload))
+        return len(rows)
+
+    def _poll_forever(self):
+        while True:
+            time.sleep(self.poll_interval)
+            if self._subscriptions:
+                try:
+                    # граф подписок при перезагрузке читает базу через db.session
+                    with self.app.app_context():
+                        self.poll()
+                except Exception:
+                    # поток опроса один на воркер и не должен умирать от одной ошибки
+                    self.app.logger.exception('Не удалось прочитать события живой ленты')
+
+
+def make_broker(config, is_recipient, app=None):
+    if config['STREAM_BROKER_BACKEND'] == 'sqlite':
+        return SQLiteBroker(config['STREAM_BROKER_PATH'], is_recipient, config['STREAM_MAX_CONNECTIONS'],
+                            config['STREAM_QUEUE_SIZE'], config['STREAM_POLL_INTERVAL'], app=app)
+    return MemoryBroker(is_recipient, config['STREAM_MAX_CONNECTIONS'], config['STREAM_QUEUE_SIZE'])
+
+
+def post_event(post):
+    return {'event': 'post', 'id': post.id, 'data': {
+        'id': post.id, 'author': post.author.username, 'body': post.body, 'timestamp': post.timestamp.isoformat(),
+    }}
+
+
+def format_event(event):
+    lines = [f'event: {event["event"]}']
+    if 'id' in event:
+        lines.append(f'id: {event["id"]}')
+    lines.append('data: ' + json.dumps(event['data'], ensure_ascii=False))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def event_stream(broker, subscription, heartbeat, max_seconds):
+    """
+    Байты SSE для подписки: события, комментарий-пинг раз в heartbeat секунд,
+    закрытие через max_seconds. Подписка снимается, когда клиент отключился;
+    брокер передается явно - ответ дочитывается уже вне контекста запроса
+    """
+    try:
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        deadline = time.monotonic() + max_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = subscription.get(min(heartbeat, remaining))
+            if subscription.closed:
+                return
+            yield format_event(event) if event is not None else b': ping\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def init_app(app):
+    graph = app.extensions['follower_graph']
+    app.extensions['stream_broker'] = make_broker(app.config, graph.is_following, app)
+
+
+stream_broker = LocalProxy(lambda: current_app.extensions['stream_broker'])
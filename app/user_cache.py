@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from werkzeug.local import LocalProxy
+from app import db
+from app.fragment_cache import make_backend
+
+
+class UserCache(object):
+    """
+    Кеш пользователей для load_user: отсоединенные от сессии экземпляры User
+    с ограниченным временем жизни и размером. Для запроса экземпляр
+    присоединяется к сессии через merge(load=False) - без обращения к базе.
+
+    Версия каждого пользователя хранится в общем бэкенде кеша, поэтому
+    invalidate() в одном воркере сбрасывает запись и в остальных.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, load):
+        version = self.backend.get_version(f'user:{user_id}')
+        with self._lock:
+            entry = self._items.get(user_id)
+            if entry is not None and entry[1] == version and entry[2] > time.monotonic():
+                self._items.move_to_end(user_id)
+                self.hits += 1
+                return db.session.merge(entry[0], load=False)
+        self.misses += 1
+        user = load(user_id)
+        if user is None:
+            return None
+        db.session.expunge(user)
+        with self._lock:
+            self._items[user_id] = (user, version, time.monotonic() + current_app.config['USER_CACHE_TTL'])
+            self._items.move_to_end(user_id)
+            while len(self._items) > current_app.config['USER_CACHE_SIZE']:
+                self._items.popitem(last=False)
+        return db.session.merge(user, load=False)
+
+    def invalidate(self, user_id):
+        self.backend.incr_version(f'user:{user_id}')
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        self.hits = self.misses = 0
+
+
+def init_app(app):
+    app.extensions['user_cache'] = UserCache(make_backend(app.config))
+
+
+user_cache = LocalProxy(lambda: current_app.extensions['user_cache'])
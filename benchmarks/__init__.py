@@ -0,0 +1,79 @@
+"""
+Бенчмарки сайта-резюме. Запуск: python -m benchmarks.routes --help
+"""
+import json
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """
+    Латентности в секундах -> p50/p95/p99 в миллисекундах
+    """
+    return {f'p{p}_ms': round(percentile(samples, p) * 1000, 3) for p in (50, 95, 99)}
+
+
+@contextmanager
+def count_queries():
+    counter = {'queries': 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['queries'] += 1
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).\
+            decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path, name, results):
+    """
+    Сохраняет результаты в JSON вместе с ревизией, чтобы сравнивать прогоны между коммитами
+    """
+    document = {
+        'benchmark': name,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    return document
+
+
+def compare(old_path, new_path, key='p95_ms'):
+    """
+    Печатает изменение метрики key для совпадающих строк двух прогонов
+    """
+    with open(old_path) as f:
+        old = {(row.get('size'), row.get('route')): row for row in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+    for row in new:
+        before = old.get((row.get('size'), row.get('route')))
+        if before and before.get(key):
+            change = (row[key] - before[key]) / before[key] * 100
+            print(f'{row.get("size"):>8} {row.get("route"):<12} {before[key]:>10.3f} -> {row[key]:>10.3f} '
+                  f'({change:+.1f}%)')
@@ -0,0 +1,117 @@
+"""
+Сколько байт скачивает браузер при холодной загрузке главной страницы:
+HTML, стили и фоновые картинки тех правил CSS, чьи классы есть на странице.
+Сравнивает обычную /static/ раздачу и собранную статику (flask assets build)
+для браузера, который понимает br и AVIF/WebP.
+
+    python -m benchmarks.assets
+"""
+import argparse
+import gzip
+import re
+import shutil
+import tempfile
+from app import create_app, db, assets
+from app.response_cache import page_cache
+from benchmarks import save_results
+from benchmarks.dataset import generate
+
+app = create_app()
+app.app_context().push()
+
+STYLESHEET = re.compile(r'<link rel="stylesheet" href="([^"]+)"')
+CSS_RULE = re.compile(r'([^{}]+)\{([^}]*)\}')
+CSS_URL = re.compile(r'url\(([^)]+)\)(?:\s*type\("([^"]+)"\))?')
+BROWSER = {'Accept-Encoding': 'br, gzip', 'Accept': 'image/avif,image/webp,*/*'}
+
+
+def resolve(base, reference):
+    parts = base.rsplit('/', 1)[0].split('/')
+    for part in reference.replace('\\ ', ' ').split('/'):
+        if part == '..':
+            parts.pop()
+        elif part != '.':
+            parts.append(part)
+    return '/'.join(parts)
+
+
+def background_images(css, classes, accept):
+    """
+    Картинки, которые браузер скачает для классов страницы: из image-set()
+    берется первый поддерживаемый формат, иначе последний url()
+    """
+    images = []
+    for selector, body in CSS_RULE.findall(css):
+        if not set(re.findall(r'\.([\w-]+)', selector)) & classes:
+            continue
+        chosen = None
+        for declaration in body.split(';'):
+            urls = CSS_URL.findall(declaration)
+            if not urls:
+                continue
+            if 'image-set' in declaration:
+                supported = [url for url, mime in urls
+                             if not mime or mime.split('/')[1] in accept or mime == 'image/jpeg']
+                chosen = supported[0] if supported else chosen
+            else:
+                chosen = urls[-1][0]
+        if chosen:
+            images.append(chosen)
+    return images
+
+
+def cold_load(headers):
+    client = app.test_client()
+    page_cache.clear()
+    html = client.get('/', headers=headers)
+    transferred = {'html': len(html.data)}
+    text = html.get_data(as_text=True)
+    classes = {name for attr in re.findall(r'class="([^"]+)"', text) for name in attr.split()}
+    accept = headers.get('Accept', '')
+    for href in STYLESHEET.findall(text):
+        css = client.get(href, headers=headers)
+        transferred[href] = len(css.data)
+        if css.headers.get('Content-Encoding') == 'br':
+            css_text = assets.brotli.decompress(css.data).decode()
+        elif css.headers.get('Content-Encoding') == 'gzip':
+            css_text = gzip.decompress(css.data).decode()
+        else:
+            css_text = css.get_data(as_text=True)
+        for image in background_images(css_text, classes, accept):
+            url = resolve(href, image)
+            transferred[url] = len(client.get(url, headers=headers).data)
+    return transferred
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='bench_assets.json')
+    args = parser.parse_args()
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    dist_dir = tempfile.mkdtemp()
+    app.config['ASSETS_DIST_DIR'] = dist_dir
+    try:
+        db.create_all()
+        generate(users=10, posts=20)
+        assets.reload_manifest()
+        before = cold_load({})
+        assets.build(force=True)
+        after = cold_load(BROWSER)
+    finally:
+        shutil.rmtree(dist_dir, ignore_errors=True)
+        assets.reload_manifest()
+        db.session.remove()
+        db.drop_all()
+    results = []
+    for name, transferred in (('before', before), ('after', after)):
+        for url, size in transferred.items():
+            print(f'{name:>6} {size:>8} B  {url}')
+        total = sum(transferred.values())
+        print(f'{name:>6} {total:>8} B  итого')
+        results.append({'route': 'index', 'size': name, 'bytes': total, 'files': transferred})
+    print(f'Экономия: {1 - results[1]["bytes"] / results[0]["bytes"]:.1%}')
+    save_results(args.output, 'assets', results)
+
+
+if __name__ == '__main__':
+    main()
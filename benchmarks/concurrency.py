@@ -0,0 +1,108 @@
+"""
+Конкуренция за SQLite между процессами, как у нескольких воркеров gunicorn:
+каждый процесс пишет посты и читает страницы пользователей. Сравнивает
+голую SQLite (журнал отката, умолчания PRAGMA) с настройками из Config
+(WAL, synchronous=normal, busy_timeout).
+
+    python -m benchmarks.concurrency --workers 8 --duration 5 --write-share 0.3
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from app import create_app, db
+from app.response_cache import page_cache
+from benchmarks import summarize, save_results
+from benchmarks.dataset import generate, PASSWORD
+
+app = create_app()
+app.app_context().push()
+
+BARE = {'SQLITE_JOURNAL_MODE': None, 'SQLITE_SYNCHRONOUS': None, 'SQLITE_BUSY_TIMEOUT': None,
+        'SQLITE_MMAP_SIZE': None, 'SQLITE_CACHE_SIZE': None}
+
+
+def worker(number, config, duration, write_share, queue):
+    app.config.update(config)
+    app.logger.disabled = True
+    db.engine.dispose()
+    rng = random.Random(number)
+    client = app.test_client()
+    client.post('/login', data={'username': f'user{number + 1}', 'password': PASSWORD})
+    reads, writes, errors = [], [], 0
+    stop = time.perf_counter() + duration
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        if rng.random() < write_share:
+            status = client.post('/new_post', data={'post': f'пост воркера {number}'}).status_code
+            writes.append(time.perf_counter() - start)
+        else:
+            page_cache.clear()
+            status = client.get(f'/user/user{rng.randint(1, 49)}').status_code
+            reads.append(time.perf_counter() - start)
+        errors += status >= 500
+    queue.put((reads, writes, errors))
+
+
+def run(config, workers, duration, write_share):
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(n, config, duration, write_share, queue))
+                 for n in range(workers)]
+    for process in processes:
+        process.start()
+    reads, writes, errors = [], [], 0
+    for _ in processes:
+        r, w, e = queue.get()
+        reads += r
+        writes += w
+        errors += e
+    for process in processes:
+        process.join()
+    result = {'requests_per_sec': round((len(reads) + len(writes)) / duration, 1), 'errors': errors}
+    result.update({f'read_{key}': value for key, value in summarize(reads).items()})
+    result.update({f'write_{key}': value for key, value in summarize(writes).items()})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--write-share', type=float, default=0.3)
+    parser.add_argument('--output', default='bench_concurrency.json')
+    args = parser.parse_args()
+
+    tuned = {key: app.config[key] for key in BARE}
+    results = []
+    for mode, config in (('bare', BARE), ('tuned', tuned)):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app.config.update(config)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['PASSWORD_HASH_WORKERS'] = 0
+        try:
+            db.create_all()
+            generate(users=50, posts=1000)
+            db.session.remove()
+            db.engine.dispose()
+            result = dict(route='user+new_post', size=mode, workers=args.workers,
+                          **run(dict(config, SQLALCHEMY_DATABASE_URI=app.config['SQLALCHEMY_DATABASE_URI'],
+                                     WTF_CSRF_ENABLED=False, PASSWORD_HASH_WORKERS=0),
+                                args.workers, args.duration, args.write_share))
+            print(f'{mode:>6}: {result["requests_per_sec"]:>7} запросов/с, ошибок {result["errors"]}, '
+                  f'чтение p99 {result["read_p99_ms"]} ms, запись p99 {result["write_p99_ms"]} ms')
+            results.append(result)
+        finally:
+            db.session.remove()
+            db.engine.dispose()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    save_results(args.output, 'concurrency', results)
+
+
+if __name__ == '__main__':
+    main()
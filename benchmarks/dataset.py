@@ -0,0 +1,107 @@
+"""
+Детерминированный генератор тестовых данных для бенчмарков.
+
+Один и тот же seed дает одну и ту же базу: N пользователей, граф подписок
+со степенным распределением (немногие популярные авторы собирают
+большинство подписчиков), M постов и полностью заполненные резюме.
+"""
+import random
+from datetime import date, datetime, timedelta
+from werkzeug.security import generate_password_hash
+from app import db
+from app.dates import experience
+from app.models import User, Post, Resume, BasicInformation, SocialNetwork, KeySkills, WorkExperience, \
+    Education, AdditionalEducation, followers, follower_graph, rebuild_timeline, skill_index, recount_user_counters
+
+PASSWORD = 'benchmark'
+SKILLS = ['Python', 'Flask', 'SQLAlchemy', 'PostgreSQL', 'Docker', 'Git', 'Linux', 'Redis', 'Celery', 'Django']
+
+
+def zipf_weights(n, alpha=1.2):
+    return [1.0 / (rank ** alpha) for rank in range(1, n + 1)]
+
+
+def generate(users, posts, follows_per_user=20, resume_share=0.2, seed=42):
+    """
+    Заполняет текущую базу. Первый пользователь - Svyat, владелец резюме
+    с главной страницы. Возвращает список имен пользователей.
+    """
+    rng = random.Random(seed)
+    password_hash = generate_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    usernames = ['Svyat'] + [f'user{i}' for i in range(1, users)]
+    db.session.execute(User.__table__.insert(), [
+        {'id': i + 1, 'username': name, 'email': f'{name}@example.com', 'password_hash': password_hash,
+         'about_me': f'Обо мне {name}', 'last_seen': now}
+        for i, name in enumerate(usernames)
+    ])
+
+    weights = zipf_weights(users)
+    ids = list(range(1, users + 1))
+    edges = set()
+    for follower in ids:
+        for followed in rng.choices(ids, weights, k=min(follows_per_user, users - 1)):
+            if followed != follower:
+                edges.add((follower, followed))
+    if edges:
+        db.session.execute(followers.insert(), [
+            {'follower_id': follower, 'followed_id': followed} for follower, followed in sorted(edges)
+        ])
+
+    if posts:
+        db.session.execute(Post.__table__.insert(), [
+            {'body': f'Пост номер {i}', 'user_id': rng.choices(ids, weights)[0],
+             'timestamp': now - timedelta(seconds=posts - i)}
+            for i in range(posts)
+        ])
+
+    for user_id in [1] + rng.sample(ids[1:], int((users - 1) * resume_share)):
+        add_resume(user_id, rng)
+    db.session.commit()
+    follower_graph.invalidate()
+    skill_index.invalidate()
+    recount_user_counters()
+    rebuild_timeline()
+    return usernames
+
+
+def add_resume(user_id, rng):
+    resume = Resume(
+        first_name='Иван', surname='Иванов', patronymic='Иванович', date_of_birth=date(1990, 1, 1),
+        gender='мужчина', user_id=user_id
+    )
+    info = BasicInformation(
+        resume=resume, city_of_residence='Москва', phone_number='+7 900 000 00 00', email='mail@example.com',
+        desired_position='Python developer', professional_area='IT', salary='100000', employment='полная',
+        work_schedule='полный день', about_me='Обо мне', knowledge_languages='Русский, English',
+        citizenship='Россия'
+    )
+    db.session.add_all([resume, info])
+    for i in range(rng.randint(1, 3)):
+        db.session.add(SocialNetwork(
+            basic_information=info, link_social_network=f'https://example.com/{user_id}/{i}',
+            comment_link_social_network=f'Ссылка {i}'
+        ))
+    for skill in rng.sample(SKILLS, rng.randint(3, 8)):
+        key_skill = KeySkills(basic_information=info)
+        key_skill.set_tag(skill)
+        db.session.add(key_skill)
+    jobs = [(date(2010 + i, 1, 1), date(2011 + i, 1, 1)) for i in range(rng.randint(1, 6))]
+    jobs[-1] = (jobs[-1][0], None)
+    resume.experience_months, resume.experience_since = experience(jobs)
+    for i, (started, ending) in enumerate(jobs):
+        db.session.add(WorkExperience(
+            resume=resume, started_working=started, ending=ending, organization=f'Компания {i}',
+            region='Москва', company_field_activity='IT', post='Разработчик',
+            responsibilities_workplace='Разработка и поддержка сервисов'
+        ))
+    for i in range(rng.randint(1, 2)):
+        db.session.add(Education(
+            resume=resume, level='Высшее', educational_institution=f'Университет {i}', faculty='Факультет',
+            specialization='Информатика', year_completion=2005 + i
+        ))
+    for i in range(rng.randint(0, 3)):
+        db.session.add(AdditionalEducation(
+            resume=resume, conducting_organization=f'Курсы {i}', specialization='Python',
+            year_completion=2015 + i, comment='Курс'
+        ))
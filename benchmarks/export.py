@@ -0,0 +1,70 @@
+"""
+Скорость выгрузки (строк/с) и пик памяти Python при разных размерах базы.
+Пик зависит от --batch-size и не должен расти вместе с числом строк.
+Память замеряется вторым проходом: tracemalloc замедляет выгрузку в разы.
+
+    python -m benchmarks.export --posts 10000,100000 --users 1000,10000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from app import create_app, db, export as data_export
+from benchmarks import save_results
+from benchmarks.dataset import generate
+
+app = create_app()
+app.app_context().push()
+
+
+def measure(kind, fmt, batch_size):
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in data_export.export(kind, fmt, batch_size))
+    elapsed = time.perf_counter() - start
+    db.session.remove()
+    tracemalloc.start()
+    for chunk in data_export.export(kind, fmt, batch_size):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.remove()
+    rows = db.session.query(data_export.MODELS[kind]).count()
+    return {'rows': rows, 'bytes': size, 'seconds': round(elapsed, 3),
+            'rows_per_sec': round(rows / elapsed), 'peak_kb': round(peak / 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', default='10000,100000', help='число постов, через запятую')
+    parser.add_argument('--users', default='1000,10000', help='число пользователей (20%% с резюме), через запятую')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_export.json')
+    args = parser.parse_args()
+
+    results = []
+    for users, posts in zip([int(n) for n in args.users.split(',')], [int(n) for n in args.posts.split(',')]):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        try:
+            db.create_all()
+            generate(users=users, posts=posts, follows_per_user=5, seed=args.seed)
+            db.session.remove()
+            for kind in data_export.KINDS:
+                for fmt in data_export.FORMATS[kind]:
+                    result = dict(route=f'export {kind}.{fmt}', size=f'{users}u/{posts}p',
+                                  **measure(kind, fmt, args.batch_size))
+                    print(f'{result["route"]:>22} {result["size"]:>14}: {result["rows"]:>7} строк, '
+                          f'{result["rows_per_sec"]:>7} строк/с, пик {result["peak_kb"]} КБ')
+                    results.append(result)
+        finally:
+            db.session.remove()
+            db.drop_all()
+            os.remove(path)
+    save_results(args.output, 'export', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Скорость массового импорта резюме: документы берутся из выгрузки
+сгенерированной базы и размножаются до нужного числа.
+
+    python -m benchmarks.import_resumes --resumes 1000,10000
+"""
+import argparse
+import os
+import tempfile
+import time
+from app import create_app, db, export as data_export, importer
+from benchmarks import save_results
+from benchmarks.dataset import generate
+
+app = create_app()
+app.app_context().push()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resumes', default='1000,10000', help='размеры импорта через запятую')
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_import.json')
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(size) for size in args.resumes.split(',')]:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        try:
+            db.create_all()
+            generate(users=100, posts=0, seed=args.seed)
+            text = b''.join(data_export.export('resumes', 'ndjson')).decode()
+            documents = importer.parse(text, 'ndjson')
+            documents = (documents * (size // len(documents) + 1))[:size]
+            db.session.remove()
+            with app.app_context():
+                # формам Flask-WTF нужен контекст приложения, как в flask import
+                start = time.perf_counter()
+                report = importer.import_resumes(documents, 1, args.chunk_size)
+                elapsed = time.perf_counter() - start
+            result = {'route': 'import', 'size': size, 'created': len(report['created']),
+                      'errors': len(report['errors']), 'seconds': round(elapsed, 2),
+                      'resumes_per_sec': round(size / elapsed)}
+            print(f'{size:>7} резюме: {result["seconds"]} с, {result["resumes_per_sec"]} резюме/с, '
+                  f'ошибок {result["errors"]}')
+            results.append(result)
+        finally:
+            db.session.remove()
+            db.drop_all()
+            os.remove(path)
+    save_results(args.output, 'import', results)
+
+
+if __name__ == '__main__':
+    main()
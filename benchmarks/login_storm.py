@@ -0,0 +1,91 @@
+"""
+Шторм входов: несколько потоков без остановки логинятся, а еще один поток
+замеряет латентность главной страницы. Сравнивает хеширование паролей
+в потоке запроса (PASSWORD_HASH_WORKERS = 0) и в пуле процессов.
+
+Потоки соответствуют gthread-воркеру gunicorn: при синхронных воркерах
+ожидающий хеша воркер все равно занят, но пул ограничивает долю процессора,
+отданную PBKDF2, и отказывает лишним входам сразу.
+
+    python -m benchmarks.login_storm --threads 8 --duration 5
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from app import create_app, db
+from app.hashing import hashing_pool
+from app.response_cache import page_cache
+from benchmarks import summarize, save_results
+from benchmarks.dataset import generate, PASSWORD
+
+app = create_app()
+app.app_context().push()
+
+
+def storm(threads, duration):
+    stop = time.perf_counter() + duration
+    logins = {'ok': 0, 'busy': 0}
+    landing = []
+    lock = threading.Lock()
+
+    def login_loop():
+        client = app.test_client()
+        while time.perf_counter() < stop:
+            status = client.post('/login', data={'username': 'Svyat', 'password': PASSWORD}).status_code
+            client.get('/logout')
+            with lock:
+                logins['ok' if status == 302 else 'busy'] += 1
+
+    def landing_loop():
+        client = app.test_client()
+        while time.perf_counter() < stop:
+            page_cache.clear()
+            start = time.perf_counter()
+            client.get('/index')
+            landing.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=login_loop) for _ in range(threads)]
+    workers.append(threading.Thread(target=landing_loop))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    result = {'logins_per_sec': round(logins['ok'] / duration, 2), 'busy_per_sec': round(logins['busy'] / duration, 2)}
+    result.update({f'landing_{key}': value for key, value in summarize(landing).items()})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='потоков, выполняющих вход')
+    parser.add_argument('--duration', type=float, default=5.0, help='секунд на каждый режим')
+    parser.add_argument('--pool-workers', type=int, default=2)
+    parser.add_argument('--output', default='bench_login_storm.json')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        db.create_all()
+        generate(users=50, posts=500)
+        db.session.remove()
+        results = []
+        for mode, workers in (('inline', 0), ('pool', args.pool_workers)):
+            app.config['PASSWORD_HASH_WORKERS'] = workers
+            hashing_pool._pid = None
+            result = dict(route='login', size=mode, threads=args.threads, **storm(args.threads, args.duration))
+            print(f'{mode:>7}: {result["logins_per_sec"]:>7} входов/с, {result["busy_per_sec"]:>7} отказов/с, '
+                  f'главная p50 {result["landing_p50_ms"]} ms, p99 {result["landing_p99_ms"]} ms')
+            results.append(result)
+        save_results(args.output, 'login_storm', results)
+    finally:
+        db.session.remove()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
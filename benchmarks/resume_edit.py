@@ -0,0 +1,161 @@
+"""
+Полное редактирование резюме: пошаговый мастер против одного PATCH.
+
+Меняются все части резюме - основная и персональная информация, желаемая
+позиция, каждая соц. сеть, навык, место работы и образование, плюс одно
+новое место работы. Мастер отправляет форму на каждую часть и, как
+браузер, переходит по редиректу на страницу резюме; пакетный путь -
+один PATCH /api/resume/<id> с теми же изменениями. База - временный
+файл SQLite, чтобы коммиты стоили как на диске.
+
+    python -m benchmarks.resume_edit --edits 30
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from app import create_app, db
+from app.models import User, Resume
+from app.repository import load_resume
+from benchmarks import summarize, count_queries, save_results
+from benchmarks.dataset import generate, PASSWORD
+
+app = create_app()
+app.app_context().push()
+
+
+def wizard_steps(resume, n):
+    """
+    (url, данные формы) для каждой части резюме
+    """
+    rid, info = resume.id, resume.basic_information
+    steps = [
+        (f'/{rid}/edit_resume', {'first_name': f'Иван {n}', 'surname': 'Иванов', 'patronymic': 'Иванович',
+                                 'date_of_birth': '01.01.1990', 'gender': 'мужчина'}),
+        (f'/{rid}/edit_personal_information', {
+            'city_of_residence': 'Казань', 'phone_number': '+7 900 000 00 00', 'email': 'mail@example.com',
+            'about_me': f'Обо мне {n}', 'knowledge_languages': 'Русский', 'citizenship': 'Россия'}),
+        (f'/{rid}/edit_position', {'desired_position': 'Python developer', 'professional_area': 'IT',
+                                   'salary': str(100000 + n), 'employment': 'полная',
+                                   'work_schedule': 'удаленно'}),
+    ]
+    steps += [(f'/{rid}/{network.id}/edit_social_network', {
+        'link_social_network': network.link_social_network, 'comment_link_social_network': f'Ссылка {n}'
+    }) for network in info.social_networks]
+    steps += [(f'/{rid}/{skill.id}/edit_key_skill', {'skill_tag': skill.skill_tag}) for skill in info.key_skills]
+    steps += [(f'/{rid}/{work.id}/edit_work_experience', {
+        'started_working': work.started_working.strftime('%m.%Y'),
+        'ending': work.ending.strftime('%m.%Y') if work.ending else '', 'organization': work.organization,
+        'region': 'Казань', 'company_field_activity': 'IT', 'post': f'Разработчик {n}'
+    }) for work in resume.work_experience]
+    steps += [(f'/{rid}/{training.id}/edit_education', {
+        'level': 'Высшее', 'educational_institution': training.educational_institution, 'faculty': 'Факультет',
+        'specialization': f'Информатика {n}', 'year_completion': str(training.year_completion)
+    }) for training in resume.educations]
+    steps += [(f'/{rid}/{training.id}/edit_additional_education', {
+        'conducting_organization': training.conducting_organization, 'specialization': 'Python',
+        'year_completion': str(training.year_completion), 'comment': f'Курс {n}'
+    }) for training in resume.additional_educations]
+    steps.append((f'/{rid}/work_experience', {
+        'started_working': '01.2000', 'ending': '12.2000', 'organization': f'Стажировка {n}', 'region': 'Казань',
+        'company_field_activity': 'IT', 'post': 'Стажер'
+    }))
+    return steps
+
+
+def patch_document(resume, n):
+    """
+    Те же изменения одним документом для PATCH
+    """
+    steps = wizard_steps(resume, n)
+    fields = dict(steps[1][1], **steps[2][1])
+    info = resume.basic_information
+    return dict(steps[0][1], basic_information=dict(
+        fields,
+        social_networks={'update': [{'id': network.id, 'comment_link_social_network': f'Ссылка {n}'}
+                                    for network in info.social_networks]},
+        key_skills={'update': [{'id': skill.id, 'skill_tag': skill.skill_tag} for skill in info.key_skills]},
+    ), work_experience={
+        'update': [{'id': work.id, 'region': 'Казань', 'post': f'Разработчик {n}'} for work in resume.work_experience],
+        'add': [steps[-1][1]],
+    }, educations={
+        'update': [{'id': training.id, 'specialization': f'Информатика {n}'} for training in resume.educations]
+    }, additional_educations={
+        'update': [{'id': training.id, 'comment': f'Курс {n}'} for training in resume.additional_educations]
+    })
+
+
+def edit_with_wizard(client, resume, n):
+    steps = wizard_steps(resume, n)
+    for url, data in steps:
+        response = client.post(url, data=data, follow_redirects=True)
+        assert response.status_code == 200, url
+    return len(steps) * 2
+
+
+def edit_with_patch(client, resume, n):
+    response = client.patch(f'/api/resume/{resume.id}', json=patch_document(resume, n))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return 1
+
+
+def run(resumes, edit):
+    """
+    Редактирует каждое резюме из resumes (id, логин автора) один раз
+    """
+    samples, requests, queries = [], 0, 0
+    with count_queries() as counter:
+        for n, (resume_id, username) in enumerate(resumes):
+            client = app.test_client()
+            client.post('/login', data={'username': username, 'password': PASSWORD})
+            # части резюме читаются до замера: у клиента форма уже открыта
+            resume = load_resume(resume_id)
+            before = counter['queries']
+            start = time.perf_counter()
+            requests += edit(client, resume, n)
+            samples.append(time.perf_counter() - start)
+            queries += counter['queries'] - before
+            db.session.remove()
+    result = summarize(samples)
+    result.update(http_requests_per_edit=round(requests / len(resumes), 1),
+                  queries_per_edit=round(queries / len(resumes), 1))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--edits', type=int, default=30, help='сколько резюме отредактировать каждым способом')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_resume_edit.json')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['WTF_CSRF_ENABLED'] = False
+    results = []
+    try:
+        db.create_all()
+        # каждое резюме редактируется один раз, чтобы оба способа получили резюме одного вида
+        generate(users=2 * args.edits, posts=0, resume_share=1.0, seed=args.seed)
+        resumes = db.session.query(Resume.id, User.username).join(User, User.id == Resume.user_id).all()
+        random.Random(args.seed).shuffle(resumes)
+        db.session.remove()
+        for i, (route, edit) in enumerate((('wizard', edit_with_wizard), ('patch', edit_with_patch))):
+            result = dict(route=route, size=args.edits, **run(resumes[i * args.edits:(i + 1) * args.edits], edit))
+            print(f'{route:>7}: p50 {result["p50_ms"]:>8.2f} ms  p95 {result["p95_ms"]:>8.2f} ms  '
+                  f'{result["http_requests_per_edit"]:>5} HTTP-запросов  '
+                  f'{result["queries_per_edit"]:>6} запросов к базе')
+            results.append(result)
+    finally:
+        db.session.remove()
+        db.drop_all()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    save_results(args.output, 'resume_edit', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Прогоняет основные маршруты через тестовый клиент Flask на нескольких
+объемах данных и сохраняет p50/p95/p99, число запросов к базе на запрос
+и пиковую память в JSON.
+
+    python -m benchmarks.routes --sizes small,medium --output bench.json
+    python -m benchmarks.routes --compare old.json bench.json
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from app import create_app, db
+from app.fragment_cache import fragment_cache
+from app.response_cache import page_cache
+from app.models import User, Resume
+from benchmarks import summarize, count_queries, save_results, compare
+from benchmarks.dataset import generate, PASSWORD
+
+app = create_app()
+app.app_context().push()
+
+SIZES = {
+    'small': {'users': 100, 'posts': 1000},
+    'medium': {'users': 1000, 'posts': 10000},
+    'large': {'users': 5000, 'posts': 100000},
+}
+
+
+def login(client, username):
+    client.post('/login', data={'username': username, 'password': PASSWORD})
+
+
+def scenarios(usernames, resume_ids, rng):
+    """
+    Каждый сценарий - функция (client) -> None, выполняющая один запрос пользователя
+    """
+    def index(client):
+        # кеш страниц иначе превратил бы замер в чтение из памяти
+        page_cache.clear()
+        client.get('/index')
+
+    def user(client):
+        client.get('/user/Svyat')
+
+    def resume(client):
+        client.get(f'/user/{rng.choice(usernames)}/resume')
+
+    def this_resume(client):
+        client.get(f'/resume/{rng.choice(resume_ids)}')
+
+    def api_resume(client):
+        client.get(f'/api/resume/{rng.choice(resume_ids)}')
+
+    def follow(client):
+        username = rng.choice(usernames[1:])
+        client.get(f'/follow/{username}')
+        client.get(f'/unfollow/{username}')
+
+    def login_route(client):
+        client.get('/logout')
+        login(client, 'Svyat')
+
+    return {
+        'index': (index, False), 'user': (user, True), 'resume': (resume, True),
+        'this_resume': (this_resume, True), 'api_resume': (api_resume, True), 'follow': (follow, True),
+        'login': (login_route, True),
+    }
+
+
+def run_scenario(action, authenticated, requests):
+    client = app.test_client()
+    if authenticated:
+        login(client, 'Svyat')
+    action(client)
+    samples = []
+    with count_queries() as counter:
+        for _ in range(requests):
+            start = time.perf_counter()
+            action(client)
+            samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    for _ in range(min(requests, 5)):
+        action(client)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = summarize(samples)
+    result['queries_per_request'] = round(counter['queries'] / requests, 2)
+    result['peak_memory_kb'] = round(peak / 1024, 1)
+    return result
+
+
+def run(sizes, requests, seed=42, routes=None):
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['WTF_CSRF_ENABLED'] = False
+    results = []
+    for size in sizes:
+        db.drop_all()
+        db.create_all()
+        fragment_cache.clear()
+        page_cache.clear()
+        usernames = generate(seed=seed, **SIZES[size])
+        resume_ids = [row[0] for row in db.session.query(Resume.id)]
+        db.session.remove()
+        rng = random.Random(seed)
+        for route, (action, authenticated) in scenarios(usernames, resume_ids, rng).items():
+            if routes and route not in routes:
+                continue
+            result = dict(size=size, route=route, requests=requests, **run_scenario(action, authenticated, requests))
+            print(f'{size:>8} {route:<12} p50 {result["p50_ms"]:>8.2f} ms  p95 {result["p95_ms"]:>8.2f} ms  '
+                  f'p99 {result["p99_ms"]:>8.2f} ms  {result["queries_per_request"]:>6} q/req  '
+                  f'{result["peak_memory_kb"]:>8} KB')
+            results.append(result)
+    db.session.remove()
+    db.drop_all()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='small,medium', help='через запятую: ' + ', '.join(SIZES))
+    parser.add_argument('--routes', default=None, help='через запятую, по умолчанию все')
+    parser.add_argument('--requests', type=int, default=50, help='запросов на маршрут')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_routes.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='сравнить два сохраненных прогона')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    routes = args.routes.split(',') if args.routes else None
+    results = run(args.sizes.split(','), args.requests, args.seed, routes)
+    save_results(args.output, 'routes', results)
+    print(f'Результаты сохранены в {args.output}')
+
+
+if __name__ == '__main__':
+    main()
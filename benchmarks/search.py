@@ -0,0 +1,94 @@
+"""
+Латентность /search в зависимости от числа постов. Для сравнения замеряет
+тот же запрос через LIKE по post.body - так искали бы без индекса.
+
+    python -m benchmarks.search --posts 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from app import create_app, db, search as search_index
+from app.models import Post
+from benchmarks import summarize, save_results
+from benchmarks.dataset import generate
+
+app = create_app()
+app.app_context().push()
+
+WORDS = ['python', 'flask', 'резюме', 'вакансия', 'опыт', 'проект', 'команда', 'задача', 'база', 'данные',
+         'сервер', 'клиент', 'тест', 'релиз', 'ошибка', 'отпуск', 'митап', 'доклад', 'курс', 'книга']
+QUERIES = ['python', 'митап доклад', 'редкоеслово']
+CHUNK = 50000
+
+
+def fill_posts(count, rng):
+    for start in range(0, count, CHUNK):
+        db.session.execute(Post.__table__.insert(), [
+            {'body': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 20))) +
+                     (' редкоеслово' if i % 10000 == 0 else ''),
+             'user_id': rng.randint(1, 100)}
+            for i in range(start, min(start + CHUNK, count))
+        ])
+    db.session.commit()
+
+
+def measure(client, q, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get('/search', query_string={'q': q})
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def measure_like(q, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        Post.query.filter(Post.body.like(f'%{q.split()[0]}%')).order_by(Post.id.desc()).\
+            limit(app.config['SEARCH_RESULTS_PER_PAGE']).all()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', default='10000,100000', help='размеры через запятую')
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_search.json')
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(size) for size in args.posts.split(',')]:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        try:
+            db.create_all()
+            generate(users=100, posts=0, seed=args.seed)
+            fill_posts(size, random.Random(args.seed))
+            start = time.perf_counter()
+            search_index.reindex()
+            reindex_s = round(time.perf_counter() - start, 2)
+            db.session.remove()
+            client = app.test_client()
+            for q in QUERIES:
+                client.get('/search', query_string={'q': q})
+                result = dict(route='search', size=size, query=q, reindex_s=reindex_s,
+                              **measure(client, q, args.requests))
+                result.update({f'like_{key}': value for key, value in measure_like(q, args.requests).items()})
+                print(f'{size:>8} {q!r:>16}: p50 {result["p50_ms"]} ms, p99 {result["p99_ms"]} ms '
+                      f'(LIKE p50 {result["like_p50_ms"]} ms)')
+                results.append(result)
+        finally:
+            db.session.remove()
+            db.drop_all()
+            os.remove(path)
+    save_results(args.output, 'search', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Нагрузочное сравнение моделей воркеров gunicorn (sync, gthread, gevent)
+с настройками из gunicorn.conf.py. Клиенты-потоки входят каждый под своим
+пользователем и по очереди запрашивают главную и страницы пользователей,
+поэтому кеш страниц для анонимов не участвует. gevent пропускается, если
+пакет не установлен.
+
+Клиенты работают на той же машине, что и сервер, и отнимают у него
+процессор: сравнивать имеет смысл режимы между собой, а не абсолютные числа.
+
+    python -m benchmarks.serving --clients 16 --duration 10 --worker-classes sync,gthread,gevent
+"""
+import argparse
+import http.cookiejar
+import importlib.util
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from app import create_app, db
+from benchmarks import summarize, save_results
+from benchmarks.dataset import generate, PASSWORD
+
+app = create_app()
+app.app_context().push()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSRF = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(worker_class, port, database_url, workers):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class, DATABASE_URL=database_url, PORT=str(port))
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning', 'website-resume:app'],
+        cwd=ROOT, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1).read()
+            return server
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f'gunicorn ({worker_class}) не запустился')
+
+
+def login(base, username):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    token = CSRF.search(opener.open(f'{base}/login').read().decode()).group(1)
+    opener.open(f'{base}/login', urllib.parse.urlencode(
+        {'username': username, 'password': PASSWORD, 'csrf_token': token}
+    ).encode()).read()
+    return opener
+
+
+def load(base, usernames, clients, duration, seed):
+    openers = [login(base, usernames[(i + 1) % len(usernames)]) for i in range(clients)]
+    latencies = {'index': [], 'user': []}
+    errors = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def client(number, opener):
+        rng = random.Random(seed + number)
+        local = {'index': [], 'user': []}
+        failed = 0
+        while time.perf_counter() < stop:
+            route = 'index' if rng.random() < 0.5 else 'user'
+            path = '/index' if route == 'index' else f'/user/{rng.choice(usernames)}'
+            start = time.perf_counter()
+            try:
+                opener.open(base + path, timeout=30).read()
+                local[route].append(time.perf_counter() - start)
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                failed += 1
+        with lock:
+            for route, samples in local.items():
+                latencies[route] += samples
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(n, opener)) for n, opener in enumerate(openers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result = {'requests_per_sec': round(sum(len(samples) for samples in latencies.values()) / duration, 1),
+              'errors': sum(errors)}
+    for route, samples in latencies.items():
+        result.update({f'{route}_{key}': value for key, value in summarize(samples).items()})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worker-classes', default='sync,gthread,gevent')
+    parser.add_argument('--workers', type=int, default=0, help='число воркеров; 0 - как в gunicorn.conf.py')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_serving.json')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database_url = 'sqlite:///' + path
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    results = []
+    try:
+        db.create_all()
+        usernames = generate(users=args.users, posts=args.posts, seed=args.seed)
+        db.session.remove()
+        db.engine.dispose()
+        for worker_class in args.worker_classes.split(','):
+            if worker_class == 'gevent' and importlib.util.find_spec('gevent') is None:
+                print('  gevent: пропущен, пакет gevent не установлен')
+                continue
+            port = free_port()
+            server = start_server(worker_class, port, database_url, args.workers)
+            try:
+                result = dict(route='index+user', size=worker_class, clients=args.clients,
+                              **load(f'http://127.0.0.1:{port}', usernames, args.clients, args.duration, args.seed))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f'{worker_class:>8}: {result["requests_per_sec"]:>7} запросов/с, ошибок {result["errors"]}, '
+                  f'index p50/p99 {result["index_p50_ms"]}/{result["index_p99_ms"]} ms, '
+                  f'user p50/p99 {result["user_p50_ms"]}/{result["user_p99_ms"]} ms')
+            results.append(result)
+    finally:
+        db.session.remove()
+        db.engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    save_results(args.output, 'serving', results)
+
+
+if __name__ == '__main__':
+    main()
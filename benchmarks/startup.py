@@ -0,0 +1,83 @@
+"""
+Холодный старт: сколько новый процесс тратит на импорт пакета app,
+create_app() и первый ответ (GET /login через тестовый клиент). Каждый
+прогон - отдельный интерпретатор, поэтому кеши модулей не помогают;
+считаются медианы по --runs прогонам. Так стартует воркер gunicorn после
+перезапуска и каждый процесс flask.
+
+Если медиана времени до первого ответа больше --max-ms, скрипт завершается
+с кодом 1: бюджет проверяется в CI, чтобы тяжелый импорт на уровне модуля
+не пролез незаметно. Найти виновника поможет
+python -X importtime -c "from app import create_app; create_app()".
+
+    python -m benchmarks.startup --runs 10 --max-ms 750
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks import save_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHILD = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+status = app.test_client().get('/login').status_code
+responded = time.perf_counter()
+print(json.dumps({
+    'status': status,
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_response_ms': (responded - created) * 1000,
+    'total_ms': (responded - start) * 1000,
+}))
+'''
+PHASES = ('import_ms', 'create_app_ms', 'first_response_ms', 'total_ms', 'process_ms')
+
+
+def cold_start():
+    """
+    Один прогон в новом процессе; база - SQLite в памяти, чтобы не трогать файлы
+    """
+    env = dict(os.environ, DATABASE_URL='sqlite://')
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    # весь процесс, вместе с запуском интерпретатора и выходом
+    process_ms = (time.perf_counter() - start) * 1000
+    sample = json.loads(output.strip().splitlines()[-1])
+    if sample['status'] != 200:
+        raise SystemExit(f'GET /login ответил {sample["status"]}')
+    sample['process_ms'] = process_ms
+    return sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=750.0,
+                        help='бюджет на медиану времени от импорта до первого ответа; 0 - не проверять')
+    parser.add_argument('--output', default='bench_startup.json')
+    args = parser.parse_args()
+
+    # первый прогон прогревает байткод и файловый кеш ОС, в замер он не входит
+    cold_start()
+    samples = [cold_start() for _ in range(args.runs)]
+    result = {'route': 'startup', 'size': args.runs}
+    for phase in PHASES:
+        result[phase] = round(statistics.median(sample[phase] for sample in samples), 1)
+        print(f'{phase:>18}: {result[phase]:>8.1f} ms')
+    save_results(args.output, 'startup', [result])
+    if args.max_ms and result['total_ms'] > args.max_ms:
+        raise SystemExit(f'Холодный старт {result["total_ms"]} ms превышает бюджет {args.max_ms:g} ms')
+
+
+if __name__ == '__main__':
+    main()
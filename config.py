@@ -7,4 +7,50 @@ class Config(object):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
                               'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else None
+    DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS') or 5)
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 5)
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW') or 10)
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE') or 1800)
+    # PRAGMA для SQLite; пустая переменная окружения оставляет умолчание
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'wal') or None
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'normal') or None
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or -20000)
     POSTS_PER_PAGE = 5
+    SEARCH_RESULTS_PER_PAGE = int(os.environ.get('SEARCH_RESULTS_PER_PAGE') or 10)
+    SEARCH_MAX_PAGE = int(os.environ.get('SEARCH_MAX_PAGE') or 50)
+    SEARCH_MAX_CANDIDATES = int(os.environ.get('SEARCH_MAX_CANDIDATES') or 1000)
+    TIMELINE_FANOUT_LIMIT = int(os.environ.get('TIMELINE_FANOUT_LIMIT') or 1000)
+    LAST_SEEN_FLUSH_INTERVAL = int(os.environ.get('LAST_SEEN_FLUSH_INTERVAL') or 60)
+    LAST_SEEN_MIN_STALENESS = int(os.environ.get('LAST_SEEN_MIN_STALENESS') or 60)
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND') or 'lru'
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 256)
+    FRAGMENT_CACHE_PATH = os.environ.get('FRAGMENT_CACHE_PATH') or os.path.join(basedir, 'fragment-cache.db')
+    # при нескольких процессах с одной базой поколение графа подписок хранится в общем файле (sqlite)
+    FOLLOWER_GRAPH_BACKEND = os.environ.get('FOLLOWER_GRAPH_BACKEND') or 'lru'
+    INSTRUMENTATION_ENABLED = bool(os.environ.get('INSTRUMENTATION_ENABLED'))
+    SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS') or 500)
+    SLOW_REQUEST_STATEMENTS = 3
+    # метод werkzeug вместе с числом итераций: хеши с другими параметрами пересчитываются при входе
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:150000'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT') or 8)
+    PASSWORD_HASH_TIMEOUT = 10
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 1024)
+    EXPORT_USERS = (os.environ.get('EXPORT_USERS') or 'Svyat').split(',')
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 500)
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE') or 1000)
+    # живая лента: memory - внутри процесса, sqlite - общий файл для воркеров на одной машине
+    STREAM_BROKER_BACKEND = os.environ.get('STREAM_BROKER_BACKEND') or 'memory'
+    STREAM_BROKER_PATH = os.environ.get('STREAM_BROKER_PATH') or os.path.join(basedir, 'stream-broker.db')
+    STREAM_MAX_CONNECTIONS = int(os.environ.get('STREAM_MAX_CONNECTIONS') or 10)
+    STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE') or 100)
+    STREAM_HEARTBEAT_SECONDS = int(os.environ.get('STREAM_HEARTBEAT_SECONDS') or 15)
+    STREAM_MAX_SECONDS = int(os.environ.get('STREAM_MAX_SECONDS') or 300)
+    STREAM_POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL') or 0.5)
+    ASSETS_DIST_DIR = os.environ.get('ASSETS_DIST_DIR') or os.path.join(basedir, 'app', 'dist')
+    ASSET_IMAGE_WIDTHS = (640, 1280)
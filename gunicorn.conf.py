@@ -0,0 +1,88 @@
+"""
+Настройки gunicorn: gunicorn -c gunicorn.conf.py website-resume:app
+
+Модель воркеров выбирается GUNICORN_WORKER_CLASS:
+  sync    - процесс на запрос, 2 * CPU + 1 воркеров;
+  gthread - (по умолчанию) CPU + 1 воркеров по GUNICORN_THREADS потоков;
+  gevent  - CPU + 1 воркеров по GUNICORN_WORKER_CONNECTIONS соединений,
+            нужен пакет gevent.
+Число воркеров можно задать явно через WEB_CONCURRENCY.
+
+Пул SQLAlchemy в каждом воркере подгоняется под число одновременных
+запросов в нем: соединение на поток (на процесс у sync). У gevent пул
+ограничен GUNICORN_DB_POOL_LIMIT, лишние гринлеты ждут свободное
+соединение. Явно заданные DATABASE_POOL_SIZE и DATABASE_MAX_OVERFLOW
+не перезаписываются.
+
+Живой ленте (/stream) достается не больше половины одновременных запросов
+воркера, у sync она выключена; при нескольких воркерах события между ними
+ходят через SQLite-брокер.
+
+Версии кеша фрагментов, кеша страниц и пользователей, графа подписок и
+индекса навыков при нескольких воркерах хранятся в общем SQLite-файле
+(FRAGMENT_CACHE_BACKEND=sqlite, FOLLOWER_GRAPH_BACKEND=sqlite): иначе запись
+в одном воркере не сбрасывала бы кеши остальных. Явно заданный lru с
+несколькими воркерами - ошибка.
+"""
+import multiprocessing
+import os
+import signal
+
+cpu_count = multiprocessing.cpu_count()
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'
+
+if worker_class == 'sync':
+    workers = 2 * cpu_count + 1
+    threads = 1
+    concurrency = 1
+    stream_connections = 0
+elif worker_class == 'gthread':
+    workers = cpu_count + 1
+    threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+    concurrency = threads
+    stream_connections = threads // 2
+elif worker_class == 'gevent':
+    workers = cpu_count + 1
+    threads = 1
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS') or 100)
+    concurrency = min(worker_connections, int(os.environ.get('GUNICORN_DB_POOL_LIMIT') or 20))
+    # поток /stream не держит соединение с базой, его ограничивают только соединения воркера
+    stream_connections = worker_connections // 2
+else:
+    raise SystemExit(f'GUNICORN_WORKER_CLASS: ожидалось sync, gthread или gevent, получено {worker_class!r}')
+
+workers = int(os.environ.get('WEB_CONCURRENCY') or workers)
+bind = f'0.0.0.0:{os.environ.get("PORT") or 8000}'
+# за роутером соединение держится между запросами; sync-воркеры keep-alive не поддерживают
+keepalive = 5
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 30)
+graceful_timeout = timeout
+
+# воркеры наследуют окружение мастера и читают его в Config при импорте приложения;
+# запас в max_overflow - для сброса last_seen, который берет второе соединение посреди запроса
+os.environ.setdefault('DATABASE_POOL_SIZE', str(concurrency))
+os.environ.setdefault('DATABASE_MAX_OVERFLOW', '2')
+# поток /stream занимает поток или процесс воркера все время соединения: у sync он занял бы
+# единственный слот, у gthread и gevent под живую ленту отдается не больше половины
+os.environ.setdefault('STREAM_MAX_CONNECTIONS', str(stream_connections))
+if workers > 1:
+    os.environ.setdefault('STREAM_BROKER_BACKEND', 'sqlite')
+    for name in ('FRAGMENT_CACHE_BACKEND', 'FOLLOWER_GRAPH_BACKEND'):
+        os.environ.setdefault(name, 'sqlite')
+        if os.environ[name] != 'sqlite':
+            raise SystemExit(f'{name}={os.environ[name]!r} хранит версии кешей в памяти процесса, '
+                             f'а воркеров {workers}: нужен sqlite или WEB_CONCURRENCY=1')
+
+
+def post_worker_init(worker):
+    """
+    При остановке воркер сначала закрывает потоки /stream: иначе он ждал бы
+    их до graceful_timeout, а браузеры переподключатся к другим воркерам
+    """
+    stream_broker = worker.wsgi.extensions['stream_broker']
+    handle_exit = worker.handle_exit
+
+    def close_streams(sig, frame):
+        stream_broker.close()
+        handle_exit(sig, frame)
+    signal.signal(signal.SIGTERM, close_streams)
@@ -0,0 +1,75 @@
+"""search index
+
+Таблицы полнотекстового поиска (FTS5 на SQLite, tsvector на PostgreSQL),
+заполняются существующими постами и резюме. Резюме читаются таблицами этой
+ревизии, а не моделями: в моделях уже колонки следующих миграций.
+
+Revision ID: 0835b9fd395e
+Revises: 68ddd180b97a
+Create Date: 2026-10-18 16:21:40.902557
+
+"""
+from collections import defaultdict
+from types import SimpleNamespace
+from alembic import op
+import sqlalchemy as sa
+from app import search
+
+
+# revision identifiers, used by Alembic.
+revision = '0835b9fd395e'
+down_revision = '68ddd180b97a'
+branch_labels = None
+depends_on = None
+
+RESUME = ('surname', 'first_name', 'patronymic')
+BASIC_INFORMATION = ('desired_position', 'professional_area', 'city_of_residence', 'about_me', 'knowledge_languages')
+# атрибут резюме, таблица и колонки, которые попадают в документ
+COLLECTIONS = (
+    ('work_experience', 'work_experience', ('organization', 'post', 'company_field_activity',
+                                            'responsibilities_workplace')),
+    ('educations', 'education', ('educational_institution', 'faculty', 'specialization')),
+    ('additional_educations', 'additional_education', ('conducting_organization', 'specialization', 'comment')),
+)
+
+
+def rows(bind, table_name, *columns):
+    table = sa.table(table_name, *[sa.column(column) for column in columns])
+    return bind.execute(sa.select([table.c[column] for column in columns])).fetchall()
+
+
+def namespace(row, columns, **extra):
+    return SimpleNamespace(**{column: getattr(row, column) for column in columns}, **extra)
+
+
+def index_resumes(bind, backend):
+    """
+    Документ каждого резюме собирает search.resume_document из пространств имен с теми же атрибутами
+    """
+    skills = defaultdict(list)
+    for info_id, tag in rows(bind, 'key_skills', 'basic_information_id', 'skill_tag'):
+        skills[info_id].append(SimpleNamespace(skill_tag=tag))
+    infos = {}
+    for row in rows(bind, 'basic_information', 'id', 'resume_id', *BASIC_INFORMATION):
+        infos[row.resume_id] = namespace(row, BASIC_INFORMATION, key_skills=skills[row.id])
+    collections = {name: defaultdict(list) for name, table_name, columns in COLLECTIONS}
+    for name, table_name, columns in COLLECTIONS:
+        for row in rows(bind, table_name, 'resume_id', *columns):
+            collections[name][row.resume_id].append(namespace(row, columns))
+    for row in rows(bind, 'resume', 'id', *RESUME):
+        resume = namespace(row, RESUME, basic_information=infos.get(row.id),
+                           **{name: collections[name][row.id] for name in collections})
+        backend.index(bind, 'resume', row.id, search.resume_document(resume))
+
+
+def upgrade():
+    bind = op.get_bind()
+    backend = search.backend(bind)
+    backend.create(bind)
+    backend.index_all_posts(bind)
+    index_resumes(bind, backend)
+
+
+def downgrade():
+    bind = op.get_bind()
+    search.backend(bind).drop(bind)
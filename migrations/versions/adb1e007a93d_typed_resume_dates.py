@@ -0,0 +1,108 @@
+"""typed resume dates
+
+Даты резюме из String(64) в настоящие типы: Resume.date_of_birth и
+WorkExperience.started_working/ending - Date, year_completion образования -
+Integer. Старые строки разбираются app.dates.parse_date; то, что разобрать
+не удалось, становится NULL и попадает в лог. Заодно считается сохраненный
+стаж резюме (experience_months, experience_since).
+
+Revision ID: adb1e007a93d
+Revises: d9c1d08a0f1b
+Create Date: 2026-10-18 15:28:22.571942
+
+"""
+import logging
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+from app.dates import parse_date, parse_year, format_date, experience
+
+
+# revision identifiers, used by Alembic.
+revision = 'adb1e007a93d'
+down_revision = 'd9c1d08a0f1b'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+COLUMNS = (
+    ('resume', 'date_of_birth', sa.Date(), parse_date, lambda value: format_date(value)),
+    ('work_experience', 'started_working', sa.Date(), parse_date, lambda value: format_date(value, 'month')),
+    ('work_experience', 'ending', sa.Date(), parse_date, lambda value: format_date(value, 'month')),
+    ('education', 'year_completion', sa.Integer(), parse_year, str),
+    ('additional_education', 'year_completion', sa.Integer(), parse_year, str),
+)
+
+
+def convert(table_name, column, old_type, new_type, convert_value):
+    """
+    Переносит колонку в новый тип через временную колонку: добавить,
+    заполнить значениями convert_value, удалить старую и переименовать
+    """
+    bind = op.get_bind()
+    converted = column + '_converted'
+    with op.batch_alter_table(table_name) as batch_op:
+        batch_op.add_column(sa.Column(converted, new_type, nullable=True))
+    table = sa.table(table_name, sa.column('id'), sa.column(column, old_type), sa.column(converted, new_type))
+    values = []
+    for row_id, value in bind.execute(sa.select([table.c.id, table.c[column]])).fetchall():
+        try:
+            value = convert_value(value) if value is not None else None
+        except ValueError:
+            logger.warning('%s.%s id=%s: не удалось разобрать %r, записан NULL', table_name, column, row_id, value)
+            continue
+        if value is not None:
+            values.append({'row_id': row_id, 'value': value})
+    if values:
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id')).values({converted: sa.bindparam('value')}),
+            values
+        )
+    with op.batch_alter_table(table_name) as batch_op:
+        batch_op.drop_column(column)
+        batch_op.alter_column(converted, new_column_name=column)
+
+
+def fill_experience():
+    bind = op.get_bind()
+    work = sa.table('work_experience', sa.column('resume_id'), sa.column('started_working', sa.Date()),
+                    sa.column('ending', sa.Date()))
+    resume = sa.table('resume', sa.column('id'), sa.column('experience_months'),
+                      sa.column('experience_since', sa.Date()))
+    periods = defaultdict(list)
+    for resume_id, started, ending in bind.execute(
+            sa.select([work.c.resume_id, work.c.started_working, work.c.ending])).fetchall():
+        periods[resume_id].append((started, ending))
+    values = []
+    for resume_id, resume_periods in periods.items():
+        months, since = experience(resume_periods)
+        values.append({'row_id': resume_id, 'months': months, 'since': since})
+    if values:
+        bind.execute(resume.update().where(resume.c.id == sa.bindparam('row_id')).values(
+            experience_months=sa.bindparam('months'), experience_since=sa.bindparam('since')
+        ), values)
+
+
+def upgrade():
+    for table_name, column, new_type, parse, format_value in COLUMNS:
+        convert(table_name, column, sa.String(64), new_type, parse)
+    with op.batch_alter_table('resume') as batch_op:
+        batch_op.add_column(sa.Column('experience_months', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('experience_since', sa.Date(), nullable=True))
+    fill_experience()
+    op.create_index(op.f('ix_resume_date_of_birth'), 'resume', ['date_of_birth'], unique=False)
+    op.create_index(op.f('ix_resume_experience_months'), 'resume', ['experience_months'], unique=False)
+    op.create_index('ix_work_experience_resume_started', 'work_experience', ['resume_id', 'started_working'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_work_experience_resume_started', table_name='work_experience')
+    op.drop_index(op.f('ix_resume_experience_months'), table_name='resume')
+    op.drop_index(op.f('ix_resume_date_of_birth'), table_name='resume')
+    with op.batch_alter_table('resume') as batch_op:
+        batch_op.drop_column('experience_since')
+        batch_op.drop_column('experience_months')
+    for table_name, column, new_type, parse, format_value in reversed(COLUMNS):
+        convert(table_name, column, new_type, sa.String(64), format_value)
@@ -1,7 +1,52 @@
-from datetime import datetime, timedelta
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
-from app import app, db
-from app.models import User, Post
+from unittest import mock
+import zipfile
+import flask_migrate
+from flask import render_template, template_rendered
+from sqlalchemy import event
+from config import Config
+from app import create_app, db, init_migrate
+from app.models import User, Post, timeline, followers, follower_graph, rebuild_timeline, Resume, BasicInformation, SocialNetwork, \
+    KeySkills, WorkExperience, Education, AdditionalEducation, Skill, skill_index, normalize_key_skills, \
+    recount_user_counters
+from app.pagination import keyset_paginate, decode_cursor
+from app.last_seen import LastSeenBuffer
+from app.repository import load_resume, load_featured_resume
+from app.fragment_cache import FragmentCache, LRUBackend, SQLiteBackend, fragment_cache
+from app.response_cache import page_cache
+from app import instrumentation, assets, search as search_index, export as data_export
+from app.dates import parse_date, parse_year, experience
+from app.stream import MemoryBroker, SQLiteBroker, stream_broker, event_stream
+from benchmarks.dataset import generate
+from app.hashing import hashing_pool
+from app.user_cache import user_cache
+
+app = create_app()
+app.app_context().push()
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
 
 
 class UserModelCase(unittest.TestCase):
@@ -42,6 +87,52 @@ class UserModelCase(unittest.TestCase):
         self.assertEqual(u1.followed.count(), 0)
         self.assertEqual(u2.followers.count(), 0)
 
+    def test_follow_checks_database_not_graph(self):
+        u1 = User(username='john', email='john@example.com')
+        u2 = User(username='susan', email='susan@example.com')
+        db.session.add_all([u1, u2])
+        db.session.commit()
+        self.assertFalse(u1.is_following(u2))
+        # подписка из другого процесса, о которой граф этого процесса не знает
+        db.session.execute(followers.insert().values(follower_id=u1.id, followed_id=u2.id))
+        u1.follow(u2)
+        db.session.commit()
+        self.assertEqual(db.session.query(followers).count(), 1)
+        self.assertEqual((u1.following_count, u2.follower_count), (0, 0))
+
+    def test_follow_seen_by_other_process(self):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        class SharedConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+            FRAGMENT_CACHE_PATH = path + '-cache'
+            FOLLOWER_GRAPH_BACKEND = 'sqlite'
+
+        first, second = create_app(SharedConfig), create_app(SharedConfig)
+        try:
+            with first.app_context():
+                db.create_all()
+                db.session.add_all([User(username='john', email='john@example.com'),
+                                    User(username='susan', email='susan@example.com')])
+                db.session.commit()
+            with second.app_context():
+                self.assertFalse(User.query.get(1).is_following(User.query.get(2)))
+            with first.app_context():
+                User.query.get(1).follow(User.query.get(2))
+                db.session.commit()
+            with second.app_context():
+                john, susan = User.query.get(1), User.query.get(2)
+                self.assertTrue(john.is_following(susan))
+                john.follow(susan)
+                db.session.commit()
+                self.assertEqual((john.following_count, db.session.query(followers).count()), (1, 1))
+                db.drop_all()
+        finally:
+            for suffix in ('', '-wal', '-shm', '-cache', '-cache-wal', '-cache-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
     def test_follow_posts(self):
         # create four users
         u1 = User(username='john', email='john@example.com')
@@ -80,6 +171,1497 @@ class UserModelCase(unittest.TestCase):
         self.assertEqual(f3, [p3, p4])
         self.assertEqual(f4, [p4])
 
+    def test_timeline_fan_out_and_prune(self):
+        u1 = User(username='john', email='john@example.com')
+        u2 = User(username='susan', email='susan@example.com')
+        db.session.add_all([u1, u2])
+        db.session.commit()
+        u1.follow(u2)
+        db.session.commit()
+
+        p1 = Post(body="post from susan", author=u2)
+        db.session.add(p1)
+        db.session.commit()
+        self.assertEqual(u1.followed_posts().all(), [p1])
+        self.assertEqual(u2.followed_posts().all(), [p1])
+
+        u1.unfollow(u2)
+        db.session.commit()
+        self.assertEqual(u1.followed_posts().all(), [])
+        owners = [row.owner_id for row in db.session.execute(timeline.select())]
+        self.assertEqual(owners, [u2.id])
+
+    def test_timeline_pull_fallback(self):
+        app.config['TIMELINE_FANOUT_LIMIT'] = 1
+        try:
+            u1 = User(username='john', email='john@example.com')
+            u2 = User(username='susan', email='susan@example.com')
+            u3 = User(username='mary', email='mary@example.com')
+            db.session.add_all([u1, u2, u3])
+            db.session.commit()
+            u1.follow(u3)
+            u2.follow(u3)
+            db.session.commit()
+
+            now = datetime.utcnow()
+            p1 = Post(body="post from mary", author=u3, timestamp=now + timedelta(seconds=1))
+            p2 = Post(body="post from john", author=u1, timestamp=now + timedelta(seconds=2))
+            db.session.add_all([p1, p2])
+            db.session.commit()
+            # у mary два подписчика - её пост не раскладывается, а читается напрямую
+            rows = db.session.execute(timeline.select().where(timeline.c.post_id == p1.id)).fetchall()
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(u1.followed_posts().all(), [p2, p1])
+            self.assertEqual(u2.followed_posts().all(), [p1])
+        finally:
+            app.config['TIMELINE_FANOUT_LIMIT'] = 1000
+
+    def test_feed_and_fan_out_use_indexes(self):
+        u1 = User(username='john', email='john@example.com')
+        u2 = User(username='susan', email='susan@example.com')
+        db.session.add_all([u1, u2])
+        db.session.commit()
+        # граф подписок загружается целиком один раз, запросы ниже - его не касаются
+        follower_graph.followers_count(u2.id)
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith(('SELECT', 'INSERT INTO timeline')) and not executemany:
+                executed.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            u1.follow(u2)
+            db.session.add(Post(body='post from susan', author=u2))
+            db.session.commit()
+            u1.followed_posts().all()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        # ни подписка, ни пост, ни чтение ленты не перебирают followers целиком
+        connection = db.session.connection()
+        for statement, parameters in executed:
+            plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters or ())
+            self.assertNotIn('SCAN followers', [row[-1] for row in plan], statement)
+
+    def test_rebuild_timeline(self):
+        u1 = User(username='john', email='john@example.com')
+        u2 = User(username='susan', email='susan@example.com')
+        db.session.add_all([u1, u2])
+        db.session.commit()
+        u1.follow(u2)
+        p1 = Post(body="post from susan", author=u2)
+        p2 = Post(body="post from john", author=u1)
+        db.session.add_all([p1, p2])
+        db.session.commit()
+        db.session.execute(timeline.delete())
+        db.session.commit()
+        self.assertEqual(u1.followed_posts().all(), [])
+
+        rebuild_timeline()
+        self.assertEqual(set(u1.followed_posts().all()), {p1, p2})
+        self.assertEqual(u2.followed_posts().all(), [p1])
+
+
+class PasswordHashingCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:150000'
+        app.config['PASSWORD_HASH_QUEUE_LIMIT'] = 8
+        app.config['PASSWORD_HASH_TIMEOUT'] = 10
+        hashing_pool._pid = None
+        db.session.remove()
+        db.drop_all()
+
+    def test_rehash_on_login(self):
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        u = User(username='john', email='john@example.com')
+        u.set_password('cat')
+        db.session.add(u)
+        db.session.commit()
+        self.assertTrue(u.password_hash.startswith('pbkdf2:sha256:1000$'))
+
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+        self.assertTrue(u.password_needs_rehash())
+        response = self.client.post('/login', data={'username': 'john', 'password': 'cat'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(User.query.get(1).password_hash.startswith('pbkdf2:sha256:2000$'))
+
+    def test_method_without_iterations_is_not_rehashed(self):
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256'
+        u = User(username='john', email='john@example.com')
+        u.set_password('cat')
+        self.assertFalse(u.password_needs_rehash())
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        self.assertTrue(u.password_needs_rehash())
+
+    def test_broken_pool_is_replaced(self):
+        hashing_pool.hash('warm up')
+        broken = hashing_pool._executor
+        for process in list(broken._processes.values()):
+            process.kill()
+            process.join()
+        u = User(username='john', email='john@example.com')
+        u.set_password('cat')
+        self.assertTrue(u.check_password('cat'))
+        self.assertIsNot(hashing_pool._executor, broken)
+
+    def test_timeout_fails_cleanly(self):
+        hashing_pool.hash('warm up')
+        stuck = hashing_pool._executor
+        app.config['PASSWORD_HASH_TIMEOUT'] = 0.000001
+        response = self.client.post('/register', data={
+            'username': 'john', 'email': 'john@example.com', 'password': 'cat', 'password2': 'cat'
+        })
+        self.assertEqual(response.status_code, 503)
+        app.config['PASSWORD_HASH_TIMEOUT'] = 10
+        hashing_pool.hash('cat')
+        self.assertIsNot(hashing_pool._executor, stuck)
+
+    def test_full_queue_fails_fast(self):
+        app.config['PASSWORD_HASH_QUEUE_LIMIT'] = 1
+        hashing_pool._pid = None
+        hashing_pool.hash('warm up')
+        hashing_pool._slots.acquire()
+        try:
+            response = self.client.post('/register', data={
+                'username': 'john', 'email': 'john@example.com', 'password': 'cat', 'password2': 'cat'
+            })
+        finally:
+            hashing_pool._slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertIsNone(User.query.filter_by(username='john').first())
+
+
+class UserCacheCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        u = User(username='john', email='john@example.com')
+        u.set_password('cat')
+        db.session.add(u)
+        db.session.commit()
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': 'john', 'password': 'cat'})
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def test_authenticated_request_without_queries(self):
+        self.client.get('/cache_stats')
+        with count_queries() as statements:
+            self.assertEqual(self.client.get('/cache_stats').status_code, 200)
+        self.assertEqual(statements, [])
+
+    def test_edit_profile_invalidates(self):
+        self.client.get('/cache_stats')
+        self.client.post('/edit_profile', data={'username': 'johnny', 'about_me': 'Обо мне'})
+        misses = user_cache.misses
+        html = self.client.get('/user/johnny').get_data(as_text=True)
+        self.assertEqual(user_cache.misses, misses + 1)
+        self.assertIn('Обо мне', html)
+
+
+class UserCountersCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        for name in ('john', 'susan'):
+            u = User(username=name, email=f'{name}@example.com')
+            u.set_password('cat')
+            db.session.add(u)
+        db.session.commit()
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': 'john', 'password': 'cat'})
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def counters(self, username):
+        u = User.query.filter_by(username=username).first()
+        return u.follower_count, u.following_count, u.post_count
+
+    def test_follow_unfollow_and_posts(self):
+        self.client.get('/follow/susan')
+        self.client.get('/follow/susan')
+        self.client.post('/new_post', data={'post': 'первый'})
+        self.client.post('/index', data={'post': 'второй'})
+        self.assertEqual(self.counters('john'), (0, 1, 2))
+        self.assertEqual(self.counters('susan'), (1, 0, 0))
+        self.assertIn('посты: 2', self.client.get('/user/john').get_data(as_text=True))
+        self.assertIn('подписчики: 1', self.client.get('/user/susan').get_data(as_text=True))
+
+        self.client.get('/unfollow/susan')
+        self.assertEqual(self.counters('john'), (0, 0, 2))
+        self.assertIn('подписки: 0', self.client.get('/user/john').get_data(as_text=True))
+        with count_queries() as statements:
+            self.client.get('/user/susan')
+        self.assertFalse([statement for statement in statements if 'count(' in statement.lower()])
+
+    def test_repair(self):
+        john, susan = User.query.order_by(User.id).all()
+        db.session.execute(followers.insert(), [{'follower_id': susan.id, 'followed_id': john.id}])
+        db.session.execute(Post.__table__.insert(), [{'body': 'без счетчика', 'user_id': susan.id}])
+        db.session.commit()
+        self.assertEqual(self.counters('susan'), (0, 0, 0))
+        self.assertEqual(recount_user_counters(), [john.id, susan.id])
+        self.assertEqual(self.counters('john'), (1, 0, 0))
+        self.assertEqual(self.counters('susan'), (0, 1, 1))
+        self.assertEqual(recount_user_counters(), [])
+
+
+class FollowerGraphCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.create_all()
+        self.u1 = User(username='john', email='john@example.com')
+        self.u2 = User(username='susan', email='susan@example.com')
+        db.session.add_all([self.u1, self.u2])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def edges(self):
+        return db.session.execute(db.select([followers.c.follower_id, followers.c.followed_id])).fetchall()
+
+    def test_membership_without_queries(self):
+        self.u1.follow(self.u2)
+        db.session.commit()
+        # после коммита объекты просрочены - загружаем их заранее
+        db.session.refresh(self.u1)
+        db.session.refresh(self.u2)
+        with count_queries() as statements:
+            self.assertTrue(self.u1.is_following(self.u2))
+            self.assertFalse(self.u2.is_following(self.u1))
+            self.assertEqual(self.u2.followers_count(), 1)
+            self.assertEqual(self.u1.followed_count(), 1)
+        self.assertEqual(statements, [])
+        self.assertEqual(follower_graph.diff(self.edges()), ([], []))
+
+    def test_rollback_restores_graph(self):
+        self.u1.follow(self.u2)
+        self.assertTrue(self.u1.is_following(self.u2))
+        db.session.rollback()
+        self.assertFalse(self.u1.is_following(self.u2))
+        self.assertEqual(self.edges(), [])
+
+    def test_other_worker_change_reloads(self):
+        self.assertFalse(self.u1.is_following(self.u2))
+        db.session.execute(followers.insert(), {'follower_id': self.u1.id, 'followed_id': self.u2.id})
+        db.session.commit()
+        self.assertFalse(self.u1.is_following(self.u2))
+        follower_graph.backend.incr_version('follower-graph')
+        self.assertTrue(self.u1.is_following(self.u2))
+
+    def test_graph_check_reports_counters(self):
+        # строка появилась в обход follow(): счетчики о ней не знают
+        u1, u2 = self.u1.id, self.u2.id
+        db.session.execute(followers.insert(), {'follower_id': u1, 'followed_id': u2})
+        db.session.commit()
+        result = app.test_cli_runner().invoke(args=['graph', 'check'])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn(f'пользователь {u1}: following_count = 0, в followers 1', result.output)
+        self.assertIn(f'пользователь {u2}: follower_count = 0, в followers 1', result.output)
+
+
+class KeysetPaginationCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.create_all()
+        self.u1 = User(username='john', email='john@example.com')
+        self.u2 = User(username='susan', email='susan@example.com')
+        db.session.add_all([self.u1, self.u2])
+        now = datetime.utcnow()
+        # у двух соседних постов одинаковое время - порядок решает id
+        self.posts = [
+            Post(body=f'post {i}', author=self.u2, timestamp=now + timedelta(seconds=i // 2)) for i in range(7)
+        ]
+        db.session.add_all(self.posts)
+        db.session.commit()
+        self.newest_first = sorted(self.posts, key=lambda p: (p.timestamp, p.id), reverse=True)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def walk(self, query, keys):
+        pages = [keyset_paginate(query, keys, 3)]
+        while pages[-1].has_next:
+            pages.append(keyset_paginate(query, keys, 3, cursor=pages[-1].next_cursor))
+        return pages
+
+    def test_next_and_prev_cursors(self):
+        pages = self.walk(Post.query, (Post.timestamp, Post.id))
+        self.assertEqual([len(p.items) for p in pages], [3, 3, 1])
+        self.assertEqual(sum([p.items for p in pages], []), self.newest_first)
+        self.assertFalse(pages[0].has_prev)
+
+        back = keyset_paginate(Post.query, (Post.timestamp, Post.id), 3, cursor=pages[2].prev_cursor)
+        self.assertEqual(back.items, pages[1].items)
+        back = keyset_paginate(Post.query, (Post.timestamp, Post.id), 3, cursor=back.prev_cursor)
+        self.assertEqual(back.items, pages[0].items)
+        self.assertFalse(back.has_prev)
+
+    def test_legacy_page_number(self):
+        page = keyset_paginate(Post.query, (Post.timestamp, Post.id), 3, page=2)
+        self.assertEqual(page.items, self.newest_first[3:6])
+        self.assertTrue(page.has_prev)
+        self.assertEqual(decode_cursor(page.next_cursor)[0], 'next')
+        self.assertEqual(keyset_paginate(Post.query, (Post.timestamp, Post.id), 3, cursor='garbage').items,
+                         self.newest_first[:3])
+
+    def test_followed_feed(self):
+        self.u1.follow(self.u2)
+        db.session.commit()
+        feed, keys = self.u1.followed_feed()
+        self.assertEqual(sum([p.items for p in self.walk(feed, keys)], []), self.newest_first)
+
+        app.config['TIMELINE_FANOUT_LIMIT'] = 0
+        try:
+            feed, keys = self.u1.followed_feed()
+            self.assertEqual(sum([p.items for p in self.walk(feed, keys)], []), self.newest_first)
+        finally:
+            app.config['TIMELINE_FANOUT_LIMIT'] = 1000
+
+
+class LastSeenBufferCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_coalesced_flush(self):
+        then = datetime(2021, 1, 1)
+        u1 = User(username='john', email='john@example.com', last_seen=then)
+        u2 = User(username='susan', email='susan@example.com', last_seen=then)
+        db.session.add_all([u1, u2])
+        db.session.commit()
+        buffer = LastSeenBuffer()
+
+        buffer.touch(u1, then + timedelta(seconds=10))
+        self.assertIsNone(buffer.pending(u1.id))
+        buffer.touch(u1, then + timedelta(minutes=5))
+        buffer.touch(u1, then + timedelta(minutes=5, seconds=30))
+        buffer.touch(u2, then + timedelta(minutes=7))
+        self.assertEqual(buffer.pending(u1.id), then + timedelta(minutes=5))
+
+        self.assertEqual(buffer.flush(), 2)
+        db.session.expire_all()
+        self.assertEqual(u1.last_seen, then + timedelta(minutes=5))
+        self.assertEqual(u2.last_seen, then + timedelta(minutes=7))
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_flush_after_response(self):
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LAST_SEEN_FLUSH_INTERVAL'] = 0
+        then = datetime(2021, 1, 1)
+        u = User(username='john', email='john@example.com', last_seen=then)
+        u.set_password('cat')
+        db.session.add(u)
+        db.session.commit()
+        client = app.test_client()
+        client.post('/login', data={'username': 'john', 'password': 'cat'})
+        last_seen = db.select([User.last_seen]).where(User.id == u.id)
+        try:
+            response = client.get('/user/john')
+            self.assertEqual(response.status_code, 200)
+            # ответ готов, а UPDATE еще не выполнялся
+            self.assertEqual(db.session.execute(last_seen).scalar(), then)
+            response.close()
+            self.assertGreater(db.session.execute(last_seen).scalar(), then)
+        finally:
+            app.config['WTF_CSRF_ENABLED'] = True
+            app.config['LAST_SEEN_FLUSH_INTERVAL'] = 60
+
+
+class ResumeLoaderCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def create_resume(self, username, size):
+        user = User(username=username, email=f'{username}@example.com')
+        resume = Resume(first_name='Иван', surname='Иванов', patronymic='Иванович', author=user)
+        info = BasicInformation(resume=resume, about_me='Обо мне', salary='100')
+        db.session.add_all([user, resume, info])
+        for i in range(size):
+            db.session.add_all([
+                SocialNetwork(basic_information=info, link_social_network=f'https://example.com/{i}'),
+                KeySkills(basic_information=info, skill_tag=f'skill {i}'),
+                WorkExperience(resume=resume, organization=f'org {i}'),
+                Education(resume=resume, level=f'level {i}'),
+                AdditionalEducation(resume=resume, specialization=f'course {i}'),
+            ])
+        db.session.commit()
+        return resume.id
+
+    def render_queries(self, resume_id):
+        db.session.expunge_all()
+        with app.test_request_context(), count_queries() as statements:
+            resume = load_resume(resume_id)
+            html = render_template('_resume.html', resume_с=resume)
+        return len(statements), html
+
+    def test_query_count_is_constant(self):
+        small, html = self.render_queries(self.create_resume('john', 1))
+        self.assertIn('skill 0', html)
+        large, html = self.render_queries(self.create_resume('susan', 20))
+        self.assertIn('course 19', html)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 6)
+
+    def test_featured_resume(self):
+        self.create_resume('susan', 2)
+        resume_id = self.create_resume('Svyat', 3)
+        db.session.expunge_all()
+        with app.test_request_context(), count_queries() as statements:
+            resume = load_featured_resume('Svyat')
+            self.assertEqual(len(resume.work_experience), 3)
+            self.assertEqual(len(resume.basic_information.key_skills), 3)
+        self.assertEqual(resume.id, resume_id)
+        self.assertLessEqual(len(statements), 6)
+
+
+class FragmentCacheCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        fragment_cache.clear()
+
+    def tearDown(self):
+        fragment_cache.clear()
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def check_backend(self, backend):
+        cache = FragmentCache(backend)
+        self.assertEqual(cache.get_or_render(1, 'full', lambda: 'v0'), 'v0')
+        self.assertEqual(cache.get_or_render(1, 'full', lambda: 'other'), 'v0')
+        cache.bump(1)
+        self.assertEqual(cache.get_or_render(1, 'full', lambda: 'v1'), 'v1')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_new_month_renders_again(self):
+        # стаж текущей работы растет без правки резюме - фрагмент прошлого месяца не годится
+        cache = FragmentCache(LRUBackend(4))
+        with mock.patch('app.fragment_cache.current_month', return_value='2030-01'):
+            self.assertEqual(cache.get_or_render(1, 'full', lambda: 'январь'), 'январь')
+        with mock.patch('app.fragment_cache.current_month', return_value='2030-02'):
+            self.assertEqual(cache.get_or_render(1, 'full', lambda: 'февраль'), 'февраль')
+
+    def test_new_build_changes_keys(self):
+        dist_dir = tempfile.mkdtemp()
+
+        class BuildConfig(Config):
+            ASSETS_DIST_DIR = dist_dir
+        try:
+            before = create_app(BuildConfig)
+            with open(os.path.join(dist_dir, 'manifest.json'), 'w') as f:
+                json.dump({'digest': 'new', 'files': {}, 'variants': {}}, f)
+            after = create_app(BuildConfig)
+        finally:
+            shutil.rmtree(dist_dir)
+        # кеш в общем файле переживает деплой: ключи новой выкладки не совпадают со старыми
+        self.assertNotEqual(before.extensions['fragment_cache'].release, after.extensions['fragment_cache'].release)
+        self.assertNotEqual(before.extensions['page_cache'].key('/'), after.extensions['page_cache'].key('/'))
+
+    def test_lru_backend(self):
+        self.check_backend(LRUBackend(2))
+        backend = LRUBackend(2)
+        for key in 'abc':
+            backend.set(key, key)
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual(backend.get('c'), 'c')
+
+    def test_sqlite_backend_is_shared(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.check_backend(SQLiteBackend(path, 10))
+            other_worker = FragmentCache(SQLiteBackend(path, 10))
+            self.assertEqual(other_worker.get_or_render(1, 'full', lambda: 'miss'), 'v1')
+        finally:
+            os.remove(path)
+
+    def test_edit_route_invalidates_fragment(self):
+        u = User(username='john', email='john@example.com')
+        u.set_password('cat')
+        resume = Resume(first_name='Иван', surname='Иванов', patronymic='Иванович', author=u)
+        db.session.add_all([u, resume, BasicInformation(resume=resume)])
+        db.session.commit()
+        resume_id = resume.id
+        client = app.test_client()
+        client.post('/login', data={'username': 'john', 'password': 'cat'})
+
+        self.assertIn('Иван', client.get(f'/resume/{resume_id}').get_data(as_text=True))
+        client.get(f'/resume/{resume_id}')
+        self.assertEqual(fragment_cache.hits, 1)
+
+        client.post(f'/{resume_id}/edit_resume', data={
+            'first_name': 'Петр', 'surname': 'Иванов', 'patronymic': 'Иванович', 'gender': 'мужчина'
+        })
+        self.assertIn('Петр', client.get(f'/resume/{resume_id}').get_data(as_text=True))
+        self.assertEqual(fragment_cache.misses, 2)
+
+    def test_edit_route_commits_once(self):
+        u = User(username='john', email='john@example.com')
+        u.set_password('cat')
+        resume = Resume(first_name='Иван', surname='Иванов', patronymic='Иванович', author=u)
+        db.session.add_all([u, resume, BasicInformation(resume=resume)])
+        db.session.commit()
+        resume_id, version = resume.id, resume.version
+        client = app.test_client()
+        client.post('/login', data={'username': 'john', 'password': 'cat'})
+        commits = []
+        record = lambda session: commits.append(session)
+        event.listen(db.session, 'after_commit', record)
+        try:
+            client.post(f'/{resume_id}/edit_resume', data={
+                'first_name': 'Петр', 'surname': 'Иванов', 'patronymic': 'Иванович', 'gender': 'мужчина'
+            })
+        finally:
+            event.remove(db.session, 'after_commit', record)
+        # правка, индекс и версия - одной транзакцией
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(Resume.query.get(resume_id).version, version + 1)
+        self.assertEqual(search_index.search('resume', 'петр', 10), ([resume_id], False))
+
+
+class PageCacheCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        fragment_cache.clear()
+        page_cache.clear()
+        u = User(username='Svyat', email='svyat@example.com')
+        u.set_password('cat')
+        resume = Resume(first_name='Иван', surname='Иванов', patronymic='Иванович', author=u)
+        db.session.add_all([u, resume, BasicInformation(resume=resume, about_me='Обо мне')])
+        db.session.commit()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        fragment_cache.clear()
+        page_cache.clear()
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def test_anonymous_hits_and_304(self):
+        first = self.client.get('/')
+        etag = first.headers['ETag']
+        with count_queries() as statements:
+            second = self.client.get('/')
+            not_modified = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(statements, [])
+        self.assertEqual(second.get_data(), first.get_data())
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.client.get('/index?page=2').status_code, 200)
+        self.assertEqual(page_cache.misses, 2)
+
+    def test_new_post_invalidates(self):
+        etag = self.client.get('/').headers['ETag']
+        self.client.post('/login', data={'username': 'Svyat', 'password': 'cat'})
+        self.assertNotIn('ETag', self.client.get('/').headers)
+        self.client.post('/index', data={'post': 'Новый пост'})
+        self.client.get('/logout')
+
+        response = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новый пост', response.get_data(as_text=True))
+
+    def test_page_rendered_before_invalidate_is_not_cached_as_new(self):
+        def post_committed_while_rendering(sender, template, context, **extra):
+            page_cache.invalidate()
+
+        template_rendered.connect(post_committed_while_rendering, app)
+        try:
+            self.client.get('/')
+        finally:
+            template_rendered.disconnect(post_committed_while_rendering, app)
+        self.client.get('/')
+        self.assertEqual((page_cache.hits, page_cache.misses), (0, 2))
+
+
+class FeedHydrationCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        john = User(username='john', email='john@example.com')
+        john.set_password('cat')
+        authors = [User(username=f'author{i}', email=f'author{i}@example.com') for i in range(10)]
+        db.session.add_all([john] + authors)
+        db.session.commit()
+        for author in authors:
+            john.follow(author)
+        db.session.add_all([Post(body=f'post {i}', author=authors[i % 10]) for i in range(600)])
+        db.session.commit()
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': 'john', 'password': 'cat'})
+        # прогрев кеша пользователей, чтобы первый замер не отличался от остальных
+        self.client.get('/user/john')
+
+    def tearDown(self):
+        app.config['POSTS_PER_PAGE'] = 5
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        counts = []
+        for per_page in (5, 50, 500):
+            app.config['POSTS_PER_PAGE'] = per_page
+            with count_queries() as statements:
+                html = self.client.get('/user/john').get_data(as_text=True)
+            self.assertEqual(html.count('class="post"'), per_page)
+            self.assertIn('author9', html)
+            counts.append(len(statements))
+        self.assertEqual(len(set(counts)), 1)
+
+
+class InstrumentationCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.create_all()
+        db.session.add(User(username='john', email='john@example.com'))
+        db.session.commit()
+        page_cache.clear()
+        instrumentation.enable(app)
+
+    def tearDown(self):
+        instrumentation.disable(app)
+        app.config['SLOW_REQUEST_THRESHOLD_MS'] = 500
+        db.session.remove()
+        db.drop_all()
+
+    def test_server_timing_and_slow_log(self):
+        app.config['SLOW_REQUEST_THRESHOLD_MS'] = 0
+        with self.assertLogs(app.logger, 'WARNING') as logs:
+            response = app.test_client().get('/index')
+        self.assertEqual(response.status_code, 404)
+        self.assertRegex(response.headers['Server-Timing'], r'db;dur=[0-9.]+;desc="2 queries", render;dur=')
+        self.assertIn('"queries": 2', logs.output[0])
+        self.assertIn('FROM resume JOIN user', logs.output[0])
+
+    def test_disabled(self):
+        instrumentation.disable(app)
+        self.assertNotIn('Server-Timing', app.test_client().get('/index').headers)
+
+
+class AssetsCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.default_dist_dir = app.config['ASSETS_DIST_DIR']
+        cls.dist_dir = tempfile.mkdtemp()
+        app.config['ASSETS_DIST_DIR'] = cls.dist_dir
+        cls.manifest = assets.build(force=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dist_dir, ignore_errors=True)
+        app.config['ASSETS_DIST_DIR'] = cls.default_dist_dir
+        assets.reload_manifest()
+
+    def test_build(self):
+        css = self.manifest['files']['css/style.css']
+        self.assertRegex(css, r'^css/style\.[0-9a-f]{10}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(self.dist_dir, css + '.gz')))
+        with open(os.path.join(self.dist_dir, css)) as f:
+            content = f.read()
+        self.assertIn(os.path.basename(self.manifest['files']['images/main_photo.jpg']), content)
+        self.assertNotIn('Ellipse\\ 1.svg', content)
+        self.assertIsNone(assets.build())
+
+    def test_precompressed_and_immutable(self):
+        client = app.test_client()
+        with app.test_request_context():
+            url = assets.asset_url('css/style.css')
+        self.assertTrue(url.startswith('/assets/css/style.'))
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        plain = client.get(url)
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+
+    def test_previous_build_kept_until_next(self):
+        static_dir, dist_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        try:
+            builds = []
+            for version in range(3):
+                with open(os.path.join(static_dir, 'app.js'), 'w') as f:
+                    f.write(f'console.log({version});')
+                builds.append(assets.build(static_dir, dist_dir)['files']['app.js'])
+                # страницы в кешах еще ссылаются на прошлую сборку
+                self.assertTrue(os.path.exists(os.path.join(dist_dir, builds[-1])))
+                if version:
+                    self.assertTrue(os.path.exists(os.path.join(dist_dir, builds[-2] + '.gz')))
+            self.assertFalse(os.path.exists(os.path.join(dist_dir, builds[0])))
+            self.assertFalse(os.path.exists(os.path.join(dist_dir, builds[0] + '.gz')))
+        finally:
+            shutil.rmtree(static_dir)
+            shutil.rmtree(dist_dir)
+            assets.reload_manifest()
+
+    def test_manifest_reloaded_when_file_changes(self):
+        path = os.path.join(self.dist_dir, 'manifest.json')
+        with app.test_request_context():
+            self.assertEqual(assets.asset_url('css/style.css'), '/assets/' + self.manifest['files']['css/style.css'])
+            stat = os.stat(path)
+            try:
+                # сборка в другом процессе: этот узнает о ней только по файлу
+                with open(path, 'w') as f:
+                    json.dump({'files': {'css/style.css': 'css/style.0123456789.css'}, 'variants': {}}, f)
+                os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+                self.assertEqual(assets.asset_url('css/style.css'), '/assets/css/style.0123456789.css')
+            finally:
+                with open(path, 'w') as f:
+                    json.dump(self.manifest, f)
+                assets.reload_manifest()
+
+
+class SearchCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        u = User(username='susan', email='susan@example.com')
+        u.set_password('cat')
+        db.session.add(u)
+        db.session.commit()
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': 'susan', 'password': 'cat'})
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def test_routes_index_posts_and_resumes(self):
+        self.client.post('/new_post', data={'post': 'Пишу на Python и Flask'})
+        self.client.post('/index', data={'post': 'Сегодня был дождь'})
+        response = self.client.get('/search?q=python')
+        self.assertIn('Пишу на Python и Flask', response.get_data(as_text=True))
+        self.assertNotIn('дождь', response.get_data(as_text=True))
+
+        self.client.post('/resume_create', data={'first_name': 'Иван', 'surname': 'Иванов', 'patronymic': 'Иванович',
+                                                 'date_of_birth': '01.01.1990', 'gender': 'мужчина'})
+        resume_id = Resume.query.first().id
+        self.assertEqual(search_index.search('resume', 'иванов', 10), ([resume_id], False))
+        self.client.post(f'/{resume_id}/edit_resume', data={'first_name': 'Петр', 'surname': 'Петров',
+                                                             'patronymic': 'Петрович', 'date_of_birth': '01.01.1990',
+                                                             'gender': 'мужчина'})
+        self.assertEqual(search_index.search('resume', 'иванов', 10), ([], False))
+        self.assertIn(f'/resume/{resume_id}', self.client.get('/search?q=Петров&type=resume').get_data(as_text=True))
+
+        self.client.get('/logout')
+        self.assertNotIn(f'/resume/{resume_id}', self.client.get('/search?q=Петров&type=resume').get_data(as_text=True))
+
+    def test_ranking_and_pages(self):
+        u = User.query.first()
+        db.session.add_all([Post(body='python', author=u), Post(body='python python python', author=u)] +
+                           [Post(body=f'python и еще много разных слов номер {i}', author=u) for i in range(10)])
+        db.session.commit()
+        self.assertEqual(search_index.search('post', 'python', 5), ([], False))
+        self.assertEqual(search_index.reindex(), (12, 0))
+
+        ids, has_next = search_index.search('post', 'python', 5)
+        self.assertEqual(ids[:2], [2, 1])
+        self.assertTrue(has_next)
+        ids, has_next = search_index.search('post', 'python', 5, page=3)
+        self.assertEqual(len(ids), 2)
+        self.assertFalse(has_next)
+        self.assertEqual(search_index.search('post', '"* OR (', 5), ([], False))
+        self.assertEqual(search_index.search('post', '   ', 5), ([], False))
+
+
+class SkillIndexCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        u = User(username='susan', email='susan@example.com')
+        u.set_password('cat')
+        infos = [BasicInformation(resume=Resume(author=u)) for _ in range(3)]
+        db.session.add_all([u] + infos)
+        db.session.commit()
+        self.infos = [(info.resume_id, info.id) for info in infos]
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': 'susan', 'password': 'cat'})
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def add_skill(self, info, tag):
+        self.client.post('/{}/{}/key_skill'.format(*info), data={'skill_tag': tag})
+
+    def test_routes_maintain_index(self):
+        r1, r2, r3 = [resume_id for resume_id, info_id in self.infos]
+        for info, tags in zip(self.infos, (['Python', 'Flask'], ['python ', 'Docker'], ['PYTHON', 'flask', 'Linux'])):
+            for tag in tags:
+                self.add_skill(info, tag)
+        self.assertEqual(Skill.query.filter_by(name='python').count(), 1)
+        self.assertEqual(Skill.query.count(), 4)
+        self.assertEqual(KeySkills.query.filter_by(skill_tag='PYTHON').first().skill.name, 'python')
+
+        self.assertEqual(self.client.get('/skills?all=python,Flask').get_json(), {'count': 2, 'resumes': [r1, r3]})
+        self.assertEqual(self.client.get('/skills?all=python&any=docker&any=linux').get_json()['resumes'], [r2, r3])
+        self.assertEqual(self.client.get('/skills?all=python,cobol').get_json()['resumes'], [])
+        self.assertEqual(self.client.get('/skills?all=python&limit=1').get_json(), {'count': 3, 'resumes': [r1]})
+        self.assertEqual(self.client.get('/skills?all=python&limit=-2').get_json(), {'count': 3, 'resumes': []})
+
+        key_skill = KeySkills.query.filter_by(skill_tag='Docker').first()
+        self.client.post(f'/{r2}/{key_skill.id}/edit_key_skill', data={'skill_tag': ' FLASK'})
+        self.assertEqual(skill_index.lookup(all=['flask']), [r1, r2, r3])
+        self.assertEqual(skill_index.lookup(any=['docker']), [])
+
+        skill_index.invalidate()
+        self.assertEqual(skill_index.lookup(all=['python', 'flask']), [r1, r2, r3])
+
+    def test_normalize_old_rows(self):
+        db.session.add_all([KeySkills(basic_information_id=self.infos[0][1], skill_tag='Git'),
+                            KeySkills(basic_information_id=self.infos[1][1], skill_tag='git')])
+        db.session.commit()
+        self.assertEqual(skill_index.lookup(all=['git']), [])
+        self.assertEqual(normalize_key_skills(), 2)
+        self.assertEqual(skill_index.lookup(all=['git']), [self.infos[0][0], self.infos[1][0]])
+
+    def test_skill_added_concurrently(self):
+        raced = []
+
+        def other_request_inserts(conn, cursor, statement, parameters, context, executemany):
+            # параллельный запрос добавляет навык сразу после нашей выборки
+            if statement.startswith('SELECT') and 'FROM skill' in statement and not raced:
+                raced.append(True)
+                cursor.connection.execute("INSERT INTO skill (name) VALUES ('rust')")
+        event.listen(db.engine, 'after_cursor_execute', other_request_inserts)
+        try:
+            skill = Skill.for_tag('Rust')
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', other_request_inserts)
+        self.assertEqual(skill.name, 'rust')
+        self.assertEqual(Skill.query.filter_by(name='rust').count(), 1)
+
+
+class ExportCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['EXPORT_BATCH_SIZE'] = 2
+        db.create_all()
+        generate(users=10, posts=7, resume_share=0.5)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        app.config['EXPORT_BATCH_SIZE'] = 500
+        db.session.remove()
+        db.drop_all()
+
+    def login(self, username):
+        self.client.post('/login', data={'username': username, 'password': 'benchmark'})
+
+    def test_only_export_users(self):
+        self.assertEqual(self.client.get('/export/posts.ndjson').status_code, 302)
+        self.login('user1')
+        self.assertEqual(self.client.get('/export/posts.ndjson').status_code, 403)
+        self.assertEqual(self.client.get('/export/users.ndjson').status_code, 404)
+        self.assertEqual(self.client.get('/export/posts.zip').status_code, 404)
+
+    def test_ndjson_and_zip(self):
+        self.login('Svyat')
+        response = self.client.get('/export/posts.ndjson')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        posts = [json.loads(line) for line in response.get_data().splitlines()]
+        self.assertEqual([post['id'] for post in posts], list(range(1, 8)))
+
+        resumes = [json.loads(line) for line in self.client.get('/export/resumes.ndjson').get_data().splitlines()]
+        self.assertEqual(len(resumes), Resume.query.count())
+        self.assertTrue(resumes[0]['basic_information']['key_skills'])
+
+        response = self.client.get('/export/resumes.zip')
+        self.assertTrue(response.is_streamed)
+        archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(json.loads(archive.read(f'resumes/{resumes[0]["id"]}.json')), resumes[0])
+
+
+class ImportCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        generate(users=10, posts=0, resume_share=0.3)
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': 'user1', 'password': 'benchmark'})
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def test_ndjson_round_trip_with_errors(self):
+        exported = b''.join(data_export.export('resumes', 'ndjson')).decode().splitlines()
+        broken = json.loads(exported[0])
+        broken['surname'] = ''
+        broken['work_experience'][0]['organization'] = ''
+        body = '\n'.join(exported + [json.dumps(broken), '"не резюме"'])
+        before = Resume.query.count()
+
+        report = self.client.post('/import/resumes', data=body, content_type='application/x-ndjson').get_json()
+        self.assertEqual(len(report['created']), len(exported))
+        self.assertEqual([error['record'] for error in report['errors']], [len(exported), len(exported) + 1])
+        self.assertEqual(set(report['errors'][0]['errors']), {'surname', 'work_experience[0].organization'})
+        self.assertEqual(Resume.query.count(), before + len(exported))
+
+        copy = load_resume(report['created'][0])
+        self.assertEqual(copy.author.username, 'user1')
+        original = json.loads(exported[0])
+        self.assertEqual([skill.skill_tag for skill in copy.basic_information.key_skills],
+                         [skill['skill_tag'] for skill in original['basic_information']['key_skills']])
+        self.assertEqual(len(copy.work_experience), len(original['work_experience']))
+        tag = original['basic_information']['key_skills'][0]['skill_tag']
+        self.assertIn(copy.id, skill_index.lookup(all=[tag]))
+        self.assertIn(copy.id, search_index.search('resume', tag, 100)[0])
+
+    def test_csv_and_bad_requests(self):
+        body = 'first_name,surname,patronymic,gender,city_of_residence,phone_number,email,citizenship,' \
+               'desired_position,salary,employment,work_schedule,key_skills\n' \
+               'Анна,Петрова,Ивановна,женщина,Казань,+7,anna@example.com,Россия,Аналитик,1,полная,гибкий,SQL; Excel\n' \
+               'Петр,Петров,,мужчина,Казань,+7,petr@example.com,Россия,,1,полная,гибкий,\n'
+        report = self.client.post('/import/resumes', data=body, content_type='text/csv').get_json()
+        self.assertEqual(len(report['created']), 1)
+        self.assertEqual(set(report['errors'][0]['errors']), {'patronymic', 'basic_information.desired_position'})
+        resume = load_resume(report['created'][0])
+        self.assertEqual(resume.basic_information.city_of_residence, 'Казань')
+        self.assertEqual([skill.skill.name for skill in resume.basic_information.key_skills], ['sql', 'excel'])
+
+        self.assertEqual(self.client.post('/import/resumes', data='{', content_type='application/json').status_code,
+                         400)
+        for body in ('{"items": []}', '42', '{"resumes": "Анна"}'):
+            response = self.client.post('/import/resumes', data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('resumes', response.get_json()['error'])
+        self.assertEqual(self.client.post('/import/resumes', data='x', content_type='text/plain').status_code, 415)
+
+
+class ResumePatchCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        generate(users=10, posts=0, resume_share=0.3)
+        resume = Resume.query.first()
+        self.resume_id, self.user_id = resume.id, resume.user_id
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': resume.author.username, 'password': 'benchmark'})
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def patch(self, document):
+        return self.client.patch(f'/api/resume/{self.resume_id}', json=document)
+
+    def work(self, organization, started='01.2023'):
+        return {'started_working': started, 'organization': organization, 'region': 'Казань',
+                'company_field_activity': 'IT', 'post': 'Разработчик'}
+
+    def test_multi_section_patch(self):
+        resume = load_resume(self.resume_id)
+        citizenship = resume.basic_information.citizenship
+        kept, removed = [skill.id for skill in resume.basic_information.key_skills[:2]]
+        current, organization = resume.work_experience[0].id, resume.work_experience[0].organization
+        dropped = resume.work_experience[-1].id
+        count = len(resume.work_experience)
+        version = fragment_cache.version(self.resume_id)
+
+        response = self.patch({
+            'first_name': 'Анна',
+            'basic_information': {'salary': '250000', 'key_skills': {
+                'add': ['Rust'], 'update': [{'id': kept, 'skill_tag': 'Go'}], 'delete': [removed]
+            }},
+            'work_experience': {
+                'add': [self.work('Новая компания')],
+                'update': [{'id': current, 'ending': '12.2022'}],
+                'delete': [dropped],
+            },
+            'educations': {'add': [{'level': 'высшее', 'educational_institution': 'КФУ', 'faculty': 'ВМК',
+                                    'specialization': 'ПМИ', 'year_completion': '2012'}]},
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['first_name'], 'Анна')
+
+        resume = load_resume(self.resume_id)
+        self.assertEqual((resume.first_name, resume.basic_information.salary), ('Анна', '250000'))
+        self.assertEqual(resume.basic_information.citizenship, citizenship)
+        self.assertLessEqual({'go', 'rust'}, {skill.skill.name for skill in resume.basic_information.key_skills})
+        self.assertNotIn(removed, [skill.id for skill in resume.basic_information.key_skills])
+        self.assertEqual(len(resume.work_experience), count)
+        self.assertEqual(resume.work_experience[0].organization, 'Новая компания')
+        updated = WorkExperience.query.get(current)
+        self.assertEqual((updated.ending, updated.organization), (date(2022, 12, 1), organization))
+        self.assertEqual(resume.experience_since, date(2023, 1, 1))
+        self.assertEqual([training.year_completion for training in resume.educations][-1], 2012)
+        self.assertIn(resume.id, skill_index.lookup(all=['rust']))
+        self.assertIn(resume.id, search_index.search('resume', 'Новая компания', 100)[0])
+        self.assertEqual(fragment_cache.version(resume.id), version + 1)
+
+    def test_child_rows_are_written_in_bulk(self):
+        def added(n):
+            with count_queries() as statements:
+                response = self.patch({'work_experience': {'add': [self.work(f'Компания {i}') for i in range(n)]}})
+            self.assertEqual(response.status_code, 200)
+            return len(statements)
+
+        # первый запрос еще загружает пользователя в кеш
+        self.patch({})
+        self.assertEqual(added(1), added(20))
+
+    def test_errors_reject_whole_patch(self):
+        other = load_resume(Resume.query.filter(Resume.user_id != self.user_id).first().id)
+        other_id, other_work = other.id, other.work_experience[0].id
+        before = data_export.resume_document(load_resume(self.resume_id))
+        response = self.patch({
+            'first_name': 'Анна',
+            'surname': '',
+            'nickname': 'x',
+            'basic_information': {'salary': '1', 'social_networks': {'update': [{'id': 10 ** 6}]}},
+            'work_experience': {'add': [self.work('Компания', started='когда-то')],
+                                'update': [{'id': before['work_experience'][0]['id'], 'ending': '1900'}],
+                                'delete': [other_work]},
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.get_json()['errors']), {
+            'surname', 'nickname', 'basic_information.social_networks.update[0].id',
+            'work_experience.add[0].started_working', 'work_experience.update[0].ending',
+            'work_experience.delete[0]',
+        })
+        self.assertEqual(data_export.resume_document(load_resume(self.resume_id)), before)
+
+        self.assertEqual(self.client.patch(f'/api/resume/{other_id}', json={'first_name': 'Анна'}).status_code, 403)
+        self.assertEqual(self.patch(['не', 'объект']).status_code, 400)
+
+    def test_operations_must_be_lists(self):
+        skills = KeySkills.query.count()
+        response = self.patch({
+            'basic_information': {'key_skills': {'add': 'Python'}},
+            'work_experience': {'update': {'id': 1}, 'delete': 1},
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.get_json()['errors']), {
+            'basic_information.key_skills.add', 'work_experience.update', 'work_experience.delete',
+        })
+        self.assertEqual(KeySkills.query.count(), skills)
+
+
+class ResumeApiCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        generate(users=10, posts=0, resume_share=0.3)
+        resume = Resume.query.first()
+        self.resume_id = resume.id
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': resume.author.username, 'password': 'benchmark'})
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def get(self, query='', **headers):
+        return self.client.get(f'/api/resume/{self.resume_id}{query}', headers=headers)
+
+    def test_full_document_matches_export(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        expected = json.loads(json.dumps(data_export.resume_document(load_resume(self.resume_id)),
+                                         default=data_export.to_json))
+        self.assertEqual(response.get_json(), expected)
+        self.assertEqual(self.client.get('/api/resume/100000').status_code, 404)
+
+    def test_fields_load_only_requested_relationships(self):
+        self.get()
+        with count_queries() as statements:
+            document = self.get('?fields=first_name,basic_information.key_skills').get_json()
+        self.assertEqual(set(document), {'id', 'first_name', 'basic_information'})
+        self.assertEqual(set(document['basic_information']), {'id', 'key_skills'})
+        self.assertTrue(document['basic_information']['key_skills'])
+        for table in ('work_experience', 'education', 'social_network'):
+            self.assertFalse([statement for statement in statements if f'FROM {table}' in statement])
+
+        document = self.get('?fields=work_experience.organization,basic_information').get_json()
+        self.assertEqual(set(document['work_experience'][0]), {'id', 'organization'})
+        self.assertIn('social_networks', document['basic_information'])
+        self.assertEqual(self.get('?fields=salary').status_code, 400)
+        self.assertEqual(self.get('?fields=first_name.length').status_code, 400)
+
+    def test_conditional_get(self):
+        first = self.get('?fields=work_experience')
+        etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+        self.assertNotEqual(etag, self.get().headers['ETag'])
+
+        with count_queries() as statements:
+            response = self.get('?fields=work_experience', **{'If-None-Match': etag})
+        self.assertEqual((response.status_code, response.data), (304, b''))
+        self.assertEqual(len(statements), 1)
+        self.assertIn('FROM resume', statements[0])
+        self.assertEqual(self.get('?fields=work_experience', **{'If-Modified-Since': last_modified}).status_code, 304)
+
+        work_id = first.get_json()['work_experience'][0]['id']
+        self.client.patch(f'/api/resume/{self.resume_id}', json={'work_experience': {'delete': [work_id]}})
+        response = self.get('?fields=work_experience', **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(work_id, [work['id'] for work in response.get_json()['work_experience']])
+
+        etag = response.headers['ETag']
+        self.client.post(f'/{self.resume_id}/edit_position', data={
+            'desired_position': 'Аналитик', 'salary': '1', 'employment': 'полная', 'work_schedule': 'гибкий'
+        })
+        self.assertEqual(self.get('?fields=work_experience', **{'If-None-Match': etag}).status_code, 200)
+
+
+class DatabaseRoutingCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['SQLALCHEMY_BINDS'] = {'replica': 'sqlite://'}
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        self.replica = db.get_engine(app, bind='replica')
+        db.Model.metadata.create_all(self.replica)
+        user_cache.clear()
+        susan = User(username='susan', email='susan@example.com')
+        susan.set_password('cat')
+        users = [{'id': 1, 'username': 'susan', 'email': 'susan@example.com', 'password_hash': susan.password_hash},
+                 {'id': 2, 'username': 'john', 'email': 'john@example.com', 'password_hash': None}]
+        for engine, body in ((db.engine, 'пост из основной базы'), (self.replica, 'пост из реплики')):
+            with engine.begin() as connection:
+                connection.execute(User.__table__.insert(), users)
+                connection.execute(Post.__table__.insert(), {'body': body, 'user_id': 2, 'timestamp': datetime.utcnow()})
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        app.config['DATABASE_REPLICA_STICKY_SECONDS'] = 5
+        db.session.remove()
+        db.Model.metadata.drop_all(self.replica)
+        app.config['SQLALCHEMY_BINDS'] = None
+        user_cache.clear()
+        db.drop_all()
+
+    def test_reads_from_replica_after_sticky_window(self):
+        self.client.post('/login', data={'username': 'susan', 'password': 'cat'})
+        self.assertIn('пост из основной базы', self.client.get('/user/john').get_data(as_text=True))
+        app.config['DATABASE_REPLICA_STICKY_SECONDS'] = 0
+        self.assertIn('пост из реплики', self.client.get('/user/john').get_data(as_text=True))
+
+    def test_writes_go_to_primary(self):
+        app.config['DATABASE_REPLICA_STICKY_SECONDS'] = 0
+        self.client.post('/login', data={'username': 'susan', 'password': 'cat'})
+        self.client.get('/follow/john')
+        self.assertEqual(db.session.execute(followers.select()).fetchall(), [(1, 2)])
+        self.assertEqual(self.replica.execute(followers.select()).fetchall(), [])
+
+    def test_sqlite_pragmas(self):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        try:
+            with db.engine.connect() as connection:
+                self.assertEqual(connection.execute('PRAGMA journal_mode').scalar(), 'wal')
+                self.assertEqual(connection.execute('PRAGMA synchronous').scalar(), 1)
+                self.assertEqual(connection.execute('PRAGMA busy_timeout').scalar(), 5000)
+        finally:
+            db.engine.dispose()
+            app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+class ResumeDatesCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        u = User(username='susan', email='susan@example.com')
+        u.set_password('cat')
+        resume = Resume(author=u)
+        db.session.add(resume)
+        db.session.commit()
+        self.resume_id = resume.id
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': 'susan', 'password': 'cat'})
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def add_work(self, started, ending):
+        return self.client.post(f'/{self.resume_id}/work_experience', data={
+            'started_working': started, 'ending': ending, 'organization': 'Компания', 'region': 'Москва',
+            'company_field_activity': 'IT', 'post': 'Разработчик'
+        })
+
+    def test_parse(self):
+        self.assertEqual(parse_date('15.03.2018'), date(2018, 3, 15))
+        self.assertEqual(parse_date('03.2018'), date(2018, 3, 1))
+        self.assertEqual(parse_date('2018-03-15'), date(2018, 3, 15))
+        self.assertEqual(parse_date('15 марта 2018'), date(2018, 3, 15))
+        self.assertEqual(parse_date('Май 2018 г.'), date(2018, 5, 1))
+        self.assertEqual(parse_date(' 2018 '), date(2018, 1, 1))
+        self.assertIsNone(parse_date('по настоящее время'))
+        self.assertIsNone(parse_date(''))
+        self.assertEqual(parse_year('2015 г.'), 2015)
+        for text in ('вчера', '31.02.2018', '1815'):
+            self.assertRaises(ValueError, parse_date, text)
+
+    def test_experience_merges_overlaps(self):
+        self.assertEqual(experience([]), (0, None))
+        self.assertEqual(experience([(date(2018, 1, 1), date(2018, 12, 1))]), (12, None))
+        self.assertEqual(experience([(date(2018, 1, 1), date(2018, 12, 1)), (date(2018, 6, 1), date(2019, 3, 1)),
+                                     (date(2019, 3, 1), date(2019, 6, 1)), (date(2021, 1, 1), date(2021, 1, 1))]),
+                         (19, None))
+        self.assertEqual(experience([(date(2020, 1, 1), None), (date(2015, 1, 1), date(2015, 6, 1)),
+                                     (date(2021, 1, 1), date(2022, 1, 1))]), (6, date(2020, 1, 1)))
+
+    def test_routes_keep_experience_up_to_date(self):
+        self.add_work('01.2015', '12.2016')
+        self.add_work('июнь 2016', 'по настоящее время')
+        resume = Resume.query.get(self.resume_id)
+        self.assertEqual((resume.experience_months, resume.experience_since), (0, date(2015, 1, 1)))
+        self.assertEqual(resume.experience_total(today=date(2017, 12, 31)), 36)
+        self.assertEqual([work.started_working for work in resume.work_experience], [date(2016, 6, 1), date(2015, 1, 1)])
+        self.assertIn('по настоящее время', self.client.get(f'/resume/{self.resume_id}').get_data(as_text=True))
+
+        work_id = WorkExperience.query.filter_by(started_working=date(2016, 6, 1)).first().id
+        form = self.client.get(f'/{self.resume_id}/{work_id}/edit_work_experience').get_data(as_text=True)
+        self.assertIn('value="06.2016"', form)
+        self.client.post(f'/{self.resume_id}/{work_id}/edit_work_experience', data={
+            'started_working': '2018', 'ending': '06.2018', 'organization': 'Компания', 'region': 'Москва',
+            'company_field_activity': 'IT', 'post': 'Разработчик'
+        })
+        resume = Resume.query.get(self.resume_id)
+        self.assertEqual((resume.experience_months, resume.experience_since), (30, None))
+
+    def test_invalid_dates_are_rejected(self):
+        response = self.add_work('когда-то', '')
+        self.assertIn('Не удалось разобрать дату', response.get_data(as_text=True))
+        self.assertIn('value="когда-то"', response.get_data(as_text=True))
+        self.assertIn('Окончание работы раньше начала.', self.add_work('2018', '2017').get_data(as_text=True))
+        self.assertEqual(WorkExperience.query.count(), 0)
+
+
+class StreamCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        clients = {}
+        for name in ('john', 'susan', 'david'):
+            u = User(username=name, email=f'{name}@example.com')
+            u.set_password('cat')
+            db.session.add(u)
+            db.session.commit()
+            clients[name] = app.test_client()
+            clients[name].post('/login', data={'username': name, 'password': 'cat'})
+        self.clients = clients
+        clients['john'].get('/follow/susan')
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        db.session.remove()
+        db.drop_all()
+
+    def test_followers_receive_posts(self):
+        john = self.clients['john'].get('/stream', buffered=False)
+        david = self.clients['david'].get('/stream', buffered=False)
+        try:
+            self.assertEqual(john.mimetype, 'text/event-stream')
+            john_events, david_events = iter(john.response), iter(david.response)
+            self.assertEqual(next(john_events), b'retry: 3000\n\n')
+            next(david_events)
+            self.clients['susan'].post('/new_post', data={'post': 'Привет, подписчики'})
+            event = next(john_events).decode()
+            self.assertTrue(event.startswith('event: post\nid: 1\n'))
+            self.assertIn('"author": "susan"', event)
+            self.assertIn('Привет, подписчики', event)
+            self.assertEqual(stream_broker.connections, 2)
+        finally:
+            john.close()
+            david.close()
+        self.assertEqual(stream_broker.connections, 0)
+
+    def test_connection_cap(self):
+        limit, stream_broker.max_connections = stream_broker.max_connections, 1
+        first = self.clients['john'].get('/stream', buffered=False)
+        try:
+            response = self.clients['david'].get('/stream')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '30')
+        finally:
+            first.close()
+            stream_broker.max_connections = limit
+
+    def test_backpressure(self):
+        broker = MemoryBroker(lambda user_id, author_id: user_id == 1, max_connections=5, queue_size=2)
+        follower, stranger = broker.subscribe(1), broker.subscribe(3)
+        for i in range(3):
+            broker.publish(2, {'event': 'post', 'id': i, 'data': {}})
+        self.assertEqual(follower.get(0), {'event': 'resync', 'data': {}})
+        self.assertEqual((follower.get(0), follower.dropped), (None, 3))
+        self.assertIsNone(stranger.get(0))
+        broker.publish(2, {'event': 'post', 'id': 3, 'data': {}})
+        self.assertEqual(follower.get(0)['id'], 3)
+
+    def test_close_ends_streams(self):
+        subscription = stream_broker.subscribe(1)
+        stream = event_stream(stream_broker._get_current_object(), subscription, heartbeat=60, max_seconds=60)
+        self.assertTrue(next(stream).startswith(b'retry:'))
+        stream_broker.close()
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream_broker.connections, 0)
+
+    def test_sqlite_broker_between_processes(self):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            publisher = SQLiteBroker(path, lambda user_id, author_id: True, 5, 10, poll_interval=60)
+            worker = SQLiteBroker(path, lambda user_id, author_id: True, 5, 10, poll_interval=60)
+            subscription = worker.subscribe(1)
+            publisher.publish(2, {'event': 'post', 'id': 7, 'data': {'body': 'пост'}})
+            self.assertEqual(worker.poll(), 1)
+            self.assertEqual(subscription.get(0), {'event': 'post', 'id': 7, 'data': {'body': 'пост'}})
+            self.assertEqual(worker.poll(), 0)
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+class SchemaCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.path
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_ensure_upgrades_once(self):
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['schema', 'ensure'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertNotIn('База на последней ревизии', result.output)
+        self.assertEqual(User.query.count(), 0)
+        result = runner.invoke(args=['schema', 'ensure'])
+        self.assertIn('База на последней ревизии', result.output)
+
+    def test_upgrade_from_baseline_fills_new_tables(self):
+        init_migrate(app)
+        flask_migrate.upgrade(revision='05fc4d472e8d')
+        with db.engine.begin() as connection:
+            for statement in (
+                "INSERT INTO user (id, username) VALUES (1, 'a'), (2, 'b')",
+                # в исходной схеме у followers нет уникального ключа, повторы встречаются
+                'INSERT INTO followers (follower_id, followed_id) VALUES (1, 2), (1, 2)',
+                "INSERT INTO post (id, body, user_id, timestamp) VALUES (1, 'пост', 2, '2020-01-01 00:00:00')",
+                "INSERT INTO resume (id, first_name, date_of_birth, user_id) VALUES (1, 'Иван', '01.02.1990', 1)",
+                'INSERT INTO basic_information (id, resume_id) VALUES (1, 1)',
+                "INSERT INTO key_skills (skill_tag, basic_information_id) VALUES ('Python ', 1), ('python', 1)",
+                "INSERT INTO work_experience (started_working, organization, resume_id) VALUES ('01.2015', 'Яндекс', 1)",
+            ):
+                connection.execute(statement)
+        flask_migrate.upgrade()
+        self.assertEqual(db.session.query(KeySkills.skill_id).distinct().all(), [(Skill.query.one().id,)])
+        self.assertEqual(search_index.search('resume', 'яндекс', 10), ([1], False))
+        self.assertEqual(search_index.search('post', 'пост', 10), ([1], False))
+        self.assertEqual(sorted(db.session.execute(db.select([timeline.c.owner_id, timeline.c.post_id]))),
+                         [(1, 1), (2, 1)])
+
+
+class AppFactoryCase(unittest.TestCase):
+    def test_build_tools_not_imported_by_workers(self):
+        # отдельный процесс: в этом alembic мог загрузить SchemaCase
+        code = ('import sys; from app import create_app; create_app(); '
+                'print(sorted(m for m in ("alembic", "flask_migrate", "PIL") if m in sys.modules))')
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    def test_apps_do_not_share_caches(self):
+        other = create_app()
+        for name in ('fragment_cache', 'page_cache', 'user_cache', 'follower_graph', 'skill_index', 'stream_broker',
+                     'assets'):
+            self.assertIsNot(other.extensions[name], app.extensions[name])
+        self.assertIn('main.login', other.view_functions)
+        self.assertIn('assets.assets', other.view_functions)
+
+
+class DatasetCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def snapshot(self):
+        return sorted(db.session.execute(db.select([followers.c.follower_id, followers.c.followed_id])).fetchall())
+
+    def test_generate_is_seeded(self):
+        generate(users=30, posts=100, seed=7)
+        edges = self.snapshot()
+        self.assertEqual(Post.query.count(), 100)
+        self.assertIsNotNone(load_featured_resume('Svyat').basic_information)
+        self.assertEqual(len(User.query.get(1).followed_posts().all()),
+                         Post.query.filter(Post.user_id.in_(
+                             [u.id for u in User.query.get(1).followed] + [1])).count())
+
+        db.drop_all()
+        db.create_all()
+        generate(users=30, posts=100, seed=7)
+        self.assertEqual(self.snapshot(), edges)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)